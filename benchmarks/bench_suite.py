@@ -0,0 +1,441 @@
+# Per-stage throughput benchmarks on generated Zara programs
+#
+# Usage: python bench_suite.py [--sizes 1KB,64KB,1MB] [--seed N] [--rounds N]
+#                              [--stages lex,parse,semantic,tac]
+#                              [-o FILE] [--compare PREVIOUS.json]
+#
+# Every size gets a program from zara_corpus (the same one for a given seed)
+# and every stage is timed on it, best of --rounds runs. Preparing a stage's
+# input (tokens for the parser, the statement list for the code generator)
+# is not timed.
+#
+#   lex       the three lexers.py backends and the week 3 Tokenizer
+#   parse     the week 3 Parser, on the whole program (its AST is checked
+#             against the generator's statements first) and on the
+#             week3_parser profile, the only input it accepted before it
+#             parsed the full grammar
+#   semantic  the week 5 SemanticAnalyzer of semantic_analyzer.py, driven
+#             through its scope API, and the one of test.py, on a
+#             declare/use script derived from the program
+#   tac       the week 7 tac.py IntermediateCodeGenerator, on the program
+#             lowered to its statement tuples
+#
+# Results are written as JSON (bench_results.json next to this script by
+# default, which git ignores) together with the commit they were measured
+# at. --compare prints the change against an earlier results file and
+# exits with status 1 if any benchmark got more than REGRESSION_THRESHOLD
+# slower.
+
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from zara_corpus import generate_program, parse_size
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ('lex', 'parse', 'semantic', 'tac')
+DEFAULT_SIZES = '1KB,64KB,1MB'
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results.json')
+REGRESSION_THRESHOLD = 0.10
+
+# Week 2 modules import each other by name, so that folder goes on the path
+sys.path.insert(0, os.path.join(REPO_DIR, 'week 2'))
+import lexers
+
+_modules = {}
+
+
+def load(week, filename):
+    # Modules of different weeks share file names (main.py, test.py), so
+    # each is loaded from its path under a name of its own. Its folder is on
+    # the path while it loads, for the helpers it imports.
+    name = f"{week.replace(' ', '')}_{filename[:-3]}"
+    if name not in _modules:
+        folder = os.path.join(REPO_DIR, week)
+        spec = importlib.util.spec_from_file_location(name, os.path.join(folder, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.path.insert(0, folder)
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            sys.path.remove(folder)
+        _modules[name] = module
+    return _modules[name]
+
+
+# Stage drivers
+
+def count_tokens(tokens):
+    count = 0
+    for _ in tokens:
+        count += 1
+    return count
+
+
+def lexer_benchmark(backend):
+    def run(source):
+        return count_tokens(lexers.get_lexer(backend).tokens(source))
+    return run
+
+
+def tokenize_buffer(source):
+    topdown = load('week 3', 'topdownparser.py')
+    return len(topdown.Tokenizer(source).tokenize_buffer())
+
+
+def prepare_week3_parser(corpus):
+    topdown = load('week 3', 'topdownparser.py')
+    return topdown.Tokenizer(corpus['week3_source']).tokenize_buffer()
+
+
+def prepare_full_parser(corpus):
+    topdown = load('week 3', 'topdownparser.py')
+    tokens = topdown.Tokenizer(corpus['source']).tokenize_buffer()
+    if topdown.Parser(tokens).parse() != corpus['nodes']:
+        raise RuntimeError("Parser AST differs from the generated statements")
+    return tokens
+
+
+def parse_week3(tokens):
+    topdown = load('week 3', 'topdownparser.py')
+    parser = topdown.Parser(tokens)
+    parser.parse()
+    if not parser.cursor.at_end():
+        raise RuntimeError(f"Parser stopped at token {parser.cursor.index} of {len(tokens)}")
+    return len(tokens)
+
+
+def literal_type(value):
+    return 'float' if '.' in value else 'int'
+
+
+def expression_type(analyzer, expr):
+    if isinstance(expr, str):
+        if expr[0].isdigit():
+            return literal_type(expr)
+        return analyzer.check_variable(expr).type
+    operator, left, right = expr
+    left_type = expression_type(analyzer, left)
+    analyzer.check_type_consistency(left_type, expression_type(analyzer, right))
+    return left_type
+
+
+def check_assignment(analyzer, name, expr):
+    value_type = expression_type(analyzer, expr)
+    symbol = analyzer.symbol_table.get_symbol(name, analyzer.current_scope_level)
+    if symbol is None:
+        analyzer.declare_variable(name, value_type)
+    else:
+        analyzer.check_type_consistency(symbol.type, value_type)
+
+
+def check_block(analyzer, body):
+    analyzer.enter_scope()
+    for node in body:
+        check_statement(analyzer, node)
+    analyzer.exit_scope()
+
+
+def check_statement(analyzer, node):
+    kind = node[0]
+    if kind == 'assign':
+        check_assignment(analyzer, node[1], node[2])
+    elif kind == 'expr':
+        expression_type(analyzer, node[1])
+    elif kind == 'if':
+        expression_type(analyzer, node[1])
+        check_block(analyzer, node[2])
+    elif kind == 'do_while':
+        check_block(analyzer, node[1])
+        expression_type(analyzer, node[2])
+    elif kind == 'for':
+        check_assignment(analyzer, node[1][1], node[1][2])
+        expression_type(analyzer, node[2])
+        check_assignment(analyzer, node[3][1], node[3][2])
+        check_block(analyzer, node[4])
+    elif kind == 'def':
+        analyzer.enter_scope()
+        for param in node[2]:
+            analyzer.declare_variable(param, 'int')
+        for statement in node[3]:
+            check_statement(analyzer, statement)
+        analyzer.exit_scope()
+
+
+# Position of the statement list in compound statements
+BODY_INDEX = {'if': 2, 'do_while': 1, 'for': 4, 'def': 3}
+
+
+def count_statements(nodes):
+    count = 0
+    for node in nodes:
+        count += 1
+        if node[0] in BODY_INDEX:
+            count += count_statements(node[BODY_INDEX[node[0]]])
+    return count
+
+
+def analyze_scopes(nodes):
+    semantic = load('week 5', 'semantic_analyzer.py')
+    analyzer = semantic.SemanticAnalyzer()
+    for node in nodes:
+        check_statement(analyzer, node)
+    return count_statements(nodes)
+
+
+def script_lines(nodes, declared, lines):
+    # The declare/use lines test.py reads: a declaration the first time a
+    # name is assigned, a use for every name read. `declared` maps names to
+    # their type.
+    def value_type(expr):
+        while not isinstance(expr, str):
+            expr = expr[1]
+        return literal_type(expr) if expr[0].isdigit() else declared[expr]
+
+    def uses(expr):
+        if isinstance(expr, str):
+            if not expr[0].isdigit():
+                lines.append(f"use {expr}")
+        else:
+            uses(expr[1])
+            uses(expr[2])
+
+    def assign(name, expr):
+        uses(expr)
+        if name not in declared:
+            declared[name] = value_type(expr)
+            lines.append(f"declare {name} {declared[name]}")
+
+    for node in nodes:
+        kind = node[0]
+        if kind == 'assign':
+            assign(node[1], node[2])
+        elif kind == 'expr':
+            uses(node[1])
+        elif kind == 'if':
+            uses(node[1])
+            script_lines(node[2], declared, lines)
+        elif kind == 'do_while':
+            script_lines(node[1], declared, lines)
+            uses(node[2])
+        elif kind == 'for':
+            assign(node[1][1], node[1][2])
+            uses(node[2])
+            assign(node[3][1], node[3][2])
+            script_lines(node[4], declared, lines)
+        elif kind == 'def':
+            for param in node[2]:
+                if param not in declared:
+                    declared[param] = 'int'
+                    lines.append(f"declare {param} int")
+            script_lines(node[3], declared, lines)
+    return lines
+
+
+def prepare_checker_script(corpus):
+    return "\n".join(script_lines(corpus['nodes'], {}, []))
+
+
+def analyze_script(script):
+    checker = load('week 5', 'test.py')
+    checker.SemanticAnalyzer().analyze(script)
+    return script.count("\n") + 1
+
+
+class TacLowering:
+    # Rewrites generated statements into the tuples tac.py takes: nested
+    # expressions are split into temporaries, a copy becomes "x = y + 0"
+    # since the generator only has binary assignments, for and do-while
+    # loops become while loops and function bodies are emitted inline
+    def __init__(self):
+        self.temp_count = 0
+
+    def operand(self, expr, out):
+        if isinstance(expr, str):
+            return expr
+        operator, left, right = expr
+        left = self.operand(left, out)
+        right = self.operand(right, out)
+        temp = f"_v{self.temp_count}"
+        self.temp_count += 1
+        out.append(("assign", temp, (operator, left, right)))
+        return temp
+
+    def binary(self, expr, out):
+        if isinstance(expr, str):
+            return ("+", expr, "0")
+        operator, left, right = expr
+        return (operator, self.operand(left, out), self.operand(right, out))
+
+    def block(self, body):
+        out = []
+        for node in body:
+            self.statement(node, out)
+        return out
+
+    def statement(self, node, out):
+        kind = node[0]
+        if kind == 'assign':
+            expr = self.binary(node[2], out)
+            out.append(("assign", node[1], expr))
+        elif kind == 'expr':
+            self.operand(node[1], out)
+        elif kind == 'if':
+            out.append(("if", node[1], self.block(node[2]), None))
+        elif kind == 'do_while':
+            body = self.block(node[1])
+            out.extend(body)
+            out.append(("while", node[2], body))
+        elif kind == 'for':
+            self.statement(node[1], out)
+            body = self.block(node[4])
+            self.statement(node[3], body)
+            out.append(("while", node[2], body))
+        elif kind == 'def':
+            out.extend(self.block(node[3]))
+        return out
+
+
+def prepare_tac(corpus):
+    return TacLowering().block(corpus['nodes'])
+
+
+def generate_tac(statements):
+    tac = load('week 7', 'tac.py')
+    generator = tac.IntermediateCodeGenerator()
+    for statement in statements:
+        generator.process_statement(statement)
+    return len(generator.code)
+
+
+def source_of(corpus):
+    return corpus['source']
+
+
+# (stage, name, unit, prepare, run): prepare turns the corpus into the input
+# of run, which returns how many units it processed
+BENCHMARKS = [
+    ('lex', 'char_loop', 'tokens', source_of, lexer_benchmark('char_loop')),
+    ('lex', 'regex', 'tokens', source_of, lexer_benchmark('regex')),
+    ('lex', 'master_regex', 'tokens', source_of, lexer_benchmark('master_regex')),
+    ('lex', 'week3_tokenize_buffer', 'tokens', source_of, tokenize_buffer),
+    ('parse', 'week3_parser_full', 'tokens', prepare_full_parser, parse_week3),
+    ('parse', 'week3_parser', 'tokens', prepare_week3_parser, parse_week3),
+    ('semantic', 'scope_analyzer', 'statements', lambda corpus: corpus['nodes'], analyze_scopes),
+    ('semantic', 'line_checker', 'lines', prepare_checker_script, analyze_script),
+    ('tac', 'week7_tac', 'instructions', prepare_tac, generate_tac),
+]
+
+
+def make_corpus(size, seed):
+    source, nodes = generate_program(size, seed=seed)
+    week3_source, _ = generate_program(size, seed=seed, profile='week3_parser')
+    return {'source': source, 'nodes': nodes, 'week3_source': week3_source}
+
+
+def best_time(run, argument, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        items = run(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return items, best
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, seed=0, rounds=3, stages=STAGES):
+    results = []
+    for size in sizes:
+        corpus = make_corpus(size, seed)
+        for stage, name, unit, prepare, run in BENCHMARKS:
+            if stage not in stages:
+                continue
+            argument = prepare(corpus)
+            input_bytes = len(corpus['week3_source'] if name == 'week3_parser' else corpus['source'])
+            items, seconds = best_time(run, argument, rounds)
+            result = {
+                'stage': stage,
+                'benchmark': name,
+                'size': size,
+                'input_bytes': input_bytes,
+                'unit': unit,
+                'items': items,
+                'seconds': seconds,
+                'mb_per_sec': input_bytes / seconds / 1e6,
+                'items_per_sec': items / seconds,
+            }
+            print(f"{stage:9} {name:22} {size:>9} B  {seconds * 1e3:10.2f} ms  "
+                  f"{result['mb_per_sec']:7.2f} MB/s  {result['items_per_sec']:>12,.0f} {unit}/s")
+            results.append(result)
+    return results
+
+
+def compare(previous, results, threshold=REGRESSION_THRESHOLD):
+    # Print the speed change of every benchmark found in both runs; returns
+    # the ones that got slower than the threshold allows
+    before = {(result['benchmark'], result['size']): result for result in previous['results']}
+    regressions = []
+    print(f"\nAgainst {previous.get('commit') or 'previous run'}:")
+    for result in results:
+        old = before.get((result['benchmark'], result['size']))
+        if old is None:
+            continue
+        change = old['seconds'] / result['seconds'] - 1
+        flag = ""
+        if result['seconds'] > old['seconds'] * (1 + threshold):
+            regressions.append(result)
+            flag = "  REGRESSION"
+        print(f"{result['benchmark']:22} {result['size']:>9} B  {change * 100:+7.1f}% speed{flag}")
+    return regressions
+
+
+def main():
+    args = sys.argv[1:]
+
+    def option(flag, default):
+        return args[args.index(flag) + 1] if flag in args else default
+
+    sizes = [parse_size(size) for size in option('--sizes', DEFAULT_SIZES).split(',')]
+    seed = int(option('--seed', 0))
+    rounds = int(option('--rounds', 3))
+    stages = option('--stages', ','.join(STAGES)).split(',')
+    output = option('-o', DEFAULT_OUTPUT)
+    for stage in stages:
+        if stage not in STAGES:
+            print(f"Unknown stage '{stage}', expected one of: {', '.join(STAGES)}")
+            sys.exit(2)
+
+    results = run_suite(sizes, seed, rounds, stages)
+    report = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'options': {'sizes': sizes, 'seed': seed, 'rounds': rounds, 'stages': stages},
+        'results': results,
+    }
+    with open(output, 'w') as out:
+        json.dump(report, out, indent=2)
+    print(f"Results written to {output}")
+
+    if '--compare' in args:
+        with open(option('--compare', None)) as previous:
+            regressions = compare(json.load(previous), results)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Seeded generator of synthetic Zara programs
+
+Programs are in the language of week 3/topdownparser.py. The full
+profile emits this subset of its grammar:
+
+program       ::= (statement | method_declaration)*
+statement     ::= assignment ';' | expression ';' | if_statement | do_while_statement | for_statement
+if_statement  ::= 'if' '(' condition ')' '{' statement+ '}'
+do_while_statement ::= 'do' '{' statement+ '}' 'while' '(' condition ')'
+for_statement ::= 'for' '(' assignment ';' IDENTIFIER COMPARATOR literal ';' IDENTIFIER '=' IDENTIFIER '+' literal ')' '{' statement+ '}'
+method_declaration ::= 'def' IDENTIFIER '(' parameter_list? ')' '{' statement+ '}'
+assignment    ::= IDENTIFIER '=' expression
+expression    ::= operand (('+' | '-' | '*' | '/') operand)*
+condition     ::= operand COMPARATOR operand
+operand       ::= IDENTIFIER | literal
+literal       ::= NUMBER
+parameter_list ::= IDENTIFIER (',' IDENTIFIER)*
+
+Method declarations are only generated at the top level, and blocks nest
+at most --depth deep, with only assignments at the limit. A for loop
+steps the variable its init assigns. The generator emits no 'else',
+'return', parentheses or chained assignments, although Parser accepts
+them, and no STRING literals, which the week 3 Tokenizer has no rule
+for. Numbers are ints, or floats with digits on both sides of the '.'.
+
+The week3_parser profile emits only top-level if statements of the form
+
+    'if' '(' IDENTIFIER COMPARATOR NUMBER ')' '{' (IDENTIFIER '=' NUMBER ';')+ '}'
+
+Full-profile programs are also semantically valid: every variable is
+assigned before it is read, in the same or an enclosing block, and is
+only ever used with one type (int or float).
+
+Besides the source text the generator returns each top-level statement as
+nested tuples, in the style of the structured input of week 7/tac.py:
+
+    ('assign', name, expr)
+    ('expr', expr)
+    ('if', cond, body)
+    ('do_while', body, cond)
+    ('for', init, cond, step, body)      init and step are 'assign' nodes
+    ('def', name, params, body)
+
+An expr is a name or number string, or (op, left, right) grouped the way
+the usual precedence rules read the rendered text. A cond is (comparator,
+left, right) with name or number operands.
+
+Usage: python zara_corpus.py SIZE [-o FILE] [--seed N] [--depth N]
+                             [--identifiers N] [--expression-size N]
+                             [--profile full|week3_parser]
+
+SIZE is a byte count with an optional KB/MB suffix, e.g. 1KB or 100MB.
+"""
+
+import random
+import sys
+
+PROFILES = ('full', 'week3_parser')
+
+OPERATORS = ('+', '-', '*', '/')
+COMPARATORS = ('==', '!=', '<', '>', '<=', '>=')
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2}
+
+# Name stems for generated identifiers; a numeric suffix keeps every name
+# distinct from the keywords
+STEMS = ('x', 'y', 'count', 'total', 'index', 'value', 'sum', 'rate', 'step', 'item', 'limit', 'acc')
+
+SIZE_SUFFIXES = {'KB': 1024, 'MB': 1024 * 1024, 'B': 1}
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    for suffix, factor in SIZE_SUFFIXES.items():
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+class CorpusGenerator:
+    def __init__(self, seed=0, max_depth=3, identifiers=50, expression_size=4,
+                 block_size=4, profile='full'):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}', expected one of: {', '.join(PROFILES)}")
+        self.random = random.Random(seed)
+        self.max_depth = max_depth
+        self.expression_size = max(expression_size, 1)
+        self.block_size = max(block_size, 1)
+        self.profile = profile
+        self.names = [f"{STEMS[index % len(STEMS)]}{index}" for index in range(max(identifiers, 1))]
+        self.function_count = 0
+
+        # Visible variables. Declarations only ever append and leaving a
+        # block drops what it declared, so each scope is a mark into these.
+        self.types = {}
+        self.by_type = {'int': [], 'float': []}
+        self.declared = []
+        self.scope_marks = []
+
+    # Scopes
+
+    def enter_scope(self):
+        self.scope_marks.append((len(self.declared), len(self.by_type['int']), len(self.by_type['float'])))
+
+    def exit_scope(self):
+        declared, ints, floats = self.scope_marks.pop()
+        for name in self.declared[declared:]:
+            del self.types[name]
+        del self.declared[declared:]
+        del self.by_type['int'][ints:]
+        del self.by_type['float'][floats:]
+
+    def declare(self, name, var_type):
+        self.types[name] = var_type
+        self.by_type[var_type].append(name)
+        self.declared.append(name)
+
+    # Expressions
+
+    def literal(self, var_type):
+        if var_type == 'float':
+            return f"{self.random.randint(0, 999)}.{self.random.randint(0, 99)}"
+        return str(self.random.randint(0, 999))
+
+    def operand(self, var_type):
+        # A visible variable of the type, or a literal if there is none
+        candidates = self.by_type[var_type]
+        if candidates and self.random.random() < 0.7:
+            return self.random.choice(candidates)
+        return self.literal(var_type)
+
+    def expression(self, var_type):
+        # A flat operand/operator sequence folded by precedence, so the tree
+        # matches how the rendered text parses
+        count = self.random.randint(1, self.expression_size)
+        operands = [self.operand(var_type)]
+        operators = []
+        for _ in range(count - 1):
+            operator = self.random.choice(OPERATORS)
+            while operators and PRECEDENCE[operators[-1]] >= PRECEDENCE[operator]:
+                right = operands.pop()
+                operands.append((operators.pop(), operands.pop(), right))
+            operators.append(operator)
+            operands.append(self.operand(var_type))
+        while operators:
+            right = operands.pop()
+            operands.append((operators.pop(), operands.pop(), right))
+        return operands[0]
+
+    def condition(self):
+        var_type = self.random.choice(('int', 'float'))
+        return (self.random.choice(COMPARATORS), self.operand(var_type), self.operand(var_type))
+
+    # Statements
+
+    def assignment(self):
+        name = self.random.choice(self.names)
+        var_type = self.types.get(name)
+        if var_type is None:
+            # The value is built before the name becomes visible
+            var_type = self.random.choice(('int', 'float'))
+            node = ('assign', name, self.expression(var_type))
+            self.declare(name, var_type)
+            return node
+        return ('assign', name, self.expression(var_type))
+
+    def block(self, depth):
+        self.enter_scope()
+        body = [self.statement(depth + 1) for _ in range(self.random.randint(1, self.block_size))]
+        self.exit_scope()
+        return body
+
+    def statement(self, depth=0):
+        if self.profile == 'week3_parser':
+            return self.week3_statement()
+        if depth >= self.max_depth:
+            choice = 'assign'
+        else:
+            choice = self.random.choices(
+                ('assign', 'expr', 'if', 'do_while', 'for', 'def'),
+                (10, 1, 3, 1, 2, 1 if depth == 0 else 0))[0]
+
+        if choice == 'assign':
+            return self.assignment()
+        if choice == 'expr':
+            return ('expr', self.expression(self.random.choice(('int', 'float'))))
+        if choice == 'if':
+            return ('if', self.condition(), self.block(depth))
+        if choice == 'do_while':
+            body = self.block(depth)
+            return ('do_while', body, self.condition())
+        if choice == 'for':
+            init = self.assignment()
+            name = init[1]
+            var_type = self.types[name]
+            cond = (self.random.choice(('<', '<=', '!=')), name, self.literal(var_type))
+            step = ('assign', name, ('+', name, self.literal(var_type)))
+            return ('for', init, cond, step, self.block(depth))
+        return self.method_declaration(depth)
+
+    def method_declaration(self, depth):
+        name = f"fn{self.function_count}"
+        self.function_count += 1
+        self.enter_scope()
+        params = []
+        for _ in range(self.random.randint(0, 3)):
+            param = self.random.choice(self.names)
+            if param not in self.types:
+                self.declare(param, 'int')
+                params.append(param)
+        body = [self.statement(depth + 1) for _ in range(self.random.randint(1, self.block_size))]
+        self.exit_scope()
+        return ('def', name, params, body)
+
+    def week3_statement(self):
+        # The subset Parser accepts: if (IDENTIFIER COMPARATOR NUMBER) { IDENTIFIER = NUMBER; ... }
+        cond = (self.random.choice(COMPARATORS), self.random.choice(self.names), self.literal('int'))
+        body = [('assign', self.random.choice(self.names), self.literal('int'))
+                for _ in range(self.random.randint(1, self.block_size))]
+        return ('if', cond, body)
+
+    def statements(self, size):
+        # (node, text) for top-level statements until their text adds up to
+        # at least size characters
+        written = 0
+        while written < size:
+            node = self.statement()
+            text = render(node)
+            written += len(text)
+            yield node, text
+
+
+def render_expression(expr):
+    if isinstance(expr, str):
+        return expr
+    operator, left, right = expr
+    return f"{render_expression(left)} {operator} {render_expression(right)}"
+
+
+def render_lines(node, indent, lines):
+    pad = "    " * indent
+    kind = node[0]
+    if kind == 'assign':
+        lines.append(f"{pad}{node[1]} = {render_expression(node[2])};")
+    elif kind == 'expr':
+        lines.append(f"{pad}{render_expression(node[1])};")
+    elif kind == 'if':
+        lines.append(f"{pad}if ({render_expression(node[1])}) {{")
+        for statement in node[2]:
+            render_lines(statement, indent + 1, lines)
+        lines.append(f"{pad}}}")
+    elif kind == 'do_while':
+        lines.append(f"{pad}do {{")
+        for statement in node[1]:
+            render_lines(statement, indent + 1, lines)
+        lines.append(f"{pad}}} while ({render_expression(node[2])})")
+    elif kind == 'for':
+        init, cond, step = node[1], node[2], node[3]
+        lines.append(f"{pad}for ({init[1]} = {render_expression(init[2])}; {render_expression(cond)}; "
+                     f"{step[1]} = {render_expression(step[2])}) {{")
+        for statement in node[4]:
+            render_lines(statement, indent + 1, lines)
+        lines.append(f"{pad}}}")
+    elif kind == 'def':
+        lines.append(f"{pad}def {node[1]}({', '.join(node[2])}) {{")
+        for statement in node[3]:
+            render_lines(statement, indent + 1, lines)
+        lines.append(f"{pad}}}")
+    else:
+        raise ValueError(f"Unknown statement kind '{kind}'")
+
+
+def render(node, indent=0):
+    lines = []
+    render_lines(node, indent, lines)
+    return "\n".join(lines) + "\n"
+
+
+def generate_program(size, **options):
+    # Source text of at least size characters and its top-level statements
+    nodes = []
+    pieces = []
+    for node, text in CorpusGenerator(**options).statements(size):
+        nodes.append(node)
+        pieces.append(text)
+    return "".join(pieces), nodes
+
+
+def write_program(output, size, **options):
+    # Stream a program to a file object without keeping it in memory;
+    # returns the number of characters written
+    written = 0
+    for node, text in CorpusGenerator(**options).statements(size):
+        output.write(text)
+        written += len(text)
+    return written
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0].startswith('-'):
+        print(__doc__.split('Usage: ')[1])
+        sys.exit(2)
+    size = parse_size(args[0])
+
+    def option(flag, default, convert=int):
+        return convert(args[args.index(flag) + 1]) if flag in args else default
+
+    options = {
+        'seed': option('--seed', 0),
+        'max_depth': option('--depth', 3),
+        'identifiers': option('--identifiers', 50),
+        'expression_size': option('--expression-size', 4),
+        'profile': option('--profile', 'full', str),
+    }
+    if '-o' in args:
+        with open(args[args.index('-o') + 1], 'w') as output:
+            written = write_program(output, size, **options)
+        print(f"Wrote {written} characters", file=sys.stderr)
+    else:
+        write_program(sys.stdout, size, **options)
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,71 @@
-# Symbol Table Class
-class SymbolTable:
+# Identifier Pool: gives every distinct identifier a dense integer id, so
+# later phases compare ints instead of strings
+class IdentifierPool:
     def __init__(self):
-        self.table = {}
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+    def name(self, symbol_id):
+        return self.names[symbol_id]
+
+# Symbol record, one per declared identifier
+class Symbol:
+    __slots__ = ("name", "type", "value")
+
+    def __init__(self, name, var_type, value=None):
+        self.name = name
+        self.type = var_type
+        self.value = value
+
+# Symbol Table Class: symbols are stored in a list indexed by identifier id.
+# Methods take either the identifier's id or its name.
+class SymbolTable:
+    def __init__(self, pool=None):
+        self.pool = pool if pool is not None else IdentifierPool()
+        self.symbols = []
+
+    def symbol_id(self, name):
+        return name if isinstance(name, int) else self.pool.intern(name)
+
+    def is_declared(self, name):
+        symbol_id = self.symbol_id(name)
+        return symbol_id < len(self.symbols) and self.symbols[symbol_id] is not None
 
     def add_symbol(self, name, var_type, value=None):
-        if name in self.table:
-            raise Exception(f"Error: Variable '{name}' is already declared.")
-        self.table[name] = {"type": var_type, "value": value}
+        symbol_id = self.symbol_id(name)
+        if self.is_declared(symbol_id):
+            raise Exception(f"Error: Variable '{self.pool.name(symbol_id)}' is already declared.")
+        if symbol_id >= len(self.symbols):
+            self.symbols.extend([None] * (symbol_id + 1 - len(self.symbols)))
+        self.symbols[symbol_id] = Symbol(self.pool.name(symbol_id), var_type, value)
 
     def update_symbol(self, name, value):
-        if name not in self.table:
-            raise Exception(f"Error: Variable '{name}' is not declared.")
-        self.table[name]["value"] = value
+        self.get_symbol(name).value = value
 
     def get_symbol(self, name):
-        if name not in self.table:
-            raise Exception(f"Error: Variable '{name}' is not declared.")
-        return self.table[name]
+        symbol_id = self.symbol_id(name)
+        if not self.is_declared(symbol_id):
+            raise Exception(f"Error: Variable '{self.pool.name(symbol_id)}' is not declared.")
+        return self.symbols[symbol_id]
 
     def print_table(self):
-        for name, details in self.table.items():
-            print(f"Variable: {name}, Type: {details['type']}, Value: {details['value']}")
+        for symbol in self.symbols:
+            if symbol is not None:
+                print(f"Variable: {symbol.name}, Type: {symbol.type}, Value: {symbol.value}")
 
-# Lexical Scanner
-def lexical_scanner(source_code, symbol_table):
+# Token scanner: yields (type, value) pairs and does no printing. Runs of
+# letters or digits are found by index and sliced out once instead of being
+# built up a character at a time. Unrecognized characters come out as
+# UNKNOWN tokens.
+def scan_tokens(source_code):
     length = len(source_code)
     i = 0
 
@@ -32,60 +74,97 @@ def lexical_scanner(source_code, symbol_table):
 
         if current_char.isspace():
             i += 1
-            continue
-
-        if current_char == '+':
-            print("Token: PLUS Operator")
+        elif current_char == '+':
+            yield ("PLUS", current_char)
             i += 1
         elif current_char == '-':
-            print("Token: MINUS Operator")
+            yield ("MINUS", current_char)
             i += 1
         elif current_char == '=':
-            print("Token: ASSIGNMENT Operator")
+            yield ("ASSIGNMENT", current_char)
             i += 1
-            if i < length and source_code[i].isdigit():
-                number = ""
-                while i < length and source_code[i].isdigit():
-                    number += source_code[i]
-                    i += 1
-                print(f"Assigning NUMBER {number} to variable")
-            elif i < length and source_code[i].isalpha():
-                identifier = ""
-                while i < length and source_code[i].isalnum():
-                    identifier += source_code[i]
-                    i += 1
-                print(f"Assigning IDENTIFIER {identifier} to variable")
-
         elif current_char.isalpha():
-            identifier = ""
+            start = i
+            i += 1
             while i < length and source_code[i].isalnum():
-                identifier += source_code[i]
                 i += 1
+            identifier = source_code[start:i]
 
             if identifier == "if":
-                print("Token: IF Keyword")
+                yield ("IF", identifier)
             elif identifier == "else":
-                print("Token: ELSE Keyword")
+                yield ("ELSE", identifier)
             else:
-                print(f"Token: IDENTIFIER ({identifier})")
-                symbol_table.add_symbol(identifier, "unknown")
-
+                yield ("IDENTIFIER", identifier)
         elif current_char.isdigit():
-            number = ""
+            start = i
+            i += 1
             while i < length and source_code[i].isdigit():
-                number += source_code[i]
                 i += 1
-            print(f"Token: NUMBER ({number})")
-
+            yield ("NUMBER", source_code[start:i])
         else:
-            print(f"Error: Unrecognized character '{current_char}'")
+            yield ("UNKNOWN", current_char)
             i += 1
 
+# Lexical Scanner: prints each token and returns them as (type, value)
+# pairs, with identifiers given as their id in the symbol table's pool.
+# A number or identifier written right after '=' (as in "x=10") is reported
+# as the assigned value and is not declared; there even "if" and "else"
+# are identifiers.
+def lexical_scanner(source_code, symbol_table):
+    pool = symbol_table.pool
+    tokens = []
+    position = 0
+    assignment_end = -1
+
+    for token_type, value in scan_tokens(source_code):
+        # Every character but whitespace belongs to a token, so skipping
+        # whitespace finds where this one starts
+        while source_code[position].isspace():
+            position += 1
+        assigned = position == assignment_end
+        position += len(value)
+        if assigned and token_type in ("IF", "ELSE"):
+            token_type = "IDENTIFIER"
+
+        if token_type == "PLUS":
+            print("Token: PLUS Operator")
+        elif token_type == "MINUS":
+            print("Token: MINUS Operator")
+        elif token_type == "ASSIGNMENT":
+            print("Token: ASSIGNMENT Operator")
+            assignment_end = position
+        elif token_type == "IF":
+            print("Token: IF Keyword")
+        elif token_type == "ELSE":
+            print("Token: ELSE Keyword")
+        elif token_type == "NUMBER":
+            if assigned:
+                print(f"Assigning NUMBER {value} to variable")
+            else:
+                print(f"Token: NUMBER ({value})")
+        elif token_type == "IDENTIFIER":
+            symbol_id = pool.intern(value)
+            if assigned:
+                print(f"Assigning IDENTIFIER {value} to variable")
+            else:
+                print(f"Token: IDENTIFIER ({value})")
+                symbol_table.add_symbol(symbol_id, "unknown")
+            value = symbol_id
+        else:
+            print(f"Error: Unrecognized character '{value}'")
+            continue
+
+        tokens.append((token_type, value))
+
+    return tokens
+
 # Sample input for testing
-source_code = "if x = 10 + y - 5 else"
-symbol_table = SymbolTable()
-print("Lexical analysis of the source code:")
-lexical_scanner(source_code, symbol_table)
+if __name__ == "__main__":
+    source_code = "if x = 10 + y - 5 else"
+    symbol_table = SymbolTable()
+    print("Lexical analysis of the source code:")
+    lexical_scanner(source_code, symbol_table)
 
-# Print the symbol table after scanning
-symbol_table.print_table()
+    # Print the symbol table after scanning
+    symbol_table.print_table()
@@ -1,65 +1,118 @@
 import re
 
-# Symbol Table Class
-class SymbolTable:
+# Identifier Pool: gives every distinct identifier a dense integer id, so
+# later phases compare ints instead of strings
+class IdentifierPool:
     def __init__(self):
-        self.table = {}
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+    def name(self, symbol_id):
+        return self.names[symbol_id]
+
+# Symbol record, one per declared identifier
+class Symbol:
+    __slots__ = ("name", "type", "value")
+
+    def __init__(self, name, var_type, value=None):
+        self.name = name
+        self.type = var_type
+        self.value = value
+
+# Symbol Table Class: symbols are stored in a list indexed by identifier id.
+# Methods take either the identifier's id or its name.
+class SymbolTable:
+    def __init__(self, pool=None):
+        self.pool = pool if pool is not None else IdentifierPool()
+        self.symbols = []
+
+    def symbol_id(self, name):
+        return name if isinstance(name, int) else self.pool.intern(name)
+
+    def is_declared(self, name):
+        symbol_id = self.symbol_id(name)
+        return symbol_id < len(self.symbols) and self.symbols[symbol_id] is not None
 
     def add_symbol(self, name, var_type, value=None):
-        if name in self.table:
-            raise Exception(f"Error: Variable '{name}' is already declared.")
-        self.table[name] = {"type": var_type, "value": value}
+        symbol_id = self.symbol_id(name)
+        if self.is_declared(symbol_id):
+            raise Exception(f"Error: Variable '{self.pool.name(symbol_id)}' is already declared.")
+        if symbol_id >= len(self.symbols):
+            self.symbols.extend([None] * (symbol_id + 1 - len(self.symbols)))
+        self.symbols[symbol_id] = Symbol(self.pool.name(symbol_id), var_type, value)
 
     def update_symbol(self, name, value):
-        if name not in self.table:
-            raise Exception(f"Error: Variable '{name}' is not declared.")
-        self.table[name]["value"] = value
+        self.get_symbol(name).value = value
 
     def get_symbol(self, name):
-        if name not in self.table:
-            raise Exception(f"Error: Variable '{name}' is not declared.")
-        return self.table[name]
+        symbol_id = self.symbol_id(name)
+        if not self.is_declared(symbol_id):
+            raise Exception(f"Error: Variable '{self.pool.name(symbol_id)}' is not declared.")
+        return self.symbols[symbol_id]
 
     def print_table(self):
         print("\nSymbol Table:")
-        for name, details in self.table.items():
-            print(f"Variable: {name}, Type: {details['type']}, Value: {details['value']}")
+        for symbol in self.symbols:
+            if symbol is not None:
+                print(f"Variable: {symbol.name}, Type: {symbol.type}, Value: {symbol.value}")
 
-# Lexical Scanner using Regex
-def lexical_scanner(source_code, symbol_table):
-    # Define regex patterns for tokens
-    token_patterns = [
-        (r'\s+', None),                      # whitespace (ignored)
-        (r'\+', 'PLUS'),                     # PLUS operator
-        (r'-', 'MINUS'),                    # MINUS operator
-        (r'\*', 'MULTIPLY'),                # MULTIPLY operator
-        (r'/', 'DIVIDE'),                    # DIVIDE operator
-        (r'=', 'ASSIGNMENT'),                # ASSIGNMENT operator
-        (r'\bif\b', 'IF'),                   # IF keyword
-        (r'\belse\b', 'ELSE'),               # ELSE keyword
-        (r'\bfor\b', 'FOR'),                 # FOR keyword
-        (r'\bwhile\b', 'WHILE'),             # WHILE keyword
-        (r'\bfunction\b', 'FUNCTION'),       # FUNCTION keyword
-        (r'\breturn\b', 'RETURN'),           # RETURN keyword
-        (r'\d+(\.\d+)?', 'NUMBER'),          # INTEGER or FLOAT
-        (r'[a-zA-Z_][a-zA-Z0-9_]*', 'IDENTIFIER'),  # IDENTIFIER
-        (r'.', 'UNKNOWN')                    # Catch-all for unrecognized characters
-    ]
-
-    # Create a single regex pattern by combining all token patterns
-    combined_pattern = '|'.join(f'(?P<{name}>{pattern})' for pattern, name in token_patterns if name)
-
-    for match in re.finditer(combined_pattern, source_code):
+# Define regex patterns for tokens
+token_patterns = [
+    (r'\s+', 'WHITESPACE'),              # whitespace (ignored)
+    (r'\+', 'PLUS'),                     # PLUS operator
+    (r'-', 'MINUS'),                    # MINUS operator
+    (r'\*', 'MULTIPLY'),                # MULTIPLY operator
+    (r'/', 'DIVIDE'),                    # DIVIDE operator
+    (r'=', 'ASSIGNMENT'),                # ASSIGNMENT operator
+    (r'\bif\b', 'IF'),                   # IF keyword
+    (r'\belse\b', 'ELSE'),               # ELSE keyword
+    (r'\bfor\b', 'FOR'),                 # FOR keyword
+    (r'\bwhile\b', 'WHILE'),             # WHILE keyword
+    (r'\bfunction\b', 'FUNCTION'),       # FUNCTION keyword
+    (r'\breturn\b', 'RETURN'),           # RETURN keyword
+    (r'\d+(\.\d+)?', 'NUMBER'),          # INTEGER or FLOAT
+    (r'[a-zA-Z_][a-zA-Z0-9_]*', 'IDENTIFIER'),  # IDENTIFIER
+    (r'.', 'UNKNOWN')                    # Catch-all for unrecognized characters
+]
+
+# Combine all token patterns into a single regex, compiled once
+token_pattern = re.compile('|'.join(f'(?P<{name}>{pattern})' for pattern, name in token_patterns))
+
+# Token scanner: yields (type, value) pairs and does no printing
+def scan_tokens(source_code):
+    for match in token_pattern.finditer(source_code):
         token_type = match.lastgroup
-        token_value = match.group(token_type)
+        if token_type != 'WHITESPACE':
+            yield (token_type, match.group(token_type))
+
+# Lexical Scanner using Regex: prints each token and returns them as
+# (type, value) pairs, with identifiers given as their id in the symbol
+# table's pool
+def lexical_scanner(source_code, symbol_table):
+    pool = symbol_table.pool
+    tokens = []
+    for token_type, token_value in scan_tokens(source_code):
+        if token_type == 'IDENTIFIER':
+            symbol_id = pool.intern(token_value)
+            tokens.append((token_type, symbol_id))
+        else:
+            tokens.append((token_type, token_value))
 
         # Handle recognized tokens
         if token_type == 'NUMBER':
             print(f"Token: NUMBER ({token_value})")
         elif token_type == 'IDENTIFIER':
-            if token_value not in symbol_table.table:  # Only add if not already in symbol table
+            if not symbol_table.is_declared(symbol_id):  # Only add if not already in symbol table
                 print(f"Token: IDENTIFIER ({token_value})")
-                symbol_table.add_symbol(token_value, "unknown")  # Add to symbol table
+                symbol_table.add_symbol(symbol_id, "unknown")  # Add to symbol table
             else:
                 print(f"Token: IDENTIFIER ({token_value}) already declared.")
         elif token_type == 'PLUS':
@@ -87,6 +140,8 @@ def lexical_scanner(source_code, symbol_table):
         elif token_type == 'UNKNOWN':
             print(f"Error: Unrecognized character '{token_value}'")  # Catch unrecognized characters
 
+    return tokens
+
 # Main function to run the lexical scanner
 def main():
     symbol_table = SymbolTable()
@@ -109,8 +164,3 @@ def main():
 # Run the main function
 if __name__ == "__main__":
     main()
-<<<<<<< HEAD
-"""to finish type END at the start of a new line below"""
-=======
-"""to finish, type END at the start of a new line"""
->>>>>>> origin/main
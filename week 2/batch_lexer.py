@@ -0,0 +1,187 @@
+# Batch lexing of whole Zara source trees across a process pool
+#
+# Usage: python batch_lexer.py <directory or glob> [--workers N] [--compare]
+#
+# A directory is searched recursively for *.zara files. Files are lexed
+# through the streaming lexer with no string limit, which gives exactly the
+# tokens of lexical_analyzer: a file is only held whole while a quote in it
+# is never closed, as lexical_analyzer would hold it anyway. The results
+# come back in path order, identical to a serial run. --compare also runs
+# serially, checks the results match and prints the speedup. A file that
+# cannot be read is reported and the others are still lexed.
+
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import stream_lexical_analyzer
+
+SOURCE_PATTERN = '*.zara'
+
+# Files smaller than this are grouped into one task so that thousands of
+# tiny files do not each pay a round trip to a worker
+MIN_TASK_BYTES = 256 * 1024
+
+
+def find_sources(target, pattern=SOURCE_PATTERN):
+    # Source files under a directory, or matching a glob, sorted by path
+    if os.path.isdir(target):
+        paths = glob.glob(os.path.join(target, '**', pattern), recursive=True)
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def lex_file(path):
+    # Token count and UNKNOWN token locations for one file
+    start = time.perf_counter()
+    result = {'path': path, 'tokens': 0, 'errors': [], 'failure': None}
+    try:
+        with open(path, 'rb') as source:
+            count = 0
+            for token_type, token_value, line, col in stream_lexical_analyzer(source, string_limit=None):
+                count += 1
+                if token_type == 'UNKNOWN':
+                    result['errors'].append((line, col, token_value))
+            result['tokens'] = count
+    except (OSError, UnicodeDecodeError) as e:
+        result['failure'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def lex_files(paths):
+    return [lex_file(path) for path in paths]
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def plan_tasks(paths, min_task_bytes=MIN_TASK_BYTES):
+    # Largest files first, so big files start early and the small ones fill
+    # in the gaps as workers free up. Small files are grouped into tasks of
+    # at least min_task_bytes. A file that cannot be sized counts as empty;
+    # lex_file reports why it cannot be read.
+    sized = sorted(((file_size(path), path) for path in paths), reverse=True)
+    tasks = []
+    group = []
+    group_bytes = 0
+    for size, path in sized:
+        if size >= min_task_bytes:
+            tasks.append([path])
+            continue
+        group.append(path)
+        group_bytes += size
+        if group_bytes >= min_task_bytes:
+            tasks.append(group)
+            group = []
+            group_bytes = 0
+    if group:
+        tasks.append(group)
+    return tasks
+
+
+def summarize(results, elapsed):
+    return {
+        'files': len(results),
+        'tokens': sum(result['tokens'] for result in results),
+        'errors': sum(len(result['errors']) for result in results),
+        'failures': sum(1 for result in results if result['failure']),
+        'cpu_seconds': sum(result['seconds'] for result in results),
+        'wall_seconds': elapsed,
+    }
+
+
+def batch_lex(paths, workers=None):
+    # Lex every file in a process pool. Returns the per-file results in the
+    # order of `paths` and aggregate timings.
+    start = time.perf_counter()
+    by_path = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # One submit per task: idle workers pull the next one from the
+        # shared queue rather than getting a fixed share up front
+        futures = [executor.submit(lex_files, task) for task in plan_tasks(paths)]
+        for future in futures:
+            for result in future.result():
+                by_path[result['path']] = result
+    results = [by_path[path] for path in paths]
+    return results, summarize(results, time.perf_counter() - start)
+
+
+def serial_lex(paths):
+    start = time.perf_counter()
+    results = lex_files(paths)
+    return results, summarize(results, time.perf_counter() - start)
+
+
+def same_results(left, right):
+    # Everything except the timings
+    strip = lambda results: [{key: value for key, value in result.items() if key != 'seconds'} for result in results]
+    return strip(left) == strip(right)
+
+
+def print_summary(label, summary):
+    print(f"{label}: {summary['files']} files, {summary['tokens']} tokens, "
+          f"{summary['errors']} unknown tokens, {summary['failures']} unreadable, "
+          f"{summary['wall_seconds']:.2f}s wall, {summary['cpu_seconds']:.2f}s in lexer")
+
+
+USAGE = "Usage: python batch_lexer.py <directory or glob> [--workers N] [--compare]"
+
+
+def parse_args(args):
+    # (target, workers, compare); raises ValueError on anything else
+    target = None
+    workers = None
+    compare = False
+    args = iter(args)
+    for arg in args:
+        if arg == '--compare':
+            compare = True
+        elif arg == '--workers':
+            value = next(args, None)
+            if value is None or not value.isdigit() or int(value) < 1:
+                raise ValueError("--workers needs a positive number")
+            workers = int(value)
+        elif arg.startswith('--') or target is not None:
+            raise ValueError(f"unexpected argument {arg!r}")
+        else:
+            target = arg
+    if target is None:
+        raise ValueError("no directory or glob given")
+    return target, workers, compare
+
+
+def main():
+    try:
+        target, workers, compare = parse_args(sys.argv[1:])
+    except ValueError as error:
+        print(f"{error}\n{USAGE}")
+        sys.exit(2)
+    paths = find_sources(target)
+
+    results, summary = batch_lex(paths, workers)
+    for result in results:
+        if result['failure']:
+            print(f"{result['path']}: {result['failure']}")
+        for line, col, value in result['errors']:
+            print(f"{result['path']}:{line}:{col}: unrecognized character {value!r}")
+    print_summary("parallel", summary)
+
+    if compare:
+        serial_results, serial_summary = serial_lex(paths)
+        print_summary("serial", serial_summary)
+        if not same_results(results, serial_results):
+            print("Parallel results differ from the serial run")
+            sys.exit(1)
+        print(f"Speedup: {serial_summary['wall_seconds'] / summary['wall_seconds']:.2f}x "
+              f"with {workers or os.cpu_count()} workers")
+
+if __name__ == "__main__":
+    main()
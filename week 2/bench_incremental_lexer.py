@@ -0,0 +1,38 @@
+# Per-edit latency of LexerSession against file size
+#
+# Usage: python bench_incremental_lexer.py
+#
+# Types a few characters in the middle of programs of growing size and
+# reports the average time per edit next to a full lexical_analyzer run.
+
+import time
+
+from bench_dfa_lexer import SAMPLE
+from incremental_lexer import LexerSession
+from main import lexical_analyzer
+
+EDITS = 200
+
+
+def main():
+    for repetitions in (100, 1000, 10000, 50000):
+        source = SAMPLE * repetitions
+        session = LexerSession(source)
+        offset = len(source) // 2
+
+        start = time.perf_counter()
+        for step in range(EDITS):
+            # Alternate typing and deleting an identifier character
+            if step % 2 == 0:
+                session.edit(offset, 0, "q")
+            else:
+                session.edit(offset, 1, "")
+        per_edit = (time.perf_counter() - start) / EDITS
+
+        start = time.perf_counter()
+        lexical_analyzer(source)
+        full = time.perf_counter() - start
+        print(f"{len(source):>10} chars: {per_edit * 1e6:8.1f} us/edit, full re-lex {full * 1e3:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
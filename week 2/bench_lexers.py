@@ -0,0 +1,114 @@
+# Head-to-head benchmark of the lexer backends in lexers.py
+#
+# Usage: python bench_lexers.py [megabytes] [--backend NAME]
+#
+# Every backend lexes the same generated corpus (2 MB of the bench_dfa_lexer
+# sample by default) in a fresh child process, so peak RSS is not inflated
+# by the other backends. Reported per backend:
+#
+#   tokens/sec    best of three runs, consuming the iterator without
+#                 keeping the tokens
+#   MB/s          the same runs in input size, the fair speed comparison
+#                 since backends split the input into different tokens
+#   blocks/token  memory blocks live per token once the tokens are
+#                 collected into a list (tracemalloc). These are what the
+#                 token list keeps, not how many allocations lexing made:
+#                 blocks freed along the way are not counted.
+#   bytes/token   bytes those blocks take
+#   peak RSS      of the child process, with the corpus and the token list
+#                 in memory
+#
+# Token counts differ between backends: they do not split the input the
+# same way (the character loop knows no strings or braces, so it returns
+# an UNKNOWN token for every character of them).
+
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from bench_dfa_lexer import SAMPLE
+from lexers import BACKENDS, get_lexer
+
+ROUNDS = 3
+
+
+def make_corpus(megabytes):
+    return SAMPLE * max(int(megabytes * 1e6 / len(SAMPLE)), 1)
+
+
+def count_tokens(lexer, source_code):
+    count = 0
+    for _ in lexer.tokens(source_code):
+        count += 1
+    return count
+
+
+def measure(name, megabytes):
+    # Runs in the child process for one backend
+    lexer = get_lexer(name)
+    source_code = make_corpus(megabytes)
+
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        count = count_tokens(lexer, source_code)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tokens = list(lexer.tokens(source_code))
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del tokens
+
+    tracemalloc.start()
+    tokens = list(lexer.tokens(source_code))
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = snapshot.statistics('filename')
+    blocks = sum(stat.count for stat in statistics)
+    size = sum(stat.size for stat in statistics)
+
+    return {
+        'backend': name,
+        'chars': len(source_code),
+        'tokens': count,
+        'seconds': best,
+        'tokens_per_sec': count / best,
+        'mb_per_sec': len(source_code) / best / 1e6,
+        'blocks_per_token': blocks / len(tokens),
+        'bytes_per_token': size / len(tokens),
+        'peak_rss_mb': peak_rss_kb / 1024,
+    }
+
+
+def run_child(name, megabytes):
+    output = subprocess.run([sys.executable, __file__, str(megabytes), '--backend', name],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    args = sys.argv[1:]
+    if '--backend' in args:
+        index = args.index('--backend')
+        name = args[index + 1]
+        del args[index:index + 2]
+        megabytes = float(args[0]) if args else 2
+        print(json.dumps(measure(name, megabytes)))
+        return
+
+    megabytes = float(args[0]) if args else 2
+    print(f"Input: {len(make_corpus(megabytes)) / 1e6:.1f} MB")
+    print(f"{'backend':14} {'tokens':>10} {'tokens/sec':>12} {'MB/s':>6} {'blocks/token':>13} {'bytes/token':>12} {'peak RSS':>10}")
+    results = [run_child(name, megabytes) for name in BACKENDS]
+    for result in results:
+        print(f"{result['backend']:14} {result['tokens']:>10} {result['tokens_per_sec']:>12,.0f} "
+              f"{result['mb_per_sec']:>6.2f} {result['blocks_per_token']:>13.2f} {result['bytes_per_token']:>12.1f} "
+              f"{result['peak_rss_mb']:>8.1f}MB")
+    fastest = max(results, key=lambda result: result['mb_per_sec'])
+    print(f"Fastest on this corpus: {fastest['backend']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+# Ahead-of-time DFA lexer generator
+#
+# Compiles an ordered token spec such as TOKEN_TYPES in main.py into a
+# minimized DFA and writes it out as a standalone Python module holding
+# array-backed transition tables and a scanning loop. The generated module
+# does not import re, so loading it costs no regex compilation.
+#
+# Usage: python dfa_generator.py [output.py]   (default: zara_dfa_lexer.py)
+#
+# Supported regex subset: literals, escapes, ., [...] classes, \d \w \s and
+# their negations, groups, |, *, + and ? and the \b word-boundary assertion.
+# The generated scanner uses longest match with ties going to the earlier
+# spec entry. For TOKEN_TYPES that gives the same tokens as the ordered
+# alternation used by re.finditer (bench_dfa_lexer.py checks this).
+
+import re
+import sys
+
+# Every ASCII character is its own input symbol. Characters above ASCII are
+# only ever matched through \d, \w, \s and ., so one representative of each
+# kind is enough: a decimal digit, another word character, whitespace and
+# anything else.
+NONASCII_SAMPLES = ['\u0660', '\u00e9', '\u2003', '\u00a7']
+SYMBOLS = [chr(code) for code in range(128)] + NONASCII_SAMPLES
+IS_WORD = [re.fullmatch(r'\w', ch) is not None for ch in SYMBOLS]
+
+# Requirement a \b assertion leaves on the character after the match so far
+ANY, NEXT_WORD, NEXT_OTHER = 0, 1, 2
+
+
+def symbol_set(source):
+    # Input symbols matched by a single-character regex such as [^"] or \d
+    return frozenset(i for i, ch in enumerate(SYMBOLS) if re.fullmatch(source, ch))
+
+
+class RegexParser:
+    # Parses one token pattern into a small syntax tree:
+    # ('set', symbols), ('bound',), ('cat', items), ('alt', branches),
+    # ('star', node), ('plus', node), ('opt', node)
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.pos = 0
+
+    def error(self, message):
+        raise ValueError(f"{message} at position {self.pos} in pattern {self.pattern!r}")
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def parse(self):
+        if any(ord(ch) > 127 for ch in self.pattern):
+            self.error("Non-ASCII literal not supported")
+        node = self.alternation()
+        if self.pos != len(self.pattern):
+            self.error("Unbalanced ')'")
+        return node
+
+    def alternation(self):
+        branches = [self.concatenation()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.concatenation())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def concatenation(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.repetition())
+        return ('cat', items)
+
+    def repetition(self):
+        node = self.atom()
+        while self.peek() in ('*', '+', '?'):
+            kind = {'*': 'star', '+': 'plus', '?': 'opt'}[self.peek()]
+            self.pos += 1
+            if self.peek() == '?':
+                self.error("Lazy quantifier not supported")
+            node = (kind, node)
+        if self.peek() == '{':
+            self.error("Counted repetition not supported")
+        return node
+
+    def atom(self):
+        ch = self.peek()
+        if ch == '(':
+            self.pos += 1
+            if self.pattern.startswith('?:', self.pos):
+                self.pos += 2
+            elif self.peek() == '?':
+                self.error("Group extension not supported")
+            node = self.alternation()
+            if self.peek() != ')':
+                self.error("Missing ')'")
+            self.pos += 1
+            return node
+        if ch == '[':
+            end = self.pos + 1
+            if end < len(self.pattern) and self.pattern[end] == '^':
+                end += 1
+            if end < len(self.pattern) and self.pattern[end] == ']':
+                end += 1
+            while end < len(self.pattern) and self.pattern[end] != ']':
+                end += 2 if self.pattern[end] == '\\' else 1
+            if end >= len(self.pattern):
+                self.error("Missing ']'")
+            source = self.pattern[self.pos:end + 1]
+            self.pos = end + 1
+            return ('set', symbol_set(source))
+        if ch == '\\':
+            source = self.pattern[self.pos:self.pos + 2]
+            if len(source) < 2:
+                self.error("Dangling backslash")
+            self.pos += 2
+            if source == r'\b':
+                return ('bound',)
+            if source[1] in 'ABZ' or source[1].isdigit():
+                self.error(f"Escape {source} not supported")
+            return ('set', symbol_set(source))
+        if ch in ('^', '$'):
+            self.error("Anchors not supported")
+        if ch in ('*', '+', '?', '{'):
+            self.error("Nothing to repeat")
+        self.pos += 1
+        return ('set', symbol_set('.' if ch == '.' else re.escape(ch)))
+
+
+class NFA:
+    # Thompson-style NFA with three kinds of edges: epsilon, symbol set and
+    # \b. Each token's final state is recorded in `accepts`.
+    def __init__(self):
+        self.epsilon = []
+        self.moves = []
+        self.bounds = []
+        self.accepts = {}
+        self.start = self.new_state()
+
+    def new_state(self):
+        self.epsilon.append([])
+        self.moves.append([])
+        self.bounds.append([])
+        return len(self.epsilon) - 1
+
+    def add_token(self, token_index, node):
+        final = self.new_state()
+        self.build(node, self.start, final)
+        self.accepts[final] = token_index
+
+    def build(self, node, start, end):
+        kind = node[0]
+        if kind == 'set':
+            self.moves[start].append((node[1], end))
+        elif kind == 'bound':
+            self.bounds[start].append(end)
+        elif kind == 'cat':
+            current = start
+            for item in node[1]:
+                following = self.new_state()
+                self.build(item, current, following)
+                current = following
+            self.epsilon[current].append(end)
+        elif kind == 'alt':
+            for branch in node[1]:
+                entry = self.new_state()
+                self.epsilon[start].append(entry)
+                self.build(branch, entry, end)
+        elif kind == 'opt':
+            self.epsilon[start].append(end)
+            entry = self.new_state()
+            self.epsilon[start].append(entry)
+            self.build(node[1], entry, end)
+        elif kind == 'star':
+            loop = self.new_state()
+            body_end = self.new_state()
+            self.epsilon[start].append(loop)
+            self.build(node[1], loop, body_end)
+            self.epsilon[body_end].append(loop)
+            self.epsilon[loop].append(end)
+        elif kind == 'plus':
+            self.build(('cat', [node[1], ('star', node[1])]), start, end)
+
+    def closure(self, configs, prev_word):
+        # Configurations are (state, requirement) pairs. Crossing \b is only
+        # possible if the next character differs in word-ness from the
+        # previous one, which is recorded as a requirement on the next symbol.
+        needed = NEXT_OTHER if prev_word else NEXT_WORD
+        seen = set(configs)
+        stack = list(configs)
+        while stack:
+            state, requirement = stack.pop()
+            reached = [(target, requirement) for target in self.epsilon[state]]
+            if requirement in (ANY, needed):
+                reached += [(target, needed) for target in self.bounds[state]]
+            for config in reached:
+                if config not in seen:
+                    seen.add(config)
+                    stack.append(config)
+        return frozenset(seen)
+
+    def step(self, configs, symbol):
+        word = IS_WORD[symbol]
+        reached = set()
+        for state, requirement in configs:
+            if requirement == NEXT_WORD and not word:
+                continue
+            if requirement == NEXT_OTHER and word:
+                continue
+            for symbols, target in self.moves[state]:
+                if symbol in symbols:
+                    reached.add((target, ANY))
+        return self.closure(reached, word)
+
+    def accept(self, configs, next_word):
+        # Best (lowest index) token accepted if the next character is or is
+        # not a word character; -1 if none
+        rejected = NEXT_OTHER if next_word else NEXT_WORD
+        tokens = [self.accepts[state] for state, requirement in configs
+                  if state in self.accepts and requirement != rejected]
+        return min(tokens) if tokens else -1
+
+
+def build_dfa(nfa):
+    # Subset construction. State 0 is the dead state.
+    dead = frozenset()
+    states = [dead]
+    index = {dead: 0}
+    transitions = []
+    starts = []
+    for prev_word in (False, True):
+        configs = nfa.closure({(nfa.start, ANY)}, prev_word)
+        if configs not in index:
+            index[configs] = len(states)
+            states.append(configs)
+        starts.append(index[configs])
+
+    current = 0
+    while current < len(states):
+        row = []
+        for symbol in range(len(SYMBOLS)):
+            target = nfa.step(states[current], symbol)
+            if target not in index:
+                index[target] = len(states)
+                states.append(target)
+            row.append(index[target])
+        transitions.append(row)
+        current += 1
+
+    accept_other = [nfa.accept(configs, False) for configs in states]
+    accept_word = [nfa.accept(configs, True) for configs in states]
+    return transitions, accept_other, accept_word, starts
+
+
+def minimize(transitions, accept_other, accept_word, starts):
+    # Moore partition refinement, starting from states grouped by what they
+    # accept. The block holding the dead state is renumbered to 0.
+    n_states = len(transitions)
+    labels = {}
+    block = [labels.setdefault((accept_other[s], accept_word[s]), len(labels)) for s in range(n_states)]
+    while True:
+        signatures = {}
+        refined = [
+            signatures.setdefault((block[s], tuple(block[t] for t in transitions[s])), len(signatures))
+            for s in range(n_states)
+        ]
+        if len(signatures) == len(set(block)):
+            break
+        block = refined
+
+    order = {block[0]: 0}
+    for s in range(n_states):
+        order.setdefault(block[s], len(order))
+    block = [order[b] for b in block]
+
+    n_blocks = len(order)
+    new_transitions = [None] * n_blocks
+    new_other = [None] * n_blocks
+    new_word = [None] * n_blocks
+    for s in range(n_states):
+        b = block[s]
+        if new_transitions[b] is None:
+            new_transitions[b] = [block[t] for t in transitions[s]]
+            new_other[b] = accept_other[s]
+            new_word[b] = accept_word[s]
+    return new_transitions, new_other, new_word, [block[s] for s in starts]
+
+
+def compress_alphabet(transitions):
+    # Merge input symbols with identical columns (and the same word-ness,
+    # which decides \b acceptance) into character classes
+    classes = {}
+    symbol_class = []
+    for symbol in range(len(SYMBOLS)):
+        column = (IS_WORD[symbol], tuple(row[symbol] for row in transitions))
+        symbol_class.append(classes.setdefault(column, len(classes)))
+    representatives = [None] * len(classes)
+    for symbol, cls in enumerate(symbol_class):
+        if representatives[cls] is None:
+            representatives[cls] = symbol
+    class_transitions = [[row[representatives[cls]] for cls in range(len(classes))] for row in transitions]
+    class_word = [IS_WORD[symbol] for symbol in representatives]
+    return symbol_class, class_transitions, class_word
+
+
+def compile_spec(token_types):
+    # Build the minimized, class-compressed DFA for an ordered token spec
+    # (a dict or a list of (name, pattern) pairs)
+    items = list(token_types.items()) if isinstance(token_types, dict) else list(token_types)
+    nfa = NFA()
+    for token_index, (name, pattern) in enumerate(items):
+        nfa.add_token(token_index, RegexParser(pattern).parse())
+    transitions, accept_other, accept_word, starts = minimize(*build_dfa(nfa))
+    symbol_class, class_transitions, class_word = compress_alphabet(transitions)
+    return {
+        'names': [name for name, pattern in items],
+        'symbol_class': symbol_class,
+        'transitions': class_transitions,
+        'accept_other': accept_other,
+        'accept_word': accept_word,
+        'class_word': class_word,
+        'starts': starts,
+    }
+
+
+MODULE_TEMPLATE = '''\
+# Generated by dfa_generator.py -- do not edit by hand.
+# DFA lexer for: {names}
+from array import array
+
+TOKEN_NAMES = {names!r}
+SKIP = frozenset({skip!r})
+
+N_CLASSES = {n_classes}
+START = {start}
+START_AFTER_WORD = {start_after_word}
+
+# Character class of each ASCII character
+ASCII_CLASS = {ascii_class!r}
+# Classes of non-ASCII decimal digits, other word characters, whitespace
+# and everything else
+DIGIT_CLASS, WORD_CLASS, SPACE_CLASS, OTHER_CLASS = {nonascii_classes!r}
+# 1 for classes made of word characters (\\w), used for \\b
+CLASS_IS_WORD = {class_word!r}
+
+# TRANSITIONS[state * N_CLASSES + cls] is the next state, 0 is dead
+TRANSITIONS = array('H', {transitions!r})
+# ACCEPT[state * 2 + next_is_word] is the token accepted in `state` given
+# the class of the following character (end of input counts as non-word),
+# or -1
+ACCEPT = array('b', {accept!r})
+
+# One row of TRANSITIONS per state, saving a multiply per character
+_ROWS = [TRANSITIONS[offset:offset + N_CLASSES] for offset in range(0, len(TRANSITIONS), N_CLASSES)]
+
+
+class _ClassTable(dict):
+    # str.translate table mapping characters to class bytes; non-ASCII
+    # characters are classified on first sight and cached
+    def __missing__(self, code):
+        ch = chr(code)
+        if ch.isdecimal():
+            cls = DIGIT_CLASS
+        elif ch.isalnum():
+            cls = WORD_CLASS
+        elif ch.isspace():
+            cls = SPACE_CLASS
+        else:
+            cls = OTHER_CLASS
+        self[code] = chr(cls)
+        return self[code]
+
+
+_CLASS_TABLE = _ClassTable((code, chr(cls)) for code, cls in enumerate(ASCII_CLASS))
+
+
+def _backtrack(classes, pos, start):
+    # Longest accepted match from pos, remembering every accepting state on
+    # the way. Only needed when the DFA runs past its last accepting state
+    # (e.g. "2." followed by a non-digit).
+    rows = _ROWS
+    accept = ACCEPT
+    is_word = CLASS_IS_WORD
+    n = len(classes)
+    state = start
+    i = pos
+    kind = -1
+    end = pos + 1
+    while i < n:
+        state = rows[state][classes[i]]
+        if not state:
+            break
+        i += 1
+        found = accept[state * 2 + is_word[classes[i]]] if i < n else accept[state * 2]
+        if found >= 0:
+            kind = found
+            end = i
+    return kind, end
+
+
+def tokenize(text):
+    # Same result as lexical_analyzer: a list of (type, value) tuples with
+    # skipped tokens left out. Characters no token matches are skipped too.
+    classes = text.translate(_CLASS_TABLE).encode('latin-1')
+    rows = _ROWS
+    accept = ACCEPT
+    is_word = CLASS_IS_WORD
+    names = TOKEN_NAMES
+    skip = SKIP
+    n = len(text)
+    tokens = []
+    append = tokens.append
+    pos = 0
+    start = START
+    while pos < n:
+        # Run the DFA until it dies, then check that the final state accepts
+        state = start
+        i = pos
+        while i < n:
+            following = rows[state][classes[i]]
+            if not following:
+                break
+            state = following
+            i += 1
+        kind = accept[state * 2 + is_word[classes[i]]] if i < n else accept[state * 2]
+        if kind >= 0 and i > pos:
+            end = i
+        else:
+            kind, end = _backtrack(classes, pos, start)
+        if kind >= 0 and kind not in skip:
+            append((names[kind], text[pos:end]))
+        pos = end
+        start = START_AFTER_WORD if is_word[classes[end - 1]] else START
+    return tokens
+'''
+
+
+def generate_module(token_types, skip=('WHITESPACE',)):
+    # Source code of a standalone lexer module for the given spec
+    tables = compile_spec(token_types)
+    names = tables['names']
+    symbol_class = tables['symbol_class']
+    accept = []
+    for other, word in zip(tables['accept_other'], tables['accept_word']):
+        accept += [other, word]
+    return MODULE_TEMPLATE.format(
+        names=tuple(names),
+        skip=sorted(names.index(name) for name in skip if name in names),
+        n_classes=len(tables['transitions'][0]),
+        start=tables['starts'][0],
+        start_after_word=tables['starts'][1],
+        ascii_class=bytes(symbol_class[:128]),
+        nonascii_classes=tuple(symbol_class[128:]),
+        class_word=bytes(int(word) for word in tables['class_word']),
+        transitions=[target for row in tables['transitions'] for target in row],
+        accept=accept,
+    )
+
+
+def main():
+    from main import TOKEN_TYPES
+
+    output = sys.argv[1] if len(sys.argv) > 1 else 'zara_dfa_lexer.py'
+    with open(output, 'w') as f:
+        f.write(generate_module(TOKEN_TYPES))
+    print(f"Wrote DFA lexer to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# Incremental re-lexing for editor integration
+#
+# LexerSession keeps the token stream of a buffer and, on each edit,
+# re-scans only from the last safe restart point before the edit until the
+# new tokens line up with the old ones again. Tokens use the same rules as
+# lexical_analyzer and tokens() always equals lexical_analyzer(text).
+#
+# The text is kept in chunks of up to CHUNK_SIZE characters and the tokens
+# in blocks of up to TOKEN_BLOCK (see TokenBlocks), so an edit only rebuilds
+# the chunks and blocks it touches. Where chunks and blocks start is stored
+# gap-style (see GapOffsets), so an edit never has to shift the offsets of
+# everything after it, and its cost does not grow with the size of the text.
+
+from bisect import bisect_left
+
+from main import LOOKAHEAD, token_pattern
+
+CHUNK_SIZE = 4096
+TOKEN_BLOCK = 64
+
+
+class GapOffsets:
+    # Sorted offsets into a text whose length changes. Entries before `gap`
+    # hold their absolute offset, entries from `gap` on hold their offset
+    # minus the text length, so an edit before them leaves them valid.
+    # Moving the gap only costs the distance it moves.
+    def __init__(self, offsets):
+        self.values = list(offsets)
+        self.gap = len(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, index, length):
+        value = self.values[index]
+        return value if index < self.gap else value + length
+
+    def move_gap(self, index, length):
+        values = self.values
+        while self.gap < index:
+            values[self.gap] += length
+            self.gap += 1
+        while self.gap > index:
+            self.gap -= 1
+            values[self.gap] -= length
+
+    def count_before(self, position, length):
+        # Number of entries whose offset is below position. Both sides of
+        # the gap are sorted, so each can be bisected as stored.
+        values = self.values
+        gap = self.gap
+        if gap and values[gap - 1] >= position:
+            return bisect_left(values, position, 0, gap)
+        return bisect_left(values, position - length, gap)
+
+    def replace(self, first, last, offsets, length):
+        # Replace entries [first:last] with absolute offsets in a text of
+        # the given length; the gap must be at `first`
+        self.values[first:last] = [offset - length for offset in offsets]
+
+
+class TokenBlocks:
+    # The token stream, as columns of types, values and start offsets cut
+    # into blocks of up to TOKEN_BLOCK tokens. A block's starts are relative
+    # to its first token's; that offset and the index of its first token
+    # are GapOffsets over the blocks, against the text length and the token
+    # count. Methods that read offsets take the current text length.
+    def __init__(self, types, values, starts, length):
+        self.blocks = []  # (types, values, relative starts)
+        self.count = 0
+        self.bases = GapOffsets(())
+        self.firsts = GapOffsets(())
+        self.replace(0, 0, types, values, starts, length, length)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # (type, value) of every token
+        for types, values, starts in self.blocks:
+            yield from zip(types, values)
+
+    def block_of(self, index):
+        return self.firsts.count_before(index + 1, self.count) - 1
+
+    def value(self, index):
+        block = self.block_of(index)
+        return self.blocks[block][1][index - self.firsts.get(block, self.count)]
+
+    def start(self, index, length):
+        block = self.block_of(index)
+        return self.bases.get(block, length) + self.blocks[block][2][index - self.firsts.get(block, self.count)]
+
+    def count_before(self, position, length):
+        # Number of tokens starting before position
+        block = self.bases.count_before(position, length) - 1
+        if block < 0:
+            return 0
+        starts = self.blocks[block][2]
+        return self.firsts.get(block, self.count) + bisect_left(starts, position - self.bases.get(block, length))
+
+    def starts_from(self, index, length):
+        # Start offsets of the tokens from index on, in order
+        if index >= self.count:
+            return
+        block = self.block_of(index)
+        skip = index - self.firsts.get(block, self.count)
+        for block in range(block, len(self.blocks)):
+            base = self.bases.get(block, length)
+            for start in self.blocks[block][2][skip:]:
+                yield base + start
+            skip = 0
+
+    def replace(self, first, last, types, values, starts, old_length, new_length):
+        # Replace tokens [first:last] with new ones, whose starts are
+        # offsets in the new text. The text went from old_length to
+        # new_length characters, moving the tokens from last on by the
+        # difference. The blocks holding first and last are rebuilt, with a
+        # neighbour if they come out under half full.
+        blocks = self.blocks
+        count = self.count
+        delta = new_length - old_length
+        if blocks:
+            first_block = self.block_of(min(first, count - 1))
+            last_block = self.block_of(last - 1) if last > first else first_block
+            block_first = self.firsts.get(first_block, count)
+        else:
+            first_block, last_block, block_first = 0, -1, 0
+        merged_types = []
+        merged_values = []
+        merged_starts = []
+        if blocks:
+            kept = first - block_first
+            block_types, block_values, block_starts = blocks[first_block]
+            base = self.bases.get(first_block, old_length)
+            merged_types += block_types[:kept]
+            merged_values += block_values[:kept]
+            merged_starts += [base + start for start in block_starts[:kept]]
+        merged_types += types
+        merged_values += values
+        merged_starts += starts
+        if blocks:
+            skip = last - self.firsts.get(last_block, count)
+            while True:
+                block_types, block_values, block_starts = blocks[last_block]
+                base = self.bases.get(last_block, old_length) + delta
+                merged_types += block_types[skip:]
+                merged_values += block_values[skip:]
+                merged_starts += [base + start for start in block_starts[skip:]]
+                if len(merged_types) >= TOKEN_BLOCK // 2 or last_block + 1 >= len(blocks):
+                    break
+                last_block += 1
+                skip = 0
+
+        new_blocks = []
+        new_bases = []
+        new_firsts = []
+        total = len(merged_types)
+        pieces = -(-total // TOKEN_BLOCK)
+        for piece in range(pieces):
+            low = total * piece // pieces
+            high = total * (piece + 1) // pieces
+            base = merged_starts[low]
+            new_blocks.append((merged_types[low:high], merged_values[low:high],
+                               [start - base for start in merged_starts[low:high]]))
+            new_bases.append(base)
+            new_firsts.append(block_first + low)
+        new_count = count - (last - first) + len(types)
+        self.bases.move_gap(first_block, old_length)
+        self.firsts.move_gap(first_block, count)
+        self.bases.replace(first_block, last_block + 1, new_bases, new_length)
+        self.firsts.replace(first_block, last_block + 1, new_firsts, new_count)
+        blocks[first_block:last_block + 1] = new_blocks
+        self.count = new_count
+
+
+class LexerSession:
+    def __init__(self, source_code=""):
+        self.length = len(source_code)
+        self.chunks = [source_code[start:start + CHUNK_SIZE]
+                       for start in range(0, len(source_code), CHUNK_SIZE)] or [""]
+        self.chunk_starts = GapOffsets(range(0, max(len(source_code), 1), CHUNK_SIZE))
+        types = []
+        values = []
+        starts = []
+        # Start of the UNKNOWN '"' token, or -1. It means no closing quote
+        # follows anywhere, so there is at most one: the last quote.
+        self.open_quote = -1
+        for match in token_pattern.finditer(source_code):
+            if match.lastgroup != 'WHITESPACE':
+                types.append(match.lastgroup)
+                values.append(match.group())
+                starts.append(match.start())
+                if match.lastgroup == 'UNKNOWN' and match.group() == '"':
+                    self.open_quote = match.start()
+        self.stream = TokenBlocks(types, values, starts, self.length)
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def tokens(self):
+        return list(self.stream)
+
+    def token_start(self, index):
+        return self.stream.start(index, self.length)
+
+    def token_end(self, index):
+        return self.stream.start(index, self.length) + len(self.stream.value(index))
+
+    def read(self, start, end):
+        # Text between two offsets, joined from the chunks covering it
+        start = max(start, 0)
+        end = min(end, self.length)
+        if start >= end:
+            return ""
+        index = max(self.chunk_starts.count_before(start + 1, self.length) - 1, 0)
+        pieces = []
+        while index < len(self.chunks):
+            chunk_start = self.chunk_starts.get(index, self.length)
+            if chunk_start >= end:
+                break
+            pieces.append(self.chunks[index][max(start - chunk_start, 0):end - chunk_start])
+            index += 1
+        return "".join(pieces)
+
+    def restart_point(self, offset, inserted_text):
+        # Index of the first token to re-scan and the offset to re-scan from.
+        # A token is only safe if every character the regex looked at while
+        # lexing it lies before the edit. Inside a run of word characters and
+        # dots that can reach to the end of the run (a NUMBER "2" in
+        # "2.55x" is only settled at the "x", and every character in "25x"
+        # is UNKNOWN because \b fails), so the whole run touching the edit
+        # is re-scanned. Other tokens only depend on their own characters.
+        run_start = offset
+        while run_start:
+            before = self.read(run_start - 64, run_start)
+            kept = len(before)
+            while kept and (before[kept - 1] in '._' or before[kept - 1].isalnum()):
+                kept -= 1
+            run_start -= len(before) - kept
+            if kept:
+                break
+
+        # The first token ending after run_start: of those starting before
+        # it, only the last can reach past it
+        index = self.stream.count_before(run_start, self.length)
+        if index and self.token_end(index - 1) > run_start:
+            index -= 1
+        position = self.token_end(index - 1) if index else 0
+
+        # The unmatched quote was lexed as UNKNOWN because no closing quote
+        # followed it; inserting a quote after it changes that
+        if '"' in inserted_text and 0 <= self.open_quote < position:
+            index = self.stream.count_before(self.open_quote, self.length)
+            position = self.open_quote
+        return index, position
+
+    def splice(self, offset, removed_len, inserted_text):
+        # Replace text in the chunks covering the edit
+        length = self.length
+        end = offset + removed_len
+        chunk_starts = self.chunk_starts
+        first = max(chunk_starts.count_before(offset + 1, length) - 1, 0)
+        last = max(chunk_starts.count_before(end + 1, length) - 1, first)
+        chunk_starts.move_gap(first, length)
+        first_start = chunk_starts.get(first, length)
+        last_start = chunk_starts.get(last, length)
+        piece = (self.chunks[first][:offset - first_start] + inserted_text
+                 + self.chunks[last][end - last_start:])
+
+        new_length = length - removed_len + len(inserted_text)
+        offsets = list(range(0, len(piece), CHUNK_SIZE))
+        if not offsets and len(self.chunks) == last - first + 1:
+            offsets = [0]  # Keep one chunk for an empty text
+        self.chunks[first:last + 1] = [piece[start:start + CHUNK_SIZE] for start in offsets]
+        chunk_starts.replace(first, last + 1, [first_start + start for start in offsets], new_length)
+        self.length = new_length
+
+    def edit(self, offset, removed_len, inserted_text):
+        # Apply an edit and re-lex around it. Returns (first, old_end,
+        # new_end): tokens[first:new_end] replaced the old tokens
+        # [first:old_end], everything else is unchanged.
+        if offset < 0 or removed_len < 0 or offset + removed_len > self.length:
+            raise ValueError(f"Edit ({offset}, {removed_len}) outside of text of length {self.length}")
+        first, position = self.restart_point(offset, inserted_text)
+        restart = position
+
+        old_length = self.length
+        old_edit_end = offset + removed_len
+        new_edit_end = offset + len(inserted_text)
+        delta = len(inserted_text) - removed_len
+        self.splice(offset, removed_len, inserted_text)
+        new_length = self.length
+        # Old token starts from the restart on, in the old text; the ones
+        # after the edit are delta further on in the new one
+        old_starts = self.stream.starts_from(first, old_length)
+        old_start = next(old_starts, None)
+
+        old_end = first
+        total = len(self.stream)
+        new_types = []
+        new_values = []
+        new_starts = []
+        window_start = max(position - 1, 0)  # One character of \b context
+        window = self.read(window_start, window_start + CHUNK_SIZE)
+        while position < new_length:
+            # Skip old tokens that now start before the scan position
+            while old_start is not None and old_start + delta < position:
+                old_end += 1
+                old_start = next(old_starts, None)
+            if (position > new_edit_end and old_start is not None
+                    and old_start + delta == position and old_start >= old_edit_end):
+                break  # Re-synchronized: the rest of the stream is unchanged
+            local = position - window_start
+            window_end = window_start + len(window)
+            match = token_pattern.match(window, local) if local < len(window) else None
+            if window_end < new_length and (
+                    match is None or match.end() + LOOKAHEAD > len(window)
+                    or (match.lastgroup == 'UNKNOWN' and window[local] == '"')):
+                # The token may continue past the window, as in the
+                # streaming lexer; read more and try again
+                window += self.read(window_end, window_end + max(len(window), CHUNK_SIZE))
+                continue
+            if match.lastgroup != 'WHITESPACE':
+                new_types.append(match.lastgroup)
+                new_values.append(match.group())
+                new_starts.append(position)
+            position = window_start + match.end()
+        else:
+            old_end = total
+
+        # Keep track of the unmatched quote
+        resync = old_start + delta if old_end < total else None
+        if self.open_quote >= 0:
+            if resync is not None and self.open_quote + delta >= resync:
+                self.open_quote += delta
+            elif self.open_quote >= restart:
+                self.open_quote = -1
+        for kind, value, start in zip(new_types, new_values, new_starts):
+            if kind == 'UNKNOWN' and value == '"':
+                self.open_quote = start
+
+        self.stream.replace(first, old_end, new_types, new_values, new_starts, old_length, new_length)
+        return first, old_end, first + len(new_types)
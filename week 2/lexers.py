@@ -0,0 +1,70 @@
+# One interface over the three Zara scanners in this repo
+#
+# A Lexer turns source code into an iterator of (type, value) tokens and
+# does no I/O. The backends are the scan_tokens generators of:
+#
+#   char_loop     week 1/main.py, the hand-written character loop
+#   regex         week 1/reg.py, the week 1 patterns as one alternation
+#   master_regex  main.py in this folder, the rules of lexical_analyzer
+#
+# Each backend keeps its own token vocabulary (week 1 has PLUS, IF, ...,
+# week 2 has OPERATOR, KEYWORD, ...) and its own idea of what is UNKNOWN,
+# so token streams are only comparable within a backend.
+#
+#   lexer = get_lexer('master_regex')
+#   for token_type, token_value in lexer.tokens(source_code):
+#       ...
+
+import importlib.util
+import os
+
+WEEK1_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'week 1')
+
+DEFAULT_BACKEND = 'master_regex'
+
+
+def load_week1(filename, module_name):
+    # The week 1 scripts share module names with this folder (main.py), so
+    # they are loaded from their path under a name of their own
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(WEEK1_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_master_regex():
+    import main
+    return main.scan_tokens
+
+
+# Backends are imported the first time they are asked for, so that picking
+# one does not pay for loading the others
+LOADERS = {
+    'char_loop': lambda: load_week1('main.py', 'week1_main').scan_tokens,
+    'regex': lambda: load_week1('reg.py', 'week1_reg').scan_tokens,
+    'master_regex': load_master_regex,
+}
+BACKENDS = tuple(LOADERS)
+
+_scanners = {}
+
+
+class Lexer:
+    def __init__(self, name, scan):
+        self.name = name
+        self.scan = scan
+
+    def tokens(self, source_code):
+        # Iterator of (type, value) pairs for the whole source
+        return self.scan(source_code)
+
+    def __repr__(self):
+        return f"Lexer({self.name!r})"
+
+
+def get_lexer(name=DEFAULT_BACKEND):
+    if name not in LOADERS:
+        raise ValueError(f"Unknown lexer backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    if name not in _scanners:
+        _scanners[name] = LOADERS[name]()
+    return Lexer(name, _scanners[name])
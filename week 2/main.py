@@ -1,3 +1,4 @@
+import codecs
 import re
 
 # Token types
@@ -13,10 +14,25 @@ TOKEN_TYPES = {
 
 # Combine token patterns into one regex
 token_regex = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_TYPES.items())
+token_pattern = re.compile(token_regex)
+
+# Default number of characters read per chunk by the streaming lexer
+CHUNK_SIZE = 64 * 1024
+
+# No token decision needs to look more than two characters past the end of
+# its match (a NUMBER like "2" may still be followed by ".5"), so a match that
+# ends closer than this to the end of the buffer waits for the next chunk.
+LOOKAHEAD = 2
+
+# The streaming lexer holds the text after an opening quote until it sees
+# the closing one. Past this many characters it gives up and yields the
+# quote as an UNKNOWN token, as lexical_analyzer does for a quote that is
+# never closed, and lexes the rest as if there were no string.
+STRING_LIMIT = 1024 * 1024
 
 def lexical_analyzer(source_code):
     tokens = []
-    for match in re.finditer(token_regex, source_code):
+    for match in token_pattern.finditer(source_code):
         token_type = match.lastgroup
         token_value = match.group(token_type)
         
@@ -24,16 +40,102 @@ def lexical_analyzer(source_code):
             tokens.append((token_type, token_value))
     return tokens
 
+def scan_tokens(source_code):
+    # Generator version of lexical_analyzer: the same (type, value) pairs,
+    # produced one at a time
+    for match in token_pattern.finditer(source_code):
+        token_type = match.lastgroup
+        if token_type != 'WHITESPACE':
+            yield (token_type, match.group(token_type))
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    # Read a file object or mmap piece by piece, decoding bytes as UTF-8.
+    # The incremental decoder keeps multi-byte characters that straddle two
+    # chunks intact.
+    decoder = None
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+def stream_lexical_analyzer(source, chunk_size=CHUNK_SIZE, string_limit=STRING_LIMIT):
+    # Generator version of lexical_analyzer for sources too large to hold in
+    # memory. Yields (type, value, line, col) tuples, 1-based, and produces
+    # exactly the tokens lexical_analyzer would for the whole text, except
+    # that a string longer than string_limit is lexed as an unclosed quote.
+    # Only the unconsumed tail of the input is kept, so memory stays bounded
+    # by the chunk size plus the longest single token or string_limit. With
+    # string_limit None there is no exception, and no bound after a quote
+    # that is never closed.
+    chunks = read_chunks(source, chunk_size)
+    buffer = ""
+    pos = 0
+    eof = False
+    line = 1
+    col = 1
+
+    while True:
+        if not eof:
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                # Drop the consumed prefix, keeping one character so that
+                # \b at the new start still sees what came before it
+                keep = max(pos - 1, 0)
+                buffer = buffer[keep:] + chunk
+                pos -= keep
+
+        end = len(buffer)
+        while pos < end:
+            match = token_pattern.match(buffer, pos)
+            token_type = match.lastgroup
+            if not eof:
+                # The token may continue in the next chunk: either the match
+                # runs up to the end of the buffer, or an opening quote has
+                # not seen its closing quote yet.
+                if match.end() + LOOKAHEAD > end:
+                    break
+                if (token_type == 'UNKNOWN' and buffer[pos] == '"'
+                        and (string_limit is None or end - pos <= string_limit)):
+                    break
+
+            token_value = match.group(token_type)
+            if token_type != 'WHITESPACE':
+                yield (token_type, token_value, line, col)
+
+            newlines = token_value.count("\n")
+            if newlines:
+                line += newlines
+                col = len(token_value) - token_value.rfind("\n")
+            else:
+                col += len(token_value)
+            pos = match.end()
+
+        if eof:
+            return
+
 def main():
     # Prompt user for input
     print("Enter Zara code (type 'exit' to finish):")
-    source_code = ""
+    lines = []
     
     while True:
         line = input()  # Read input line by line
         if line.strip().lower() == 'exit':  # Exit condition
             break
-        source_code += line + "\n"  # Append line to source_code
+        lines.append(line + "\n")  # Collect lines, joined once below
+    source_code = "".join(lines)
     
     # Test the lexical analyzer
     tokens = lexical_analyzer(source_code)
@@ -0,0 +1,108 @@
+# Generated by dfa_generator.py -- do not edit by hand.
+# DFA lexer for: ('KEYWORD', 'IDENTIFIER', 'NUMBER', 'STRING', 'OPERATOR', 'WHITESPACE', 'UNKNOWN')
+from array import array
+
+TOKEN_NAMES = ('KEYWORD', 'IDENTIFIER', 'NUMBER', 'STRING', 'OPERATOR', 'WHITESPACE', 'UNKNOWN')
+SKIP = frozenset([5])
+
+N_CLASSES = 17
+START = 1
+START_AFTER_WORD = 2
+
+# Character class of each ASCII character
+ASCII_CLASS = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x01\x01\x01\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x01\x01\x01\x01\x01\x00\x02\x00\x00\x00\x00\x00\x00\x00\x03\x03\x00\x03\x04\x03\x05\x05\x05\x05\x05\x05\x05\x05\x05\x05\x00\x00\x00\x03\x00\x00\x00\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x06\x00\x00\x00\x00\x06\x00\x06\x06\x06\x07\x08\t\x06\n\x0b\x06\x06\x0c\x06\x06\r\x06\x06\x06\x0e\x06\x06\x06\x0f\x06\x06\x06\x00\x00\x00\x00\x00'
+# Classes of non-ASCII decimal digits, other word characters, whitespace
+# and everything else
+DIGIT_CLASS, WORD_CLASS, SPACE_CLASS, OTHER_CLASS = (5, 16, 1, 0)
+# 1 for classes made of word characters (\w), used for \b
+CLASS_IS_WORD = b'\x00\x00\x00\x00\x00\x01\x01\x01\x01\x01\x01\x01\x01\x01\x01\x01\x01'
+
+# TRANSITIONS[state * N_CLASSES + cls] is the next state, 0 is dead
+TRANSITIONS = array('H', [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 4, 5, 6, 3, 7, 8, 9, 10, 8, 8, 11, 8, 8, 8, 12, 3, 3, 4, 5, 6, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 4, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 13, 13, 14, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 15, 16, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 17, 18, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 19, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 18, 17, 17, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 20, 17, 17, 17, 17, 17, 17, 13, 13, 14, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 13, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 21, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 15, 16, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 17, 17, 22, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 23, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 21, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 17, 17, 17, 18, 17, 17, 17, 17, 17, 17, 17, 17, 0, 0, 0, 0, 0, 17, 17, 17, 17, 17, 17, 17, 22, 17, 17, 17, 17])
+# ACCEPT[state * 2 + next_is_word] is the token accepted in `state` given
+# the class of the following character (end of input counts as non-word),
+# or -1
+ACCEPT = array('b', [-1, -1, -1, -1, -1, -1, 6, 6, 5, 5, 6, 6, 4, 4, 2, 6, 1, 6, 1, 6, 1, 6, 1, 6, 1, 6, -1, -1, 3, 3, -1, -1, 2, -1, 1, -1, 0, -1, 1, -1, 1, -1, 2, -1, 1, -1, 1, -1])
+
+# One row of TRANSITIONS per state, saving a multiply per character
+_ROWS = [TRANSITIONS[offset:offset + N_CLASSES] for offset in range(0, len(TRANSITIONS), N_CLASSES)]
+
+
+class _ClassTable(dict):
+    # str.translate table mapping characters to class bytes; non-ASCII
+    # characters are classified on first sight and cached
+    def __missing__(self, code):
+        ch = chr(code)
+        if ch.isdecimal():
+            cls = DIGIT_CLASS
+        elif ch.isalnum():
+            cls = WORD_CLASS
+        elif ch.isspace():
+            cls = SPACE_CLASS
+        else:
+            cls = OTHER_CLASS
+        self[code] = chr(cls)
+        return self[code]
+
+
+_CLASS_TABLE = _ClassTable((code, chr(cls)) for code, cls in enumerate(ASCII_CLASS))
+
+
+def _backtrack(classes, pos, start):
+    # Longest accepted match from pos, remembering every accepting state on
+    # the way. Only needed when the DFA runs past its last accepting state
+    # (e.g. "2." followed by a non-digit).
+    rows = _ROWS
+    accept = ACCEPT
+    is_word = CLASS_IS_WORD
+    n = len(classes)
+    state = start
+    i = pos
+    kind = -1
+    end = pos + 1
+    while i < n:
+        state = rows[state][classes[i]]
+        if not state:
+            break
+        i += 1
+        found = accept[state * 2 + is_word[classes[i]]] if i < n else accept[state * 2]
+        if found >= 0:
+            kind = found
+            end = i
+    return kind, end
+
+
+def tokenize(text):
+    # Same result as lexical_analyzer: a list of (type, value) tuples with
+    # skipped tokens left out. Characters no token matches are skipped too.
+    classes = text.translate(_CLASS_TABLE).encode('latin-1')
+    rows = _ROWS
+    accept = ACCEPT
+    is_word = CLASS_IS_WORD
+    names = TOKEN_NAMES
+    skip = SKIP
+    n = len(text)
+    tokens = []
+    append = tokens.append
+    pos = 0
+    start = START
+    while pos < n:
+        # Run the DFA until it dies, then check that the final state accepts
+        state = start
+        i = pos
+        while i < n:
+            following = rows[state][classes[i]]
+            if not following:
+                break
+            state = following
+            i += 1
+        kind = accept[state * 2 + is_word[classes[i]]] if i < n else accept[state * 2]
+        if kind >= 0 and i > pos:
+            end = i
+        else:
+            kind, end = _backtrack(classes, pos, start)
+        if kind >= 0 and kind not in skip:
+            append((names[kind], text[pos:end]))
+        pos = end
+        start = START_AFTER_WORD if is_word[classes[end - 1]] else START
+    return tokens
@@ -0,0 +1,85 @@
+# Loading a program from a binary AST file instead of its source
+#
+# Usage: python bench_binary_ast.py [size] [--seed N]
+#
+# size is a byte count with an optional KB/MB suffix (8MB by default). For a
+# program from benchmarks/zara_corpus.py, compares lexing and parsing the
+# source with writing the binary AST, decoding all of it, and opening a
+# fresh mapping and decoding one function from the middle. Pages touched
+# are the minor page faults of the process while doing it, next to the
+# number of pages in the file. First, a statement of CHAIN_TERMS additions,
+# a tree as deep as the chain is long, is written and read back.
+
+import mmap
+import os
+import pickle
+import resource
+import sys
+import tempfile
+import time
+
+from binary_ast import AstFile, encode_ast, write_ast
+from topdownparser import Parser, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program, parse_size
+
+CHAIN_TERMS = 100000
+
+def timed(work):
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    start = time.perf_counter()
+    result = work()
+    elapsed = time.perf_counter() - start
+    return result, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+def check_chain(directory):
+    # Nested tuples this deep cannot be compared with ==, which recurses, so
+    # the decoded program is encoded again and the bytes compared
+    program = Parser(Tokenizer('x = ' + ' + '.join(['a'] * CHAIN_TERMS) + ';').tokenize_buffer()).parse()
+    path = os.path.join(directory, 'chain.zast')
+    write_ast(program, path)
+    with AstFile(path) as ast:
+        assert encode_ast(ast.program()) == encode_ast(program)
+    print(f"chain of {CHAIN_TERMS} additions written and read back")
+
+def main():
+    args = sys.argv[1:]
+    size = parse_size(args[0]) if args and not args[0].startswith('-') else 8 * 1024 * 1024
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+
+    source, nodes = generate_program(size, seed=seed)
+    program, parse_time, _ = timed(lambda: Parser(Tokenizer(source).tokenize_buffer()).parse())
+    assert program == nodes
+    with tempfile.TemporaryDirectory() as directory:
+        check_chain(directory)
+        path = os.path.join(directory, 'program.zast')
+        _, write_time, _ = timed(lambda: write_ast(program, path))
+        file_size = os.path.getsize(path)
+        pickled = pickle.dumps(program)
+        print(f"source {len(source) / 1e6:6.2f} MB  binary AST {file_size / 1e6:6.2f} MB  "
+              f"pickle {len(pickled) / 1e6:6.2f} MB  ({file_size // mmap.PAGESIZE} pages)")
+        print(f"lex + parse      {parse_time * 1e3:9.1f} ms")
+        print(f"write            {write_time * 1e3:9.1f} ms")
+        _, unpickle_time, _ = timed(lambda: pickle.loads(pickled))
+        print(f"unpickle         {unpickle_time * 1e3:9.1f} ms")
+
+        with AstFile(path) as ast:
+            decoded, decode_time, faults = timed(ast.program)
+            assert decoded == program
+        print(f"decode all       {decode_time * 1e3:9.1f} ms  {faults:6} page faults")
+
+        names = [node[1] for node in program if node[0] == 'def']
+        name = names[len(names) // 2]
+        expected = next(node for node in program if node[0] == 'def' and node[1] == name)
+
+        def load_function():
+            with AstFile(path) as ast:
+                return ast.function(name)
+        function, load_time, faults = timed(load_function)
+        assert function == expected
+        print(f"open + {name:10} {load_time * 1e3:9.3f} ms  {faults:6} page faults  "
+              f"of {len(names)} functions")
+
+if __name__ == '__main__':
+    main()
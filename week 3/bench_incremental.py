@@ -0,0 +1,81 @@
+# Edit latency of IncrementalParser against re-parsing the whole file
+#
+# Usage: python bench_incremental.py [lines,lines,...] [--edits N] [--seed N]
+#
+# For generated programs of about the given line counts (5000 and 50000 by
+# default), times a full parse, then a series of random one-character edits:
+# a digit replaced by another, a space added to one, and a ';' deleted and put
+# back, which merges two statements and splits them again. Reports the
+# median and 99th percentile latency per edit with the statements re-parsed
+# and reused.
+
+import os
+import random
+import sys
+import time
+
+from incremental import IncrementalParser
+from topdownparser import Parser, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program
+
+DEFAULT_LINES = '5000,50000'
+BYTES_PER_LINE = 24
+
+def random_edits(document, rng):
+    # Yields (start, end, text) edits one at a time, each applied before the
+    # next is made
+    source = document.source
+    while True:
+        position = rng.randrange(len(source))
+        kind = rng.randrange(3)
+        if kind == 0 and source[position].isdigit():
+            yield position, position + 1, str(rng.randrange(10))
+        elif kind == 1:
+            semicolon = source.find(';', position)
+            if semicolon != -1:
+                yield semicolon, semicolon + 1, ''
+                yield semicolon, semicolon, ';'
+        elif source[position] == ' ':
+            yield position, position, ' '
+        source = document.source
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    args = sys.argv[1:]
+    lines = args[0] if args and not args[0].startswith('-') else DEFAULT_LINES
+    edits = int(args[args.index('--edits') + 1]) if '--edits' in args else 1000
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+
+    for line_count in map(int, lines.split(',')):
+        source, _ = generate_program(line_count * BYTES_PER_LINE, seed=seed)
+        start = time.perf_counter()
+        Parser(Tokenizer(source).tokenize_buffer(), recover=True).parse()
+        full_time = time.perf_counter() - start
+        start = time.perf_counter()
+        document = IncrementalParser(source)
+        initial_time = time.perf_counter() - start
+
+        rng = random.Random(seed)
+        latencies = []
+        reparsed = []
+        reused = []
+        for number, (start, end, text) in zip(range(edits), random_edits(document, rng)):
+            begin = time.perf_counter()
+            reused.append(document.edit(start, end, text))
+            latencies.append(time.perf_counter() - begin)
+            reparsed.append(document.reparsed_statements)
+
+        print(f"{source.count(chr(10)):7} lines  full parse {full_time * 1e3:8.1f} ms  "
+              f"incremental setup {initial_time * 1e3:8.1f} ms  {document.statement_count} statements")
+        print(f"{'':7}        edit median {percentile(latencies, 0.5) * 1e3:6.3f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1e3:6.3f} ms  "
+              f"re-parsed {sum(reparsed) / len(reparsed):6.1f}  reused {sum(reused) / len(reused):9.1f} "
+              f"statements per edit")
+
+if __name__ == '__main__':
+    main()
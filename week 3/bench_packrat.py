@@ -0,0 +1,126 @@
+# Cost of PackratParser against the predictive Parser
+#
+# Usage: python bench_packrat.py [size] [--seed N]
+#
+# First a generated program (256KB by default, see benchmarks/zara_corpus.py)
+# parsed by Parser and by PackratParser with an unbounded memo and with a
+# small one, the ASTs checked equal; reports time, memo hit rate, evictions,
+# the most entries the memo held and the peak memory of the parse as
+# tracemalloc sees it. Before that, RECOVERY_PROGRAMS short programs glued
+# together from broken and whole fragments are parsed by both, with and
+# without recovery, at capacities None, 0 and 3, checking the ASTs and
+# syntax errors are the same. Then "x = ((...(1 + 2)...));" at growing depths with
+# and without the memo, where backtracking alone is exponential, and one
+# long expression at growing lengths, which should cost the same per token.
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from diagnostics import ParseError
+from packrat import PackratParser
+from topdownparser import Parser, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program, parse_size
+
+SMALL_CAPACITY = 64
+NO_MEMO_LIMIT = 0.5  # seconds; deeper nestings are not timed without the memo
+RECOVERY_PROGRAMS = 2000
+# Pieces check_recovery strings together into mostly damaged programs. A
+# keyword is never a name, so 'def' and 'x = def = 1;' are syntax errors.
+FRAGMENTS = ['x = 1;', 'if (a) { b = 2; }', ' else { c; }', 'do { y = y + 1; } while (y < 3)',
+             'def f(a, b) { return a + b; }', 'def g() { }', '{', '}', ';', 'return 1;', ' ', '\n',
+             'q = (1 + 2) * 3 - 4 / 5 < 6;', ')', '(', 'def', 'x = def = 1;', '+', 'w', 'a = b = c;', '1 + 2 == 3;']
+
+def timed(parse, tokens):
+    start = time.perf_counter()
+    parser, program = parse(tokens)
+    return parser, program, time.perf_counter() - start
+
+def peak_memory(parse, tokens):
+    tracemalloc.start()
+    parse(tokens)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def predictive(tokens):
+    parser = Parser(tokens)
+    return parser, parser.parse()
+
+def packrat(capacity):
+    def parse(tokens):
+        parser = PackratParser(tokens, capacity=capacity)
+        return parser, parser.parse()
+    return parse
+
+def outcome(parser_class, source, recover, **options):
+    # (AST, diagnostics) of a parse, or the error a strict parse raised
+    parser = parser_class(Tokenizer(source).tokenize_buffer(), recover=recover, **options)
+    try:
+        program = parser.parse()
+    except ParseError as error:
+        return str(error), error.index
+    return program, [repr(diagnostic) for diagnostic in parser.errors]
+
+def check_recovery(seed):
+    rng = random.Random(seed)
+    for _ in range(RECOVERY_PROGRAMS):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(26)))
+        for recover in (True, False):
+            expected = outcome(Parser, source, recover)
+            for capacity in (None, 0, 3):
+                assert outcome(PackratParser, source, recover, capacity=capacity) == expected, (source, recover, capacity)
+    print(f"{RECOVERY_PROGRAMS} damaged programs: same ASTs and errors as Parser")
+
+def describe(parser):
+    stats = parser.memo_stats()
+    return (f"hit rate {stats['hit_rate']:6.1%}  {stats['hits']:9} hits  {stats['evictions']:9} evictions  "
+            f"peak {stats['peak_entries']:6} entries")
+
+def main():
+    args = sys.argv[1:]
+    size = parse_size(args[0]) if args and not args[0].startswith('-') else 256 * 1024
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+
+    check_recovery(seed)
+    source, nodes = generate_program(size, seed=seed)
+    tokens = Tokenizer(source).tokenize_buffer()
+    print(f"Input: {len(source) / 1e6:.2f} MB, {len(tokens)} tokens")
+    for name, parse in (("predictive", predictive),
+                        ("packrat", packrat(None)),
+                        (f"packrat/{SMALL_CAPACITY}", packrat(SMALL_CAPACITY))):
+        parser, program, elapsed = timed(parse, tokens)
+        assert program == nodes
+        line = f"{name:12} {elapsed:6.3f}s  {len(tokens) / elapsed:10,.0f} tokens/s  " \
+               f"peak memory {peak_memory(parse, tokens) / 1e6:6.1f} MB"
+        if isinstance(parser, PackratParser):
+            line += "  " + describe(parser)
+        print(line)
+
+    print()
+    slow = False
+    for depth in list(range(1, 9)) + [16, 24, 32, 40]:
+        tokens = Tokenizer("x = " + "(" * depth + "1 + 2" + ")" * depth + ";").tokenize_buffer()
+        parser, program, with_memo = timed(packrat(None), tokens)
+        line = f"depth {depth:3}  memo {with_memo * 1e3:9.3f} ms  {describe(parser)}"
+        if not slow:
+            _, _, without_memo = timed(packrat(0), tokens)
+            line += f"  no memo {without_memo * 1e3:9.3f} ms"
+            slow = without_memo > NO_MEMO_LIMIT
+        print(line)
+
+    print()
+    for terms in (1000, 10000, 100000):
+        source = "x = " + " + ".join(f"{index} * y" for index in range(terms)) + ";"
+        tokens = Tokenizer(source).tokenize_buffer()
+        for capacity in (None, SMALL_CAPACITY):
+            parser, program, elapsed = timed(packrat(capacity), tokens)
+            print(f"{terms:6} terms  capacity {str(capacity):4}  {elapsed / len(tokens) * 1e9:6.0f} ns/token  "
+                  f"{describe(parser)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Speedup of parse_parallel over a serial lex and parse
+#
+# Usage: python bench_parallel_parser.py [size] [--seed N] [--workers N,N,...]
+#
+# size is a byte count with an optional KB/MB suffix (8MB by default). The
+# program comes from benchmarks/zara_corpus.py. Times the serial
+# Tokenizer + Parser, the split pre-pass alone, and parse_parallel with 1,
+# 2, 4, ... workers up to the number of cores (or the given counts),
+# checking every result against the serial one. Pool start-up and moving
+# the chunks and ASTs between processes are part of the parallel times.
+
+import os
+import sys
+import time
+
+from parallel_parser import parse_parallel, split_points
+from topdownparser import Parser, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program, parse_size
+
+def worker_counts(cores):
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+def main():
+    args = sys.argv[1:]
+    size = parse_size(args[0]) if args and not args[0].startswith('-') else 8 * 1024 * 1024
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+    cores = os.cpu_count() or 1
+    if '--workers' in args:
+        counts = [int(count) for count in args[args.index('--workers') + 1].split(',')]
+    else:
+        counts = worker_counts(cores)
+
+    source, nodes = generate_program(size, seed=seed)
+    start = time.perf_counter()
+    serial = Parser(Tokenizer(source).tokenize_buffer()).parse()
+    serial_time = time.perf_counter() - start
+    assert serial == nodes
+    start = time.perf_counter()
+    points = split_points(source)
+    split_time = time.perf_counter() - start
+    print(f"Input: {len(source) / 1e6:.2f} MB, {len(nodes)} top-level statements, "
+          f"{sum(node[0] == 'def' for node in nodes)} defs, {cores} cores")
+    print(f"serial       {serial_time:6.3f}s")
+    print(f"split        {split_time:6.3f}s  {len(points)} chunks")
+
+    for workers in counts:
+        start = time.perf_counter()
+        program, errors = parse_parallel(source, workers)
+        elapsed = time.perf_counter() - start
+        assert program == serial and not errors
+        print(f"{workers:2} workers   {elapsed:6.3f}s  speedup {serial_time / elapsed:5.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Throughput of the week 3 Parser on generated Zara programs
+#
+# Usage: python bench_parser.py [size] [--seed N]
+#
+# size is a byte count with an optional KB/MB suffix (1MB by default). The
+# program comes from benchmarks/zara_corpus.py, and the parser's AST is
+# checked against the statements the generator built before timing. Then
+# one block with a very long body is parsed, which has to work without
+# raising the recursion limit.
+
+import os
+import sys
+import time
+
+from parse_trace import RingTrace
+from topdownparser import Parser, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program, parse_size
+
+LONG_BODY = 200000
+
+def best_time(parse, tokens, rounds=3):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        program = parse(tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return program, best
+
+def main():
+    args = sys.argv[1:]
+    size = parse_size(args[0]) if args and not args[0].startswith('-') else 1024 * 1024
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+
+    source, nodes = generate_program(size, seed=seed)
+    tokens = Tokenizer(source).tokenize_buffer()
+    print(f"Input: {len(source) / 1e6:.2f} MB, {len(tokens)} tokens, {len(nodes)} top-level statements")
+    assert Parser(tokens).parse() == nodes
+
+    for name, parse in (("trace off", lambda tokens: Parser(tokens).parse()),
+                        ("ring trace", lambda tokens: Parser(tokens, RingTrace()).parse())):
+        _, elapsed = best_time(parse, tokens)
+        print(f"{name:11} {elapsed:6.3f}s  {len(source) / elapsed / 1e6:6.2f} MB/s  "
+              f"{len(tokens) / elapsed:12,.0f} tokens/s")
+
+    source = "def long() {\n" + "    x = x + 1;\n" * LONG_BODY + "}\n"
+    tokens = Tokenizer(source).tokenize_buffer()
+    program, elapsed = best_time(lambda tokens: Parser(tokens).parse(), tokens, rounds=1)
+    assert len(program[0][3]) == LONG_BODY
+    print(f"one body of {LONG_BODY} statements: {elapsed:.3f}s")
+
+if __name__ == '__main__':
+    main()
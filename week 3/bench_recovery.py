@@ -0,0 +1,69 @@
+# Cost of panic-mode error recovery in the week 3 Parser
+#
+# Usage: python bench_recovery.py [size] [--seed N]
+#
+# Parses a generated program (1MB by default) strictly and in recovery mode,
+# then in recovery mode with one token in every N dropped at random, for
+# denser and denser errors. Reports tokens/s, the errors found and the
+# statements that ended up as ('error', ...) nodes.
+
+import os
+import random
+import sys
+import time
+
+from topdownparser import Parser, TokenBuffer, Tokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from zara_corpus import generate_program, parse_size
+
+DROP_EVERY = (1000, 100, 20, 5)
+
+def drop_tokens(tokens, every, seed):
+    # Copy of a token list without about one token in every
+    rng = random.Random(seed)
+    return [token for token in tokens if rng.randrange(every)]
+
+def count_errors(program):
+    count = 0
+    pending = list(program)
+    while pending:
+        node = pending.pop()
+        if node[0] == 'error':
+            count += 1
+        else:
+            pending.extend(child for child in node if type(child) is list for child in child)
+    return count
+
+def timed(tokens, recover, rounds=3):
+    best = None
+    for _ in range(rounds):
+        parser = Parser(tokens, recover=recover)
+        start = time.perf_counter()
+        program = parser.parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return parser, program, best
+
+def report(name, tokens, parser, program, elapsed):
+    print(f"{name:20} {elapsed:6.3f}s  {len(tokens) / elapsed:12,.0f} tokens/s  "
+          f"{len(parser.errors):7} errors  {count_errors(program):7} error nodes")
+
+def main():
+    args = sys.argv[1:]
+    size = parse_size(args[0]) if args and not args[0].startswith('-') else 1024 * 1024
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+
+    source, _ = generate_program(size, seed=seed)
+    tokens = Tokenizer(source).tokenize_buffer()
+    print(f"Input: {len(source) / 1e6:.2f} MB, {len(tokens)} tokens")
+    report("strict", tokens, *timed(tokens, False))
+    report("recover, clean", tokens, *timed(tokens, True))
+
+    token_list = list(tokens)
+    for every in DROP_EVERY:
+        damaged = TokenBuffer.from_tuples(drop_tokens(token_list, every, seed))
+        report(f"recover, 1/{every} lost", damaged, *timed(damaged, True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Memory and iteration cost of tuple tokens vs. the columnar TokenBuffer
+#
+# Usage: python bench_token_buffer.py [megabytes]
+#
+# TokenBuffer trades reading speed for memory: it takes about an eighth of
+# the memory of tuples and tokenize_buffer is faster than tokenize, but
+# every read through a TokenCursor is a method call, so walking tokens with
+# it is still about 1.7x slower than walking a tuple list by index.
+
+import sys
+import time
+import tracemalloc
+
+from topdownparser import Tokenizer
+from bench_tokenizer import SAMPLE
+
+def measure_memory(build):
+    tracemalloc.start()
+    tokens = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tokens, current
+
+def walk_tuples(tokens):
+    # Parser-style walk by index, as the parsers read tuple lists: look at
+    # the kind of every token, text of some
+    braces = 0
+    index = 0
+    while index < len(tokens):
+        kind, value = tokens[index]
+        if kind == 'LBRACE':
+            braces += 1
+        elif kind == 'IDENTIFIER' and value == 'if':
+            braces -= 1
+        index += 1
+    return braces
+
+def walk_buffer(tokens):
+    # Same walk through the TokenCursor the parsers use; keyword text is
+    # compared in place in the source
+    braces = 0
+    cursor = tokens.cursor()
+    while not cursor.at_end():
+        kind = cursor.kind()
+        if kind == 'LBRACE':
+            braces += 1
+        elif kind == 'IDENTIFIER' and cursor.text_is('if'):
+            braces -= 1
+        cursor.advance()
+    return braces
+
+def timed(function, tokens):
+    start = time.perf_counter()
+    result = function(tokens)
+    return result, time.perf_counter() - start
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    code = SAMPLE * int(megabytes * 1e6 / len(SAMPLE))
+    print(f"Input: {len(code) / 1e6:.1f} MB")
+
+    tuples, tuple_bytes = measure_memory(lambda: Tokenizer(code).tokenize())
+    buffer, buffer_bytes = measure_memory(lambda: Tokenizer(code).tokenize_buffer())
+    assert list(buffer) == tuples
+    print(f"tuples       {tuple_bytes / len(tuples):6.1f} bytes/token  ({tuple_bytes / 1e6:.1f} MB)")
+    print(f"TokenBuffer  {buffer_bytes / len(buffer):6.1f} bytes/token  ({buffer_bytes / 1e6:.1f} MB)")
+
+    _, tuple_time = timed(lambda source: Tokenizer(source).tokenize(), code)
+    _, buffer_time = timed(lambda source: Tokenizer(source).tokenize_buffer(), code)
+    print(f"tokenize          {tuple_time:.2f}s")
+    print(f"tokenize_buffer   {buffer_time:.2f}s")
+
+    tuple_result, tuple_time = timed(walk_tuples, tuples)
+    buffer_result, buffer_time = timed(walk_buffer, buffer)
+    assert tuple_result == buffer_result
+    print(f"walk tuples       {tuple_time:.2f}s")
+    print(f"walk TokenCursor  {buffer_time:.2f}s")
+
+if __name__ == '__main__':
+    main()
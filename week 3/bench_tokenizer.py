@@ -0,0 +1,72 @@
+# Throughput of Tokenizer.tokenize before and after the compiled master
+# pattern, on a generated input (10 MB by default)
+#
+# Usage: python bench_tokenizer.py [megabytes]
+
+import re
+import sys
+import time
+
+from topdownparser import Tokenizer
+
+SAMPLE = '''if (x == 10) {
+    y = x + 2.5;
+}
+def foo(a, b) {
+    return a * b;
+}
+for (i = 0; i < 10; i = i + 1) {
+    total = total - i / 3;
+}
+'''
+
+# The spec and loop Tokenizer used before, compiling and trying every
+# pattern at every position
+LEGACY_TOKEN_REGEX = [
+    (r'if|else|do|while|for|def|return', 'IDENTIFIER'),
+    (r'==|!=|<=|>=|>|<', 'COMPARATOR'),
+    (r'\+|-|\*|/', 'OPERATOR'),
+    (r'=', 'ASSIGN'),
+    (r'\d+(\.\d+)?', 'NUMBER'),
+    (r'[a-zA-Z_]\w*', 'IDENTIFIER'),
+    (r'\s+', None),
+    (r'\{', 'LBRACE'),
+    (r'\}', 'RBRACE'),
+    (r'\(', 'LPAREN'),
+    (r'\)', 'RPAREN'),
+    (r';', 'SEMICOLON'),
+    (r',', 'COMMA')
+]
+
+def legacy_tokenize(code):
+    position = 0
+    tokens = []
+    while position < len(code):
+        match = None
+        for regex, token_type in LEGACY_TOKEN_REGEX:
+            regex = re.compile(regex)
+            match = regex.match(code, position)
+            if match:
+                if token_type:
+                    tokens.append((token_type, match.group(0)))
+                position = match.end(0)
+                break
+        if not match:
+            raise RuntimeError(f'Unexpected character: {code[position]}')
+    return tokens
+
+def measure(name, tokenize, code):
+    start = time.perf_counter()
+    tokens = tokenize(code)
+    elapsed = time.perf_counter() - start
+    print(f"{name:8} {len(tokens)} tokens in {elapsed:.2f}s  ({len(code) / elapsed / 1e6:.2f} MB/s)")
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    code = SAMPLE * int(megabytes * 1e6 / len(SAMPLE))
+    print(f"Input: {len(code) / 1e6:.1f} MB")
+    measure("before", legacy_tokenize, code)
+    measure("after", lambda source: Tokenizer(source).tokenize(), code)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# Binary files for the ASTs of topdownparser.py
+#
+# write_ast(program, path) saves a program as Parser.parse returns it, and
+# AstFile(path) gives it back without lexing or parsing again:
+#
+#     with AstFile(path) as ast:
+#         ast.program()              # the whole program, as Parser returns it
+#         ast.statement(index)       # one top-level statement
+#         ast.function('fn12')       # one top-level def
+#
+# AstFile maps the file and decodes only the nodes asked for, so loading
+# one function reads the index of top-level defs, that function's records
+# and its strings, not the rest of the file.
+#
+# Layout, all integers little-endian, every section starting at a multiple
+# of 8 bytes:
+#
+#     header        MAGIC, FORMAT_VERSION and the counts (HEADER below)
+#     kinds         one byte per node, an index into KINDS
+#     fields        two u32 arrays of node_count entries: the node's
+#                   children, NONE where it has fewer
+#     items         u32 references, the elements of lists and the
+#                   children of nodes with more than two
+#     string ends   u32 end of each string in the string data
+#     functions     (name, node) u32 reference pairs, one per top-level def
+#     string data   every distinct string once, UTF-8
+#
+# A reference is a node index, a string index with STRING set, or NONE. A
+# list node, or a node with more than two children, has the index of its
+# first item and the number of items as fields. Nodes are written children
+# first, so a subtree's records are next to each other.
+#
+# Usage: python binary_ast.py <source> <output>   parse a file and save it
+
+import mmap
+import struct
+import sys
+from array import array
+
+from topdownparser import BINARY_POWER, Parser, Tokenizer
+
+MAGIC = b'ZAST'
+# Bump when the layout changes; files of another version are rejected
+FORMAT_VERSION = 1
+
+# magic, version, node count, item count, string count, string data size,
+# function count, root reference
+HEADER = struct.Struct('<4sIIIIIII')
+
+# Node kinds, and the ones whose children are items: lists and the nodes
+# that can have more than two
+KINDS = ('list', 'assign', 'expr', 'if', 'do_while', 'for', 'def', 'return', 'error') + tuple(BINARY_POWER)
+KIND_IDS = {kind: kind_id for kind_id, kind in enumerate(KINDS)}
+ITEM_KINDS = ('list', 'if', 'for', 'def')
+FIELDS = 2
+
+STRING = 1 << 31
+NONE = 0xFFFFFFFF
+
+BIG_ENDIAN = sys.byteorder != 'little'
+
+
+def align(offset):
+    return (offset + 7) & ~7
+
+
+class AstEncoder:
+    def __init__(self):
+        self.kinds = bytearray()
+        self.fields = [array('I') for _ in range(FIELDS)]
+        self.items = array('I')
+        self.strings = {}
+        self.functions = array('I')
+
+    def string(self, text):
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index | STRING
+
+    def add(self, kind, children):
+        # Record a node whose children are already references
+        index = len(self.kinds)
+        self.kinds.append(KIND_IDS[kind])
+        for field, child in zip(self.fields, children):
+            field.append(child)
+        for field in self.fields[len(children):]:
+            field.append(NONE)
+        return index
+
+    def node(self, node):
+        # Reference to node, writing it and everything under it. Children
+        # are written first, left to right; the walk keeps a stack of
+        # (node, its children left to visit, their references), as a long
+        # operator chain nests as deep as it is long.
+        if node is None:
+            return NONE
+        if type(node) is str:
+            return self.string(node)
+        string = self.string
+        stack = [(node, iter(node if type(node) is list else node[1:]), [])]
+        while True:
+            current, children, references = stack[-1]
+            for child in children:
+                if child is None:
+                    references.append(NONE)
+                elif type(child) is str:
+                    references.append(string(child))
+                else:
+                    stack.append((child, iter(child if type(child) is list else child[1:]), []))
+                    break
+            else:
+                stack.pop()
+                if type(current) is list:
+                    reference = self.add_items('list', references)
+                elif current[0] in ITEM_KINDS:
+                    reference = self.add_items(current[0], references)
+                else:
+                    reference = self.add(current[0], references)
+                if not stack:
+                    return reference
+                stack[-1][2].append(reference)
+
+    def add_items(self, kind, children):
+        first = len(self.items)
+        self.items.extend(children)
+        return self.add(kind, (first, len(children)))
+
+    def program(self, program):
+        # Like node, noting the top-level defs in the function index
+        references = []
+        for statement in program:
+            reference = self.node(statement)
+            if statement[0] == 'def':
+                self.functions.extend((self.string(statement[1]), reference))
+            references.append(reference)
+        return self.add_items('list', references)
+
+    def to_bytes(self, root):
+        data = [text.encode() for text in self.strings]
+        ends = array('I')
+        end = 0
+        for encoded in data:
+            end += len(encoded)
+            ends.append(end)
+        sections = [bytes(self.kinds)] + self.fields + [self.items, ends, self.functions]
+        out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, len(self.kinds), len(self.items),
+                                    len(data), end, len(self.functions) // 2, root))
+        for section in sections:
+            out.extend(bytes(align(len(out)) - len(out)))
+            if BIG_ENDIAN and isinstance(section, array):
+                section = array('I', section)
+                section.byteswap()
+            out.extend(section)
+        out.extend(bytes(align(len(out)) - len(out)))
+        out.extend(b''.join(data))
+        return bytes(out)
+
+
+def encode_ast(program):
+    encoder = AstEncoder()
+    return encoder.to_bytes(encoder.program(program))
+
+
+def write_ast(program, path):
+    with open(path, 'wb') as out:
+        out.write(encode_ast(program))
+
+
+class AstFile:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = []
+        view = self.view(0, len(self.map))
+        if len(view) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not a binary AST file")
+        (magic, version, node_count, item_count, string_count, data_size,
+         function_count, self.root) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a binary AST file of version {FORMAT_VERSION}")
+        sizes = ([node_count] + [4 * node_count] * FIELDS
+                 + [4 * item_count, 4 * string_count, 8 * function_count, data_size])
+        offsets = []
+        offset = HEADER.size
+        for size in sizes:
+            offset = align(offset)
+            offsets.append(offset)
+            offset += size
+        file_size = len(self.map)
+        if offset != file_size:
+            self.close()
+            raise ValueError(f"{path}: binary AST file is {file_size} bytes, expected {offset}")
+        self.kinds = self.view(offsets[0], node_count)
+        self.fields = [self.u32(offsets[1 + number], node_count) for number in range(FIELDS)]
+        self.items = self.u32(offsets[-4], item_count)
+        self.string_ends = self.u32(offsets[-3], string_count)
+        self.function_index = self.u32(offsets[-2], 2 * function_count)
+        self.string_data = self.view(offsets[-1], data_size)
+        self.node_count = node_count
+        self.decoded_strings = {}
+
+    def view(self, offset, size):
+        view = memoryview(self.map)[offset:offset + size]
+        self.views.append(view)
+        return view
+
+    def u32(self, offset, count):
+        view = self.view(offset, 4 * count)
+        if not BIG_ENDIAN:
+            view = view.cast('I')
+            self.views.append(view)
+            return view
+        values = array('I', view)
+        values.byteswap()
+        return values
+
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        # Number of top-level statements
+        return self.fields[1][self.root]
+
+    def string(self, index):
+        # Decoded once, then shared; cached by reference
+        reference = index | STRING
+        text = self.decoded_strings.get(reference)
+        if text is None:
+            start = self.string_ends[index - 1] if index else 0
+            text = str(self.string_data[start:self.string_ends[index]], 'utf-8')
+            self.decoded_strings[reference] = text
+        return text
+
+    def node(self, reference):
+        # The node, string or None a reference stands for, decoded with
+        # everything under it
+        kinds = self.kinds
+        left_field, right_field = self.fields
+        items = self.items
+        strings = self.decoded_strings
+
+        def leaf(reference):
+            # NONE has the STRING bit set too
+            text = strings.get(reference)
+            if text is None and reference != NONE:
+                text = self.string(reference & ~STRING)
+            return text
+
+        def open_node(reference):
+            # (kind, its child references left to decode, their values)
+            kind = KINDS[kinds[reference]]
+            left = left_field[reference]
+            right = right_field[reference]
+            if kind in ITEM_KINDS:
+                children = items[left:left + right]
+            else:
+                children = (left,) if right == NONE else (left, right)
+            return kind, iter(children), []
+
+        # Children are decoded before their node, with a stack of nodes
+        # being decoded rather than recursion
+        if reference & STRING:
+            return leaf(reference)
+        stack = [open_node(reference)]
+        while True:
+            kind, children, values = stack[-1]
+            for child in children:
+                if child & STRING:
+                    values.append(leaf(child))
+                else:
+                    stack.append(open_node(child))
+                    break
+            else:
+                stack.pop()
+                value = values if kind == 'list' else (kind, *values)
+                if not stack:
+                    return value
+                stack[-1][2].append(value)
+
+    def program(self):
+        return self.node(self.root)
+
+    def statement(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(f"statement {index} out of range")
+        return self.node(self.items[self.fields[0][self.root] + index])
+
+    def function_names(self):
+        index = self.function_index
+        return [self.string(index[number] & ~STRING) for number in range(0, len(index), 2)]
+
+    def function(self, name):
+        # The first top-level def called name
+        index = self.function_index
+        for number in range(0, len(index), 2):
+            if self.string(index[number] & ~STRING) == name:
+                return self.node(index[number + 1])
+        raise KeyError(name)
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python binary_ast.py <source> <output>")
+        sys.exit(2)
+    with open(sys.argv[1]) as file:
+        source = file.read()
+    parser = Parser(Tokenizer(source).tokenize_buffer(), recover=True)
+    program = parser.parse()
+    for error in parser.errors:
+        print(f"{sys.argv[1]}:{error}")
+    write_ast(program, sys.argv[2])
+    with AstFile(sys.argv[2]) as ast:
+        print(f"{len(program)} statements, {ast.node_count} nodes, "
+              f"{len(ast.function_names())} functions written to {sys.argv[2]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Syntax errors for the parsers
+#
+# A parser raises ParseError at the first error. In recovery mode it catches
+# the error instead, turns it into a Diagnostic with a line and column and
+# keeps parsing from the next synchronizing token.
+
+from array import array
+from bisect import bisect_right
+
+
+class ParseError(RuntimeError):
+    # A syntax error at token index (len(tokens) for the end of input)
+    def __init__(self, message, index):
+        super().__init__(message)
+        self.index = index
+
+
+class Diagnostic:
+    def __init__(self, line, column, message, index):
+        self.line = line
+        self.column = column
+        self.message = message
+        self.index = index
+
+    def __str__(self):
+        return f"{self.line}:{self.column}: {self.message}"
+
+    def __repr__(self):
+        return f"Diagnostic({self.line}, {self.column}, {self.message!r})"
+
+
+class LineIndex:
+    # Offsets of the line starts of a source, to turn an offset into a
+    # 1-based (line, column) by binary search
+    def __init__(self, source):
+        self.starts = array('I', [0])
+        position = source.find('\n')
+        while position != -1:
+            self.starts.append(position + 1)
+            position = source.find('\n', position + 1)
+
+    def position(self, offset):
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
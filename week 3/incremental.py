@@ -0,0 +1,320 @@
+# Incremental reparsing for the week 3 Parser
+#
+# IncrementalParser keeps a program's AST (see topdownparser.py) together
+# with the span of every statement and block, and updates both after an
+# edit of the source by re-parsing only the statements the edit touched:
+#
+#     document = IncrementalParser(source)
+#     reused = document.edit(start, end, text)   # source[start:end] = text
+#     document.program, document.diagnostics()
+#
+# The result is always what Parser(tokens, recover=True) would give for
+# the whole new source.
+#
+# Spans are stored relative to their parent as widths (in characters and in
+# tokens) from a statement's first token to the next statement's, so an
+# edit changes the width of the statements on the path down to it and no
+# position anywhere else. AST nodes hold no positions at all, and body
+# lists are spliced in place, so every statement outside the re-parsed
+# range is reused as it is.
+#
+# An edit is re-parsed at the innermost block that holds all of it,
+# starting at the statement before it (an 'if' can take an 'else' that
+# starts right after it) and ending at the statement its end falls in. The
+# range is lexed with one more token, the first one after it, and parsed as
+# a statement list. If the parse ends exactly at that token, the
+# statements after the range parse as before and the new statements are
+# spliced in. Otherwise the edit changed where statements end: the range
+# doubles to the right, and once it covers the whole block the enclosing
+# statement is re-parsed in its own block instead.
+
+from bisect import bisect_right
+from itertools import accumulate
+
+from diagnostics import Diagnostic, LineIndex, ParseError
+from topdownparser import TOKEN_SPEC, Parser, Tokenizer, compile_spec
+
+
+class Block:
+    # A statement list: the AST body list, an Entry per statement, the width
+    # of every statement in characters (kept in a list of their own so
+    # positions are summed at C speed), and the characters from the start of
+    # the block's content (just after its '{', or the start of the source)
+    # to its first statement
+    __slots__ = ('body', 'entries', 'widths', 'first')
+
+    def __init__(self, body, entries, widths, first):
+        self.body = body
+        self.entries = entries
+        self.widths = widths
+        self.first = first
+
+    def length(self):
+        # Characters from the content start to the closing '}' or the end
+        # of the source
+        return self.first + sum(self.widths)
+
+
+class Entry:
+    # Span of one statement: its width in characters (see Block.widths) and
+    # token_width reach to the start of the next statement (or the end of
+    # the block), blocks are the statement's bodies as (offset of '{', token
+    # offset of '{', Block), errors its syntax errors as (offset, token
+    # offset, message), all relative to the statement's first token. size
+    # counts the statements in the subtree.
+    __slots__ = ('token_width', 'blocks', 'errors', 'size')
+
+    def __init__(self, token_width, blocks, errors):
+        self.token_width = token_width
+        self.blocks = blocks
+        self.errors = errors
+        self.size = 1 + sum(entry.size for _, _, block in blocks for entry in block.entries)
+
+
+class SpanParser(Parser):
+    # Parser in recovery mode that records a raw span for every statement it
+    # parses: (start token, end token, node, blocks, errors), with blocks as
+    # (index of '{', index of '}', statement spans, body) and errors as
+    # (token index, message). The errors of a statement that failed include
+    # those of the statements inside it, which are dropped with it.
+    def __init__(self, tokens):
+        super().__init__(tokens, recover=True)
+        self.block_frames = [[]]
+        self.statement_frames = [([], [])]
+
+    def parse_statements(self, stop, in_block):
+        # Statement spans up to token stop, or None if the last statement
+        # does not end right there
+        records = self.block_frames[0]
+        cursor = self.cursor
+        while cursor.index < stop:
+            if in_block and cursor.kind() == 'RBRACE':
+                break
+            self.recovering_statement(in_block)
+        return records if cursor.index == stop else None
+
+    def recovering_statement(self, in_block):
+        start = self.cursor.index
+        frame = ([], [])
+        self.statement_frames.append(frame)
+        try:
+            node = super().recovering_statement(in_block)
+        finally:
+            self.statement_frames.pop()
+        blocks, errors = frame
+        if node[0] == 'error':
+            errors = nested_errors(blocks) + errors
+            blocks = []
+        self.block_frames[-1].append((start, self.cursor.index, node, blocks, errors))
+        return node
+
+    def block(self):
+        cursor = self.cursor
+        open_index = self.eat('LBRACE')
+        records = []
+        body = []
+        self.block_frames.append(records)
+        try:
+            while not cursor.at_end() and cursor.kind() != 'RBRACE':
+                body.append(self.recovering_statement(True))
+        finally:
+            self.block_frames.pop()
+        close_index = cursor.index
+        try:
+            self.eat('RBRACE')
+        except ParseError as error:
+            # Input ended inside the block; keep what it had
+            self.report(error)
+        self.statement_frames[-1][0].append((open_index, close_index, records, body))
+        return body
+
+    def report(self, error):
+        self.statement_frames[-1][1].append((error.index, str(error)))
+
+
+def nested_errors(blocks):
+    errors = []
+    for _, _, records, _ in blocks:
+        for record in records:
+            errors.extend(nested_errors(record[3]))
+            errors.extend(record[4])
+    return errors
+
+
+def build_entries(records, tokens, end_char, end_token):
+    # Entries and widths for the statement spans of one statement list of
+    # tokens, the last one reaching to end_char / end_token
+    source_length = len(tokens.source)
+    starts = tokens.start
+
+    def char_at(index):
+        return starts[index] if index < len(tokens) else source_length
+
+    entries = []
+    widths = []
+    for number, (start, end, node, blocks, errors) in enumerate(records):
+        if number + 1 < len(records):
+            next_token = records[number + 1][0]
+            next_char = starts[next_token]
+        else:
+            next_token, next_char = end_token, end_char
+        offset = starts[start]
+        entry_blocks = []
+        for open_index, close_index, block_records, body in blocks:
+            content = char_at(open_index) + 1
+            block_entries, block_widths = build_entries(block_records, tokens, char_at(close_index), close_index)
+            first = (starts[block_records[0][0]] if block_records else char_at(close_index)) - content
+            entry_blocks.append((content - 1 - offset, open_index - start,
+                                 Block(body, block_entries, block_widths, first)))
+        entry_errors = [(char_at(index) - offset, index - start, message) for index, message in errors]
+        entries.append(Entry(next_token - start, entry_blocks, entry_errors))
+        widths.append(next_char - offset)
+    return entries, widths
+
+
+def starts_of(block, content):
+    # Start of every statement of block, then the block's end
+    return list(accumulate(block.widths, initial=content + block.first))
+
+
+def is_open_ended(node):
+    # Statements whose parse can depend on the statement after them: a
+    # failed one stops skipping at the next statement keyword, an if
+    # without an else takes one that follows
+    return node[0] == 'error' or (node[0] == 'if' and len(node) == 3)
+
+
+class IncrementalParser:
+    def __init__(self, source):
+        self.source = source
+        tokens = Tokenizer(source).tokenize_buffer()
+        parser = SpanParser(tokens)
+        records = parser.parse_statements(len(tokens), False)
+        program = [record[2] for record in records]
+        entries, widths = build_entries(records, tokens, len(source), len(tokens))
+        first = (tokens.start[0] if len(tokens) else len(source))
+        self.root = Block(program, entries, widths, first)
+        self.program = program
+        self.statement_count = sum(entry.size for entry in entries)
+        # Size of the last re-parse, in characters and statements
+        self.reparsed_chars = len(source)
+        self.reparsed_statements = self.statement_count
+
+    def edit(self, start, end, text):
+        # Replace source[start:end] with text and update the AST; returns
+        # how many statements were reused. A lexer error leaves the
+        # document as it was.
+        old_source = self.source
+        if not 0 <= start <= end <= len(old_source):
+            raise ValueError(f"Edit {start}:{end} out of range for {len(old_source)} characters")
+        source = old_source[:start] + text + old_source[end:]
+        delta = len(text) - (end - start)
+
+        # Go down to the innermost block holding the whole edit
+        path = []
+        block, content = self.root, 0
+        while True:
+            starts = starts_of(block, content)
+            count = len(block.entries)
+            index = bisect_right(starts, start - 1, 0, count) - 1
+            from_content = index < 0
+            first = max(index, 0)
+            last = bisect_right(starts, end, 0, count) - 1
+            child = None
+            if not from_content and first == last:
+                for open_offset, open_token, inner in block.entries[first].blocks:
+                    inner_content = starts[first] + open_offset + 1
+                    if inner_content <= start and end <= inner_content + inner.length():
+                        child = inner, inner_content
+                        break
+            if child is None:
+                break
+            path.append((block, content, starts, first))
+            block, content = child
+        while first > 0 and is_open_ended(block.body[first - 1]):
+            first -= 1
+
+        while True:
+            result = self.reparse(source, delta, block, content, starts, first, last, from_content)
+            if result is not None:
+                break
+            if last + 1 < len(block.entries):
+                last = min(len(block.entries) - 1, last + max(1, last - first + 1))
+            else:
+                # The edit moved the end of the block: re-parse the
+                # statement that owns it
+                block, content, starts, first = path.pop()
+                last = first
+                from_content = False
+        token_delta, size_delta, reparsed = result
+
+        for parent, parent_content, parent_starts, index in path:
+            entry = parent.entries[index]
+            parent.widths[index] += delta
+            entry.token_width += token_delta
+            entry.size += size_delta
+            # Bodies and errors after the edit (an else block, the error at
+            # the end of an unclosed block) move with it
+            offset = start - parent_starts[index]
+            entry.blocks = [(open_offset + delta, open_token + token_delta, inner)
+                            if open_offset >= offset else (open_offset, open_token, inner)
+                            for open_offset, open_token, inner in entry.blocks]
+            entry.errors = [(error_offset + delta, token_offset + token_delta, message)
+                            if error_offset >= offset else (error_offset, token_offset, message)
+                            for error_offset, token_offset, message in entry.errors]
+        self.source = source
+        self.statement_count += size_delta
+        self.reparsed_statements = reparsed
+        return self.statement_count - reparsed
+
+    def reparse(self, source, delta, block, content, starts, first, last, from_content):
+        # Parse statements first..last of block in the edited source. Returns
+        # (change in tokens, change in statements, statements parsed), or
+        # None if the parse does not end where statement last + 1 starts.
+        region_start = content if from_content else starts[first]
+        region_end = starts[last + 1] + delta
+        if region_end < len(source):
+            # Lex the region with the token after it
+            pattern, _ = compile_spec(TOKEN_SPEC)
+            lookahead_end = pattern.match(source, region_end).end()
+        else:
+            lookahead_end = region_end
+        tokens = Tokenizer(source[region_start:lookahead_end]).tokenize_buffer()
+        stop = len(tokens) - (lookahead_end > region_end)
+        if lookahead_end > region_end and tokens.start[stop] != region_end - region_start:
+            return None
+        self.reparsed_chars = region_end - region_start
+
+        records = SpanParser(tokens).parse_statements(stop, block is not self.root)
+        if records is None:
+            return None
+        entries, widths = build_entries(records, tokens, region_end - region_start, stop)
+        old_entries = block.entries[first:last + 1]
+        block.body[first:last + 1] = [record[2] for record in records]
+        block.entries[first:last + 1] = entries
+        block.widths[first:last + 1] = widths
+        if from_content:
+            block.first = tokens.start[0] if records else region_end - region_start
+        token_delta = stop - sum(entry.token_width for entry in old_entries)
+        size = sum(entry.size for entry in entries)
+        return token_delta, size - sum(entry.size for entry in old_entries), size
+
+    def diagnostics(self):
+        # Syntax errors of the whole program, as Parser.errors would list them
+        found = []
+
+        def collect(block, content, content_token):
+            offset = content + block.first
+            token = content_token
+            for entry, width in zip(block.entries, block.widths):
+                for open_offset, open_token, inner in entry.blocks:
+                    collect(inner, offset + open_offset + 1, token + open_token + 1)
+                for error_offset, token_offset, message in entry.errors:
+                    found.append((token + token_offset, offset + error_offset, message))
+                offset += width
+                token += entry.token_width
+
+        collect(self.root, 0, 0)
+        found.sort(key=lambda error: error[0])
+        line_index = LineIndex(self.source)
+        return [Diagnostic(*line_index.position(offset), message, index) for index, offset, message in found]
@@ -0,0 +1,177 @@
+# Packrat mode for the week 3 Parser
+#
+# PackratParser parses expressions the way the grammar in topdownparser.py
+# writes them instead of by precedence climbing: as a PEG with ordered
+# choice and backtracking, the binary levels left recursive,
+#
+#     expression ::= IDENTIFIER '=' expression | comparison
+#     comparison ::= comparison COMPARATOR additive | additive
+#     additive   ::= additive ('+' | '-') term | term
+#     term       ::= term ('*' | '/') operand | operand
+#     operand    ::= NUMBER | IDENTIFIER | '(' expression ')'
+#
+# Backtracking alone is exponential here: every level tries its operator
+# alternative and then parses the level below again, so each '(' nests
+# twice as much work per level. Every (rule, position) result is memoized,
+# which makes it linear: a rule runs at most once per token. Left recursion
+# is handled by growing a seed (Warth et al.): the rule is first evaluated
+# with its own recursive call failing, then again with the previous result
+# in its place until the match stops getting longer. Seeds being grown are
+# kept apart from the memo and are never evicted.
+#
+# The memo is an LRU of at most capacity entries (None for no limit, 0 for
+# no memo at all). The statement layer is the predictive one of Parser and
+# never backtracks, so the memo is dropped after every expression; the cap
+# only bounds a single huge expression. Statistics are in parser.memo_stats().
+#
+# The ASTs and syntax errors are the same as Parser's.
+
+from collections import OrderedDict
+
+from diagnostics import ParseError
+from parse_trace import NO_TRACE
+from topdownparser import BINARY_POWER, KEYWORDS, Parser
+
+# Rule ids; the binary levels use their binding power as id
+EXPRESSION = 0
+OPERAND = max(BINARY_POWER.values()) + 1
+RULE_COUNT = OPERAND + 1
+
+MISSING = object()
+
+
+class PackratParser(Parser):
+    def __init__(self, tokens, trace=NO_TRACE, recover=False, capacity=None):
+        super().__init__(tokens, trace, recover)
+        self.capacity = capacity
+        self.memo = OrderedDict()
+        self.growing = {}
+        self.rules = [self.expression_rule] + [self.binary_rule] * (OPERAND - 1) + [self.operand_rule]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.peak_entries = 0
+        # Furthest token a rule failed at, and what it expected there: a
+        # token kind, or None for an operand
+        self.failed_at = -1
+        self.expected = None
+
+    def expression(self, min_power=0):
+        cursor = self.cursor
+        start = cursor.index
+        self.failed_at = -1
+        result = self.apply(EXPRESSION, start)
+        self.memo.clear()
+        # An alternative that failed past the end of the expression means
+        # the statement cannot parse either; report it as Parser does
+        if result is None or self.failed_at > result[1]:
+            # Parser raises with the cursor at the token that failed, which
+            # recovery then synchronizes from
+            cursor.index = self.failed_at
+            raise self.failure()
+        node, end = result
+        if self.tracing:
+            for index in range(start, end):
+                self.trace.record(index)
+        cursor.index = end
+        return node
+
+    def apply(self, rule, position):
+        # Result of rule at token position: (node, end) or None
+        key = position * RULE_COUNT + rule
+        growing = self.growing
+        if key in growing:
+            return growing[key]
+        memo = self.memo
+        result = memo.get(key, MISSING)
+        if result is not MISSING:
+            self.hits += 1
+            memo.move_to_end(key)
+            return result
+        self.misses += 1
+        body = self.rules[rule]
+        if EXPRESSION < rule < OPERAND:
+            growing[key] = None
+            while True:
+                result = body(rule, position)
+                seed = growing[key]
+                if result is None or (seed is not None and result[1] <= seed[1]):
+                    break
+                growing[key] = result
+            result = growing.pop(key)
+        else:
+            result = body(rule, position)
+        memo[key] = result
+        if self.capacity is not None and len(memo) > self.capacity:
+            memo.popitem(last=False)
+            self.evictions += 1
+        elif len(memo) > self.peak_entries:
+            self.peak_entries = len(memo)
+        return result
+
+    def kind_at(self, index):
+        cursor = self.cursor
+        return cursor.kinds[cursor.kind_column[index]] if index < cursor.length else None
+
+    def fail(self, position, expected):
+        if position > self.failed_at:
+            self.failed_at = position
+            self.expected = expected
+        return None
+
+    def failure(self):
+        index = self.failed_at
+        kind = self.kind_at(index)
+        if self.expected is None:
+            got = self.tokens.text(index) if kind == 'IDENTIFIER' else kind or 'EOF'
+            return ParseError(f'Syntax error: Expected expression, but got: {got}', index)
+        return ParseError(f'Syntax error: Expected token: {self.expected}, but got: {kind or "EOF"}', index)
+
+    def expression_rule(self, rule, position):
+        if (self.kind_at(position) == 'IDENTIFIER' and self.kind_at(position + 1) == 'ASSIGN'
+                and self.tokens.text(position) not in KEYWORDS):
+            value = self.apply(EXPRESSION, position + 2)
+            if value is not None:
+                return ('assign', self.tokens.text(position), value[0]), value[1]
+        return self.apply(EXPRESSION + 1, position)
+
+    def binary_rule(self, level, position):
+        left = self.apply(level, position)
+        if left is not None:
+            node, end = left
+            kind = self.kind_at(end)
+            if kind == 'OPERATOR' or kind == 'COMPARATOR':
+                operator = self.tokens.text(end)
+                if BINARY_POWER[operator] == level:
+                    right = self.apply(level + 1, end + 1)
+                    if right is not None:
+                        return (operator, node, right[0]), right[1]
+        return self.apply(level + 1, position)
+
+    def operand_rule(self, rule, position):
+        kind = self.kind_at(position)
+        if kind == 'NUMBER':
+            return self.tokens.text(position), position + 1
+        if kind == 'IDENTIFIER':
+            name = self.tokens.text(position)
+            if name not in KEYWORDS:
+                return name, position + 1
+        elif kind == 'LPAREN':
+            inner = self.apply(EXPRESSION, position + 1)
+            if inner is None:
+                return None
+            node, end = inner
+            if self.kind_at(end) == 'RPAREN':
+                return node, end + 1
+            return self.fail(end, 'RPAREN')
+        return self.fail(position, None)
+
+    def memo_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'peak_entries': self.peak_entries,
+        }
@@ -0,0 +1,122 @@
+# Parallel parsing of a program's top-level method declarations
+#
+# parse_parallel(source) gives the same program (and errors) as
+#
+#     Parser(Tokenizer(source).tokenize_buffer(), recover=recover).parse()
+#
+# but splits the source before top-level 'def's into chunks of about
+# chunk_bytes and lexes and parses the chunks in a process pool, merging
+# the statements in source order.
+#
+# The split is a pre-pass over the characters, not the tokens: the lexer
+# has no strings or comments, so every '{' and '}' is a brace token and a
+# 'def' with no word character on either side is a token of its own. A
+# keyword is never a name, so in a program without errors every 'def' at
+# brace depth 0 starts a top-level method declaration; only damaged input,
+# such as a '{' left open or a 'def' where an expression belongs, puts one
+# anywhere else. The split is trusted for the chunks that parse without
+# an error: such a chunk ends at EOF, where every decision the parser
+# makes at its end is the same as at a 'def', so the serial parse reaches
+# the next chunk at a statement start too. Damaged input is what the
+# fallback is for: from the first chunk with an error on, the source is
+# parsed serially, which also gives the errors their positions in the
+# whole source.
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnostics import ParseError
+from topdownparser import Parser, Tokenizer
+
+# Chunks are at least this large, so that each one outweighs sending its
+# source to a worker and its AST back
+CHUNK_BYTES = 256 * 1024
+
+def split_points(source, chunk_bytes=CHUNK_BYTES):
+    # Offsets of the top-level 'def's the chunks start at, after 0. The
+    # depth at each 'def' comes from counting the braces since the last one.
+    points = [0]
+    depth = 0
+    previous = 0
+    position = source.find('def')
+    while position != -1:
+        after = position + 3
+        if not (position and is_word(source[position - 1]) or after < len(source) and is_word(source[after])):
+            depth += source.count('{', previous, position) - source.count('}', previous, position)
+            previous = position
+            if depth == 0 and position - points[-1] >= chunk_bytes:
+                points.append(position)
+        position = source.find('def', after)
+    return points
+
+
+def is_word(char):
+    return char.isalnum() or char == '_'
+
+
+def parse_chunk(text):
+    # Statements of one chunk, or None if it does not parse cleanly
+    try:
+        return Parser(Tokenizer(text).tokenize_buffer()).parse()
+    except ParseError:
+        return None
+
+
+def parse_parallel(source, workers=None, recover=False, chunk_bytes=CHUNK_BYTES):
+    # Returns (program, errors) as Parser would give them. A lexer error
+    # raises as it does in a serial run.
+    points = split_points(source, chunk_bytes)
+    ends = points[1:] + [len(source)]
+    program = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_chunk, source[start:end]) for start, end in zip(points, ends)]
+        for start, future in zip(points, futures):
+            statements = future.result()
+            if statements is None:
+                for later in futures:
+                    later.cancel()
+                tail, errors = serial_tail(source, start, recover)
+                return program + tail, errors
+            program.extend(statements)
+    return program, []
+
+
+def serial_tail(source, start, recover):
+    # Parse the source from offset start, a statement start, serially
+    tokens = Tokenizer(source).tokenize_buffer()
+    parser = Parser(tokens, recover=recover)
+    parser.cursor.index = tokens.start.index(start) if start else 0
+    return parser.parse(), parser.errors
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python parallel_parser.py <file> [--workers N] [--compare]")
+        sys.exit(2)
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else None
+    with open(args[0]) as file:
+        source = file.read()
+
+    start = time.perf_counter()
+    program, errors = parse_parallel(source, workers, recover=True)
+    elapsed = time.perf_counter() - start
+    for error in errors:
+        print(f"{args[0]}:{error}")
+    print(f"parallel: {len(program)} statements, {len(errors)} errors, {elapsed:.2f}s")
+
+    if '--compare' in args:
+        start = time.perf_counter()
+        parser = Parser(Tokenizer(source).tokenize_buffer(), recover=True)
+        serial = parser.parse()
+        serial_elapsed = time.perf_counter() - start
+        print(f"serial: {serial_elapsed:.2f}s")
+        if serial != program or list(map(repr, parser.errors)) != list(map(repr, errors)):
+            print("Parallel results differ from the serial run")
+            sys.exit(1)
+        print(f"Speedup: {serial_elapsed / elapsed:.2f}x with {workers or os.cpu_count()} workers")
+
+if __name__ == '__main__':
+    main()
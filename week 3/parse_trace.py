@@ -0,0 +1,92 @@
+# Trace sinks for the parsers
+#
+# Instead of printing every step, a parser hands its sink a small event (an
+# int or a tuple of ints and strings) per step, and only when sink.enabled
+# is true. Nothing is formatted until dump(), which passes the kept events
+# to a formatter supplied by the parser that recorded them. Sinks:
+#
+#   NO_TRACE       records nothing (the default)
+#   RingTrace(n)   keeps the last n events
+#   FullTrace()    keeps every event
+#
+# A formatter is called as formatter(events, complete) and yields lines;
+# complete is False when a ring buffer has dropped the earliest events.
+
+import sys
+from collections import deque
+
+DEFAULT_RING_SIZE = 1000
+
+
+class TraceSink:
+    # The "off" sink; also the base of the others
+    enabled = False
+
+    def __init__(self):
+        self.recorded = 0
+
+    def record(self, event):
+        pass
+
+    def events(self):
+        return []
+
+    @property
+    def dropped(self):
+        return self.recorded - len(self.events())
+
+    def clear(self):
+        self.recorded = 0
+
+    def lines(self, formatter):
+        return formatter(self.events(), self.dropped == 0)
+
+    def dump(self, formatter, out=None):
+        out = out if out is not None else sys.stdout
+        if self.dropped:
+            print(f"... {self.dropped} earlier steps not kept", file=out)
+        for line in self.lines(formatter):
+            print(line, file=out)
+
+
+class RingTrace(TraceSink):
+    enabled = True
+
+    def __init__(self, size=DEFAULT_RING_SIZE):
+        super().__init__()
+        self.buffer = deque(maxlen=size)
+
+    def record(self, event):
+        self.recorded += 1
+        self.buffer.append(event)
+
+    def events(self):
+        return list(self.buffer)
+
+    def clear(self):
+        super().clear()
+        self.buffer.clear()
+
+
+class FullTrace(TraceSink):
+    enabled = True
+
+    def __init__(self):
+        super().__init__()
+        self.kept = []
+
+    def record(self, event):
+        self.kept.append(event)
+
+    def events(self):
+        return self.kept
+
+    @property
+    def dropped(self):
+        return 0
+
+    def clear(self):
+        self.kept = []
+
+
+NO_TRACE = TraceSink()
@@ -0,0 +1,98 @@
+# Columnar token storage for the parsers
+#
+# topdownparser.py here and week 4/bottomup.py keep their tokens in a
+# TokenBuffer and read them through a TokenCursor. Each subclasses
+# TokenBuffer with KINDS, its own token kinds indexed by kind id.
+
+from array import array
+
+
+class TokenBuffer:
+    # Tokens stored column-wise next to the source: a kind id per token
+    # (array 'B') plus start and end offsets (array 'I'). Token text is only
+    # sliced out of the source when asked for.
+    KINDS = ()
+
+    def __init__(self, source, kinds=None):
+        self.source = source
+        self.kinds = self.KINDS if kinds is None else kinds
+        self.kind_ids = {kind: kind_id for kind_id, kind in enumerate(self.kinds)}
+        self.kind = array('B')
+        self.start = array('I')
+        self.end = array('I')
+
+    @classmethod
+    def from_tuples(cls, tokens, kinds=None):
+        # Build a buffer from a list of (kind, value) tuples, laying the
+        # values out in a synthetic source separated by spaces
+        buffer = cls(' '.join(value for kind, value in tokens), kinds)
+        offset = 0
+        for kind, value in tokens:
+            buffer.append(kind, offset, offset + len(value))
+            offset += len(value) + 1
+        return buffer
+
+    def append(self, kind, start, end):
+        self.kind.append(self.kind_ids[kind])
+        self.start.append(start)
+        self.end.append(end)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __getitem__(self, index):
+        return (self.kinds[self.kind[index]], self.text(index))
+
+    def text(self, index):
+        return self.source[self.start[index]:self.end[index]]
+
+    def text_is(self, index, value):
+        # Compare a token's text without slicing it out of the source
+        start = self.start[index]
+        return self.end[index] - start == len(value) and self.source.startswith(value, start)
+
+    def cursor(self):
+        return TokenCursor(self)
+
+class TokenCursor:
+    # Read position over a TokenBuffer used by the parsers. The cursor keeps
+    # its own copy of the kind column (one byte per token) with two extra
+    # ids past the end that read as None, so kind() and peek_kind() are a
+    # plain lookup with no bounds check; the columns it reads are held
+    # directly instead of going through the buffer.
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.kinds = buffer.kinds + (None,)
+        self.kind_column = buffer.kind + array('B', (len(buffer.kinds),)) * 2
+        self.source = buffer.source
+        self.starts = buffer.start
+        self.ends = buffer.end
+        self.length = len(buffer)
+        self.index = 0
+
+    def at_end(self):
+        return self.index >= self.length
+
+    def kind(self):
+        return self.kinds[self.kind_column[self.index]]
+
+    def text(self):
+        index = self.index
+        return self.source[self.starts[index]:self.ends[index]] if index < self.length else None
+
+    def text_is(self, value):
+        index = self.index
+        if index >= self.length:
+            return False
+        start = self.starts[index]
+        return self.ends[index] - start == len(value) and self.source.startswith(value, start)
+
+    def peek_kind(self):
+        # Kind of the token after the current one
+        return self.kinds[self.kind_column[self.index + 1]]
+
+    def token(self):
+        return self.buffer[self.index] if self.index < self.length else None
+
+    def advance(self):
+        self.index += 1
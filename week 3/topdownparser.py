@@ -1,103 +1,407 @@
 """our simplified version of zara grammar for our parser
 
 program       ::= statement*
-statement     ::= if_statement | do_while_statement | for_statement | method_declaration | expression_statement
-if_statement  ::= 'if' '(' expression ')' '{' statement* '}'
+statement     ::= if_statement | do_while_statement | for_statement | method_declaration | return_statement | expression_statement
+if_statement  ::= 'if' '(' expression ')' '{' statement* '}' ( 'else' '{' statement* '}' )?
 do_while_statement ::= 'do' '{' statement* '}' 'while' '(' expression ')'
 for_statement ::= 'for' '(' expression ';' expression ';' expression ')' '{' statement* '}'
 method_declaration ::= 'def' IDENTIFIER '(' parameter_list? ')' '{' statement* '}'
+return_statement ::= 'return' expression? ';'
 expression_statement ::= expression ';'
-expression    ::= IDENTIFIER '=' expression | literal | IDENTIFIER | binary_expression
-binary_expression ::= expression ( '+' | '-' | '*' | '/' ) expression
+expression    ::= IDENTIFIER '=' expression | literal | IDENTIFIER | '(' expression ')' | binary_expression
+binary_expression ::= expression ( '==' | '!=' | '<' | '>' | '<=' | '>=' | '+' | '-' | '*' | '/' ) expression
 literal       ::= NUMBER | STRING
 parameter_list ::= IDENTIFIER (',' IDENTIFIER)*
 
+Binary operators are left associative; comparisons bind loosest, then + -,
+then * /. Assignment is right associative. The tokenizer has no STRING
+rule yet, so literals are numbers only.
 
+Parser.parse returns the program as a list of statements, as nested tuples
+in the style of the structured input of week 7/tac.py:
+
+    ('assign', name, expr)              also as an expression: a = b = 1
+    ('expr', expr)
+    ('if', cond, body)                  ('if', cond, body, else_body) with else
+    ('do_while', body, cond)
+    ('for', init, cond, step, body)
+    ('def', name, params, body)
+    ('return', expr)                    expr is None for a bare return
+
+An expr is a name or number string, an assignment, or (operator, left,
+right). Bodies are lists of statements.
+
+A syntax error raises ParseError. With Parser(tokens, recover=True) the
+parser reports it in parser.errors instead, replaces the statement it
+happened in with ('error', message) and goes on after the next ';',
+the '}' closing a block the statement opened, or the next statement
+keyword, so one parse finds every error.
+
+packrat.py has PackratParser, which parses expressions by the grammar above
+with backtracking and a memo instead of by precedence climbing.
 """
 
 
 import re
 
+import token_buffer
+from diagnostics import Diagnostic, LineIndex, ParseError
+from parse_trace import NO_TRACE, FullTrace
+
+# Lexer spec: (pattern, token type) pairs tried in order, None means skip.
+# Keywords are not in the spec: they are lexed as identifiers, and the
+# parser matches them by value.
+TOKEN_SPEC = (
+    (r'==|!=|<=|>=|>|<', 'COMPARATOR'),
+    (r'\+|-|\*|/', 'OPERATOR'),
+    (r'=', 'ASSIGN'),
+    (r'\d+(\.\d+)?', 'NUMBER'),
+    (r'[a-zA-Z_]\w*', 'IDENTIFIER'),
+    (r'\s+', None),  # Ignore whitespace
+    (r'\{', 'LBRACE'),
+    (r'\}', 'RBRACE'),
+    (r'\(', 'LPAREN'),
+    (r'\)', 'RPAREN'),
+    (r';', 'SEMICOLON'),
+    (r',', 'COMMA')  # Added comma as a token
+)
+
+# Identifiers the parser reads as keywords, which are not names
+KEYWORDS = frozenset(('if', 'else', 'do', 'while', 'for', 'def', 'return'))
+
+# Every token kind the tokenizer can produce, indexed by kind id
+TOKEN_KINDS = tuple(token_type for regex, token_type in TOKEN_SPEC if token_type)
+
+# Master patterns compiled from lexer specs, shared by every Tokenizer
+_compiled_specs = {}
+
+# tokenize_buffer's variants of those patterns, by master pattern
+_buffer_patterns = {}
+
+def compile_spec(spec):
+    # Join a spec into one alternation of groups T0, T1, ... compiled once per
+    # spec; returns the pattern and the token type of each group. A final
+    # MISMATCH group catches any character no pattern accepts.
+    spec = tuple(spec)
+    compiled = _compiled_specs.get(spec)
+    if compiled is None:
+        master = '|'.join(f'(?P<T{index}>{regex})' for index, (regex, token_type) in enumerate(spec))
+        master += '|(?P<MISMATCH>(?s:.))'
+        group_types = {f'T{index}': token_type for index, (regex, token_type) in enumerate(spec)}
+        compiled = (re.compile(master), group_types)
+        _compiled_specs[spec] = compiled
+    return compiled
+
 class Tokenizer:
     def __init__(self, code):
         self.code = code
         self.position = 0
         self.tokens = []
-        self.token_regex = [
-            (r'if|else|do|while|for|def|return', 'IDENTIFIER'),
-            (r'==|!=|<=|>=|>|<', 'COMPARATOR'),
-            (r'\+|-|\*|/', 'OPERATOR'),
-            (r'=', 'ASSIGN'),
-            (r'\d+(\.\d+)?', 'NUMBER'),
-            (r'[a-zA-Z_]\w*', 'IDENTIFIER'),
-            (r'\s+', None),  # Ignore whitespace
-            (r'\{', 'LBRACE'),
-            (r'\}', 'RBRACE'),
-            (r'\(', 'LPAREN'),
-            (r'\)', 'RPAREN'),
-            (r';', 'SEMICOLON'),
-            (r',', 'COMMA')  # Added comma as a token
-        ]
+        self.token_regex = TOKEN_SPEC
 
     def tokenize(self):
-        while self.position < len(self.code):
-            match = None
-            for regex, token_type in self.token_regex:
-                regex = re.compile(regex)
-                match = regex.match(self.code, self.position)
-                if match:
-                    if token_type:  # Ignore None types (whitespace)
-                        self.tokens.append((token_type, match.group(0)))
-                    self.position = match.end(0)
-                    break
-            if not match:
-                raise RuntimeError(f'Unexpected character: {self.code[self.position]}')
+        pattern, group_types = compile_spec(self.token_regex)
+        code = self.code
+        append = self.tokens.append
+        for match in pattern.finditer(code, self.position):
+            group = match.lastgroup
+            if group == 'MISMATCH':
+                self.position = match.start()
+                raise RuntimeError(f'Unexpected character: {code[self.position]}')
+            token_type = group_types[group]
+            if token_type:  # Ignore None types (whitespace)
+                append((token_type, match.group()))
+        self.position = len(code)
         return self.tokens
 
+    def tokenize_buffer(self):
+        # Like tokenize, but returns a TokenBuffer of kind ids and offsets
+        # instead of creating a tuple and a string for every token
+        pattern, group_types = compile_spec(self.token_regex)
+        if (r'\s+', None) in self.token_regex:
+            # Each match takes the whitespace before its token, which halves
+            # the number of matches; the whitespace group is then only left
+            # to match whitespace at the end of the code. The token's own
+            # offsets are those of its group.
+            master = pattern
+            pattern = _buffer_patterns.get(master)
+            if pattern is None:
+                pattern = _buffer_patterns[master] = re.compile(r'\s*(?:' + master.pattern + ')')
+        code = self.code
+        tokens = TokenBuffer(code)
+        kind_ids = tokens.kind_ids
+        # Kind id by match.lastindex; None for skipped groups
+        index_kinds = [None] * (pattern.groups + 1)
+        for group, index in pattern.groupindex.items():
+            token_type = group_types.get(group)
+            if token_type:
+                index_kinds[index] = kind_ids[token_type]
+        mismatch = pattern.groupindex['MISMATCH']
+        append_kind = tokens.kind.append
+        append_start = tokens.start.append
+        append_end = tokens.end.append
+        for match in pattern.finditer(code, self.position):
+            index = match.lastindex
+            kind = index_kinds[index]
+            if kind is None:
+                if index == mismatch:
+                    self.position = match.start(index)
+                    raise RuntimeError(f'Unexpected character: {code[self.position]}')
+                continue  # Ignore None types (whitespace)
+            start, end = match.span(index)
+            append_kind(kind)
+            append_start(start)
+            append_end(end)
+        self.position = len(code)
+        return tokens
+
+class TokenBuffer(token_buffer.TokenBuffer):
+    KINDS = TOKEN_KINDS
+
+# Binding power of each binary operator for the expression parser
+BINARY_POWER = {
+    '==': 1, '!=': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '+': 2, '-': 2,
+    '*': 3, '/': 3,
+}
+
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, trace=NO_TRACE, recover=False):
+        # Accepts a TokenBuffer or a list of (kind, value) tuples. The index
+        # of every matched token is recorded in trace (see parse_trace.py)
+        # rather than printed.
+        if not isinstance(tokens, TokenBuffer):
+            tokens = TokenBuffer.from_tuples(tokens)
         self.tokens = tokens
-        self.current_token_index = 0
+        self.cursor = tokens.cursor()
+        self.trace = trace
+        self.tracing = trace.enabled
+        self.recover = recover
+        self.errors = []
+        self.line_index = None
+        # Statement parsers by leading keyword; anything else is an
+        # expression statement
+        self.keyword_statements = {
+            'if': self.if_statement,
+            'do': self.do_while_statement,
+            'for': self.for_statement,
+            'def': self.method_declaration,
+            'return': self.return_statement,
+        }
 
     def current_token(self):
-        return self.tokens[self.current_token_index] if self.current_token_index < len(self.tokens) else None
+        return self.cursor.token()
 
     def eat(self, token_type):
-        token = self.current_token()
-        if token and token[0] == token_type:
-            print(f'Matched token: {token}')
-            self.current_token_index += 1
+        # Match a token of token_type and return its index
+        cursor = self.cursor
+        index = cursor.index
+        if cursor.kinds[cursor.kind_column[index]] == token_type:
+            if self.tracing:
+                self.trace.record(index)
+            cursor.index = index + 1
+            return index
         else:
             expected = token_type
-            got = token[0] if token else 'EOF'
-            raise RuntimeError(f'Syntax error: Expected token: {expected}, but got: {got}')
+            got = cursor.kind() or 'EOF'
+            raise ParseError(f'Syntax error: Expected token: {expected}, but got: {got}', index)
+
+    def eat_keyword(self, keyword):
+        if not self.cursor.text_is(keyword):
+            got = self.cursor.text() or 'EOF'
+            raise ParseError(f'Syntax error: Expected keyword: {keyword}, but got: {got}', self.cursor.index)
+        self.eat('IDENTIFIER')
+
+    def eat_text(self, token_type):
+        # Match a token of token_type and return its text
+        return self.tokens.text(self.eat(token_type))
 
     def parse(self):
-        while self.current_token_index < len(self.tokens):
-            token = self.current_token()
-            if token[0] == 'IDENTIFIER' and token[1] == 'if':
-                self.eat('IDENTIFIER')
-                self.eat('LPAREN')
-                self.expression()
-                self.eat('RPAREN')
-                self.eat('LBRACE')
-                self.statement()
-                self.eat('RBRACE')
+        program = []
+        cursor = self.cursor
+        while not cursor.at_end():
+            if self.recover:
+                program.append(self.recovering_statement(False))
             else:
-                break
+                program.append(self.statement())
+        return program
 
-    def expression(self):
-        # Basic expression parsing (can be expanded)
-        self.eat('IDENTIFIER')
-        self.eat('COMPARATOR')
-        self.eat('NUMBER')
+    def block(self):
+        # '{' statement* '}'; the statements are read in a loop, so a long
+        # body costs no stack depth, only nesting does
+        self.eat('LBRACE')
+        body = []
+        cursor = self.cursor
+        while not cursor.at_end() and cursor.kind() != 'RBRACE':
+            if self.recover:
+                body.append(self.recovering_statement(True))
+            else:
+                body.append(self.statement())
+        try:
+            self.eat('RBRACE')
+        except ParseError as error:
+            # Input ended inside the block; keep what it had
+            if not self.recover:
+                raise
+            self.report(error)
+        return body
+
+    def recovering_statement(self, in_block):
+        start = self.cursor.index
+        try:
+            return self.statement()
+        except ParseError as error:
+            self.report(error)
+            self.synchronize(start, in_block)
+            return ('error', str(error))
+
+    def synchronize(self, start, in_block):
+        # Panic mode: skip the rest of the statement that started at token
+        # start. Stops after a ';' outside braces or after the '}' closing a
+        # brace opened while skipping, and before a statement keyword or
+        # the '}' of the enclosing block. Always moves past start.
+        cursor = self.cursor
+        depth = 0
+        while not cursor.at_end():
+            kind = cursor.kind()
+            if kind == 'LBRACE':
+                depth += 1
+            elif kind == 'RBRACE':
+                if depth == 0 and in_block:
+                    return
+                depth -= 1
+                if depth <= 0:
+                    cursor.advance()
+                    return
+            elif depth == 0:
+                if kind == 'SEMICOLON':
+                    cursor.advance()
+                    return
+                if kind == 'IDENTIFIER' and cursor.index > start and cursor.text() in self.keyword_statements:
+                    return
+            cursor.advance()
+
+    def report(self, error):
+        # Record a ParseError as a Diagnostic at its token
+        tokens = self.tokens
+        if self.line_index is None:
+            self.line_index = LineIndex(tokens.source)
+        offset = tokens.start[error.index] if error.index < len(tokens) else len(tokens.source)
+        line, column = self.line_index.position(offset)
+        self.errors.append(Diagnostic(line, column, str(error), error.index))
 
     def statement(self):
-        while self.current_token() and self.current_token()[0] != 'RBRACE':
+        cursor = self.cursor
+        if cursor.kind() == 'IDENTIFIER':
+            parse_statement = self.keyword_statements.get(cursor.text())
+            if parse_statement:
+                return parse_statement()
+        expr = self.expression()
+        self.eat('SEMICOLON')
+        if type(expr) is tuple and expr[0] == 'assign':
+            return expr
+        return ('expr', expr)
+
+    def if_statement(self):
+        self.eat_keyword('if')
+        self.eat('LPAREN')
+        cond = self.expression()
+        self.eat('RPAREN')
+        body = self.block()
+        if self.cursor.text_is('else'):
             self.eat('IDENTIFIER')
+            return ('if', cond, body, self.block())
+        return ('if', cond, body)
+
+    def do_while_statement(self):
+        self.eat_keyword('do')
+        body = self.block()
+        self.eat_keyword('while')
+        self.eat('LPAREN')
+        cond = self.expression()
+        self.eat('RPAREN')
+        return ('do_while', body, cond)
+
+    def for_statement(self):
+        self.eat_keyword('for')
+        self.eat('LPAREN')
+        init = self.expression()
+        self.eat('SEMICOLON')
+        cond = self.expression()
+        self.eat('SEMICOLON')
+        step = self.expression()
+        self.eat('RPAREN')
+        return ('for', init, cond, step, self.block())
+
+    def method_declaration(self):
+        self.eat_keyword('def')
+        name = self.eat_text('IDENTIFIER')
+        self.eat('LPAREN')
+        params = []
+        if self.cursor.kind() != 'RPAREN':
+            params.append(self.eat_text('IDENTIFIER'))
+            while self.cursor.kind() == 'COMMA':
+                self.eat('COMMA')
+                params.append(self.eat_text('IDENTIFIER'))
+        self.eat('RPAREN')
+        return ('def', name, params, self.block())
+
+    def return_statement(self):
+        self.eat_keyword('return')
+        value = None
+        if self.cursor.kind() != 'SEMICOLON':
+            value = self.expression()
+        self.eat('SEMICOLON')
+        return ('return', value)
+
+    def expression(self, min_power=0):
+        # Precedence climbing: parse an operand, then fold in every binary
+        # operator that binds tighter than min_power. The right operand is
+        # parsed with the operator's own power, which makes it left
+        # associative, so the depth grows with precedence levels and
+        # parentheses, not with the length of the expression.
+        cursor = self.cursor
+        kind = cursor.kind()
+        # Keywords are not names, so they cannot be assigned to either
+        if (kind == 'IDENTIFIER' and min_power == 0 and cursor.peek_kind() == 'ASSIGN'
+                and cursor.text() not in KEYWORDS):
+            name = self.eat_text('IDENTIFIER')
             self.eat('ASSIGN')
-            self.eat('NUMBER')
-            self.eat('SEMICOLON')
+            return ('assign', name, self.expression())
+        left = self.primary(kind)
+        while True:
+            kind = cursor.kind()
+            if kind != 'OPERATOR' and kind != 'COMPARATOR':
+                return left
+            operator = cursor.text()
+            power = BINARY_POWER[operator]
+            if power <= min_power:
+                return left
+            self.eat(kind)
+            left = (operator, left, self.expression(power))
+
+    def primary(self, kind):
+        # An operand starting with a token of kind
+        cursor = self.cursor
+        if kind == 'NUMBER':
+            return self.eat_text('NUMBER')
+        if kind == 'IDENTIFIER' and cursor.text() not in KEYWORDS:
+            return self.eat_text('IDENTIFIER')
+        if kind == 'LPAREN':
+            self.eat('LPAREN')
+            expr = self.expression()
+            self.eat('RPAREN')
+            return expr
+        got = cursor.text() if kind == 'IDENTIFIER' else kind or 'EOF'
+        raise ParseError(f'Syntax error: Expected expression, but got: {got}', cursor.index)
+
+    def format_trace(self, events, complete=True):
+        # Trace lines as the parser used to print them
+        for index in events:
+            yield f'Matched token: {self.tokens[index]}'
+
+    def dump_trace(self, out=None):
+        self.trace.dump(self.format_trace, out)
 
 def main():
     print("Enter Zara code (type 'exit' to finish input):")
@@ -111,12 +415,20 @@ def main():
 
     try:
         tokenizer = Tokenizer(full_code)
-        tokens = tokenizer.tokenize()
-        print("Tokens:", tokens)
+        tokens = tokenizer.tokenize_buffer()
+        print("Tokens:", list(tokens))
 
-        parser = Parser(tokens)
-        parser.parse()
-        print("Parsing completed successfully.")
+        parser = Parser(tokens, FullTrace(), recover=True)
+        try:
+            program = parser.parse()
+        finally:
+            parser.dump_trace()
+        for error in parser.errors:
+            print(error)
+        if not parser.errors:
+            print("Parsing completed successfully.")
+        for statement in program:
+            print(statement)
     except RuntimeError as e:
         print(e)
 
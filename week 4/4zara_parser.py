@@ -1,96 +1,351 @@
-# Define the grammar rules for reductions
-rules = {
-    1: ("E", 3),  # E -> E + T
-    2: ("E", 1),  # E -> T
-    3: ("T", 3),  # T -> T * F
-    4: ("T", 1),  # T -> F
-    5: ("F", 1),  # F -> id
-    6: ("C", 5),  # C -> if E then S
-    7: ("C", 4),  # C -> if E then S else S
-    8: ("S", 1),  # S -> id = E
-    9: ("S", 3),  # S -> { S }
-    10: ("S", 1), # S -> S ; S
-}
-
-# Action table as a dictionary of dictionaries
-action_table = {
-    0: {"id": "S5", "(": "S4", "if": "S6", "$": None},
-    1: {"id": None, "+": "S3", "$": "Accept"},
-    2: {"id": None, "+": "R2", "$": "R2"},
-    3: {"id": "S5", "(": "S4", "+": None},
-    4: {"id": "S5", "(": "S4", "+": None},
-    5: {"id": None, "+": "R4", "$": "R4"},
-    6: {"id": None, "(": None, "if": None, "then": "S7"},
-    7: {"id": "S5", "(": "S4", "else": "S8"},
-    8: {"id": "S5", "(": "S4", "$": None},
-}
+import gc
+import os
+import sys
+import threading
+from itertools import accumulate
+
+from lalr import conflict_report, encode_tables, load_tables
+
+# Syntax errors and trace sinks are week 3's; that folder goes after this
+# one on the path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'week 3'))
+from diagnostics import Diagnostic
+from parse_trace import NO_TRACE, FullTrace
+
+# Grammar productions; rule numbers start at 1 in this order. The parse
+# tables are generated from them (see lalr.py) and cached on disk.
+productions = [
+    ("E", ("E", "+", "T")),                    # 1
+    ("E", ("T",)),                             # 2
+    ("T", ("T", "*", "F")),                    # 3
+    ("T", ("F",)),                             # 4
+    ("F", ("id",)),                            # 5
+    ("C", ("if", "E", "then", "U")),           # 6
+    ("C", ("if", "E", "then", "U", "else", "U")),  # 7
+    ("U", ("id", "=", "E")),                   # 8
+    ("U", ("{", "S", "}")),                    # 9
+    ("S", ("S", ";", "U")),                    # 10: S is a sequence of
+    ("S", ("U",)),                             # 11: single statements U
+    ("U", ("C",)),                             # 12: an if is one of them
+]
+start_symbol = "S"
+
+tables = load_tables(productions, start_symbol)
+
+# Rule number -> (lhs, number of rhs symbols) for reductions
+rules = tables['rules']
+
+# Action table as a dictionary of dictionaries: "S<state>" shifts,
+# "R<rule>" reduces, "Accept" accepts
+action_table = tables['action']
 
 # Goto table as a dictionary of dictionaries
-goto_table = {
-    0: {"E": 1, "T": 2, "C": 9, "S": 10},
-    1: {},
-    2: {},
-    3: {"T": 6},
-    4: {"E": 7, "T": 2},
-    5: {},
-    6: {},
-    7: {"S": 11},
-    8: {},
-}
-
-def shift_reduce_parser(input_tokens):
+goto_table = tables['goto']
+
+# The same tables as integer arrays, which is what the parser runs on (see
+# encode_tables in lalr.py): the goto table dense, the action table in its
+# row-displaced form, which is as fast to read
+encoded = encode_tables(tables)
+
+def action_at(state, terminal):
+    # Action table entry, 0 (error) where the row has none
+    slot = encoded['action_base'][state] + terminal
+    return encoded['action_value'][slot] if encoded['action_check'][slot] == state else 0
+
+# Error recovery resumes parsing as if a single statement had been read: it
+# pushes the goto on U of a state on the stack. The statements before it in
+# the same sequence stay on the stack below that state, so they are kept.
+# Terminals some such goto target can act on are the only ones worth
+# stopping at.
+recovery_name = "U"
+recovery_symbol = tables['nonterminals'].index(recovery_name)
+
+def find_recovery_terminals():
+    width = encoded['action_width']
+    goto = encoded['goto']
+    goto_width = encoded['goto_width']
+    terminals = set()
+    for state in range(len(goto) // goto_width):
+        target = goto[state * goto_width + recovery_symbol]
+        if target:
+            terminals.update(terminal for terminal in range(width) if action_at(target, terminal))
+    return terminals
+
+recovery_terminals = find_recovery_terminals()
+
+# The cycle collector is paused while a parse runs (see
+# shift_reduce_parser). Its switch is process-wide, so parses that overlap
+# in several threads share one pause: the first to start turns the
+# collector off if it is on, and the last to finish turns it back on. If
+# it is off when the first parse starts, it is left off.
+collector_lock = threading.Lock()
+collector_parses = 0
+collector_was_enabled = False
+
+def pause_collector():
+    global collector_parses, collector_was_enabled
+    with collector_lock:
+        if collector_parses == 0:
+            collector_was_enabled = gc.isenabled()
+            gc.disable()
+        collector_parses += 1
+
+def resume_collector():
+    global collector_parses
+    with collector_lock:
+        collector_parses -= 1
+        if collector_parses == 0 and collector_was_enabled:
+            gc.enable()
+
+class Node:
+    # Syntax tree node, built by one reduction: symbol is the rule's left-hand
+    # side, children a list with one entry per right-hand side symbol, a Node for a
+    # nonterminal and the token string for a terminal
+    __slots__ = ('symbol', 'rule', 'children')
+
+    def __init__(self, symbol, rule, children):
+        self.symbol = symbol
+        self.rule = rule
+        self.children = children
+
+    def __repr__(self):
+        return f"Node({self.symbol!r}, {self.rule}, {len(self.children)} children)"
+
+def tree_lines(node, indent=""):
+    # Indented lines of the tree under node, without recursion so deeply
+    # nested programs print too
+    pending = [(node, indent)]
+    while pending:
+        node, indent = pending.pop()
+        if isinstance(node, Node) and node.rule is None:
+            yield f"{indent}{node.symbol}: skipped {' '.join(node.children)}"
+        elif isinstance(node, Node):
+            yield f"{indent}{node.symbol} (rule {node.rule})"
+            for child in reversed(node.children):
+                pending.append((child, indent + "  "))
+        else:
+            yield f"{indent}{node}"
+
+# Trace events, recorded as (SHIFT, state, index), (REDUCE, state, index,
+# rule number), (ACCEPT, state, index) and (RECOVER, state, index, states
+# kept, index parsing resumed at)
+SHIFT, REDUCE, ACCEPT, RECOVER = 0, 1, 2, 3
+
+def terminal_ids(input_tokens):
+    # Token strings to terminal ids; tokens not in the grammar get an id
+    # with no actions
+    ids = encoded['terminal_ids']
+    unknown = encoded['unknown_terminal']
+    return [ids.get(token, unknown) for token in input_tokens]
+
+def shift_reduce_parser(input_tokens, trace=NO_TRACE, errors=None):
+    # Without errors, parsing stops at the first syntax error. Given a list
+    # as errors, every syntax error is appended to it as a Diagnostic and
+    # the parser recovers (see recovery_point); the tree it returns then has
+    # an 'error' Node in place of each single statement it gave up on.
     # Append end-of-input symbol
     input_tokens.append("$")
-    
-    # Stack for parsing states
-    stack = [0]
-    
+    ids = terminal_ids(input_tokens)
+    # Every reduction allocates a Node, which would set off the cycle
+    # collector over and over on a long input (about 3x the parse time); a
+    # tree has no cycles, so it is paused for the parse.
+    pause_collector()
+    try:
+        return parse_terminal_ids(ids, input_tokens, trace, errors)
+    finally:
+        resume_collector()
+
+def recovery_point(states, ids, index, bottom_only):
+    # Panic mode: skip input from index to the first token that the goto on
+    # U of some stacked state can act on, taking the topmost such state.
+    # Returns (depth of that state, its goto target, index of the token).
+    # The goto on U of state 0 reduces on "$", so the search always ends.
+    goto = encoded['goto']
+    goto_width = encoded['goto_width']
+    while True:
+        terminal = ids[index]
+        if terminal in recovery_terminals:
+            for depth in range(0 if bottom_only else len(states) - 1, -1, -1):
+                target = goto[states[depth] * goto_width + recovery_symbol]
+                if target and action_at(target, terminal):
+                    return depth, target, index
+        index += 1
+
+def ends_in_recovery(values):
+    # Whether the tree values are a top-level 'error' Node, or a top-level
+    # sequence whose last statement is one, followed by nothing but ';'
+    position = len(values) - 1
+    while position > 0 and values[position] == ";":
+        position -= 1
+    if position != 0:
+        return False
+    node = values[0]
+    if isinstance(node, Node) and node.symbol == start_symbol:
+        node = node.children[-1]
+    return isinstance(node, Node) and node.symbol == 'error'
+
+def parse_terminal_ids(ids, input_tokens, trace=NO_TRACE, errors=None):
+    # The parser proper, on terminal ids ending with the id of "$". Returns
+    # the root Node, or None on a syntax error.
+    action_base = encoded['action_base']
+    action_check = encoded['action_check']
+    action_value = encoded['action_value']
+    goto = encoded['goto']
+    goto_width = encoded['goto_width']
+    rule_lhs = encoded['rule_lhs']
+    rule_length = encoded['rule_length']
+    symbols = tables['nonterminals']
+
+    # Parsing states, and the tree value under each state but the first.
+    # Reductions pop both in place, so each step is O(1) however deep the
+    # stacks get.
+    states = [0]
+    values = []
+
     index = 0
-    print("Stack\t\tInput\t\tAction")
+    tracing = trace.enabled
+    last_recovery = -1
+    columns = None
     while True:
         # Get current state from the stack
-        state = stack[-1]
-        current_token = input_tokens[index]
-
-        action = action_table.get(state, {}).get(current_token)
-
-        if action is None:
-            print(f"Error: Unexpected token '{current_token}' at index {index}")
-            return False
-
-        # Convert stack to string format for printing
-        stack_str = " ".join(map(str, stack))
-        input_str = " ".join(input_tokens[index:])
-
-        if action == "Accept":
-            print(f"{stack_str}\t\t{input_str}\t\tAccept")
-            return True
-        elif action.startswith("S"):  # Shift operation
-            print(f"{stack_str}\t\t{input_str}\t\tShift {current_token}")
-            stack.append(current_token)
-            stack.append(int(action[1:]))  # Push the new state
+        state = states[-1]
+        terminal = ids[index]
+
+        slot = action_base[state] + terminal
+        action = action_value[slot] if action_check[slot] == state else 0
+
+        if action > 0:  # Shift operation, to state `action`
+            if tracing:
+                trace.record((SHIFT, state, index))
+            states.append(action)  # Push the new state
+            values.append(input_tokens[index])
             index += 1  # Move to the next input token
-        elif action.startswith("R"):  # Reduce operation
-            rule_num = int(action[1:])
-            lhs, rhs_len = rules[rule_num]
-            print(f"{stack_str}\t\t{input_str}\t\tReduce {lhs} -> {''.join(map(str, stack[-2 * rhs_len:][1::2]))}")
-            stack = stack[:-2 * rhs_len]  # Pop 2 * rhs_len (states and symbols)
-            state = stack[-1]  # New top of the stack
-            goto = goto_table[state].get(lhs)
-            if goto is not None:
+        elif action < -1:  # Reduce operation, by rule -action - 1
+            rule_num = -action - 1
+            if tracing:
+                trace.record((REDUCE, state, index, rule_num))
+            cut = len(values) - rule_length[rule_num]
+            children = values[cut:]
+            del values[cut:]  # Pop states and values
+            del states[cut + 1:]
+            lhs = rule_lhs[rule_num]
+            target = goto[states[-1] * goto_width + lhs]
+            if not target:
+                print("Error in goto table.")
+                return None
+            states.append(target)
+            values.append(Node(symbols[lhs], rule_num, children))
+        elif action == -1:
+            if tracing:
+                trace.record((ACCEPT, state, index))
+            return values[-1]
+        elif errors is None:
+            print(f"Error: Unexpected token '{input_tokens[index]}' at index {index}")
+            return None
+        else:
+            if columns is None:
+                # Columns as on the line the tokens were split from, one
+                # space apart: the lengths of the tokens before, plus one
+                # per token
+                columns = list(accumulate(map(len, input_tokens), initial=1))
+            start = index
+            bottom_only = False
+            # Failing again where the last recovery resumed is not a new
+            # error; the token is dropped then, or at the end the search
+            # falls back to the bottom of the stack. Nor is reaching the
+            # end with only ';' read since the last recovery: that
+            # recovery has taken the input to its end.
+            if index != last_recovery:
+                if index < len(ids) - 1 or not ends_in_recovery(values):
+                    errors.append(Diagnostic(1, columns[index] + index, f"Unexpected token '{input_tokens[index]}'", index))
+            elif index < len(ids) - 1:
+                index += 1
+            else:
+                bottom_only = True
+            depth, target, index = recovery_point(states, ids, index, bottom_only)
+            if tracing:
+                trace.record((RECOVER, state, start, depth + 1, index))
+            del states[depth + 1:]
+            del values[depth:]
+            states.append(target)
+            values.append(Node('error', None, input_tokens[start:index]))
+            last_recovery = index
+
+def trace_formatter(input_tokens):
+    # Formatter for a shift_reduce_parser trace of input_tokens. A complete
+    # trace is replayed from the start to print the stack and remaining input
+    # of every step, as the parser used to; otherwise only the steps are
+    # printed, since the stack at the first kept step is not known.
+    def format_steps(events, complete):
+        if not complete:
+            for event in events:
+                kind, state, index = event[:3]
+                if kind == SHIFT:
+                    action = f"Shift {input_tokens[index]}"
+                elif kind == REDUCE:
+                    lhs, rhs_len = rules[event[3]]
+                    action = f"Reduce by rule {event[3]} ({lhs}, {rhs_len} symbols)"
+                elif kind == RECOVER:
+                    action = f"Error, resume at token {event[4]}"
+                else:
+                    action = "Accept"
+                yield f"state {state}\tat token {index}\t\t{action}"
+            return
+
+        yield "Stack\t\tInput\t\tAction"
+        stack = [0]
+        for event in events:
+            kind, state, index = event[:3]
+            stack_str = " ".join(map(str, stack))
+            input_str = " ".join(input_tokens[index:])
+            if kind == SHIFT:
+                yield f"{stack_str}\t\t{input_str}\t\tShift {input_tokens[index]}"
+                stack.append(input_tokens[index])
+                stack.append(int(action_table[state][input_tokens[index]][1:]))
+            elif kind == REDUCE:
+                lhs, rhs_len = rules[event[3]]
+                yield f"{stack_str}\t\t{input_str}\t\tReduce {lhs} -> {''.join(map(str, stack[-2 * rhs_len:][1::2]))}"
+                del stack[-2 * rhs_len:]
+                goto = goto_table[stack[-1]].get(lhs)
+                if goto is None:
+                    return  # The parser stopped here with a goto table error
                 stack.append(lhs)
                 stack.append(goto)
+            elif kind == RECOVER:
+                yield f"{stack_str}\t\t{input_str}\t\tError, resume at token {event[4]}"
+                del stack[2 * event[3] - 1:]
+                target = goto_table[stack[-1]][recovery_name]
+                stack.append("error")
+                stack.append(target)
             else:
-                print("Error in goto table.")
-                return False
-        else:
-            print("Unexpected action.")
-            return False
+                yield f"{stack_str}\t\t{input_str}\t\tAccept"
+    return format_steps
+
+if __name__ == "__main__":
+    if '--conflicts' in sys.argv:
+        # The one conflict is the dangling else, "if E then if E then U
+        # else U", resolved as a shift: the else goes with the nearest if.
+        # An if's branches are single statements (U), so in
+        # "if E then U ; U" the second statement follows the if.
+        for line in conflict_report(tables):
+            print(line)
+        sys.exit(0)
 
-# Prompt user for input
-user_input = input("Enter the Zara program (tokens separated by spaces): ")
-input_tokens = user_input.split()
-shift_reduce_parser(input_tokens)
+    # Prompt user for input
+    user_input = input("Enter the Zara program (tokens separated by spaces): ")
+    input_tokens = user_input.split()
+    trace = FullTrace()
+    errors = []
+    tree = None
+    try:
+        tree = shift_reduce_parser(input_tokens, trace, errors)
+    finally:
+        trace.dump(trace_formatter(input_tokens))
+    for error in errors:
+        print(error)
+    if tree is not None:
+        for line in tree_lines(tree):
+            print(line)
 
 # Action table as a dictionary of dictionaries 
 
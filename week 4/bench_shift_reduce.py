@@ -0,0 +1,240 @@
+# Steps/sec of shift_reduce_parser on long token streams
+#
+# Usage: python bench_shift_reduce.py [statements]
+#
+# Compares the driver on the dict tables with "S4"/"R2" strings it used
+# before with the same loop on the dense integer action table and on its
+# row-displaced form, which is what the parser runs on. None of the three
+# builds a tree; the parser itself, which does, is timed after them. A step
+# is one shift, reduce or accept.
+#
+# Then times the parser on "{ { ... id = id ... } }" at growing depths; with
+# the stacks popped in place the time per step should not grow with depth.
+# Last, error recovery: the same token stream parsed with an error list, as
+# is and with one token in every N dropped, after checking that the
+# statements before an error in the middle of a program survive it.
+
+import importlib.util
+import os
+import random
+import sys
+import time
+
+spec = importlib.util.spec_from_file_location(
+    'zara_parser', os.path.join(os.path.dirname(os.path.abspath(__file__)), '4zara_parser.py'))
+zara_parser = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(zara_parser)
+# Loading the parser put week 3, where the trace sinks are, on the path
+from parse_trace import FullTrace
+
+STATEMENTS = (
+    "id = id + id * id",
+    "if id then id = id else { id = id * id ; id = id }",
+    "{ id = id + id }",
+    "if id + id then if id then id = id",
+)
+
+
+def make_tokens(statements):
+    text = " ; ".join(STATEMENTS[index % len(STATEMENTS)] for index in range(statements))
+    return text.split()
+
+
+def make_nested(depth):
+    return ["{"] * depth + ["id", "=", "id"] + ["}"] * depth
+
+
+def legacy_parser(input_tokens):
+    # The driver before the integer tables, without its trace
+    action_table = zara_parser.action_table
+    goto_table = zara_parser.goto_table
+    rules = zara_parser.rules
+    input_tokens.append("$")
+    stack = [0]
+    index = 0
+    while True:
+        state = stack[-1]
+        current_token = input_tokens[index]
+        action = action_table.get(state, {}).get(current_token)
+        if action is None:
+            return False
+        if action == "Accept":
+            return True
+        elif action.startswith("S"):
+            stack.append(current_token)
+            stack.append(int(action[1:]))
+            index += 1
+        elif action.startswith("R"):
+            rule_num = int(action[1:])
+            lhs, rhs_len = rules[rule_num]
+            del stack[-2 * rhs_len:]
+            goto = goto_table[stack[-1]].get(lhs)
+            if goto is None:
+                return False
+            stack.append(lhs)
+            stack.append(goto)
+        else:
+            return False
+
+
+def dense_parser(input_tokens):
+    # The driver on the dense integer action table
+    encoded = zara_parser.encoded
+    input_tokens.append("$")
+    ids = zara_parser.terminal_ids(input_tokens)
+    action_table = encoded['action']
+    width = encoded['action_width']
+    goto = encoded['goto']
+    goto_width = encoded['goto_width']
+    rule_lhs = encoded['rule_lhs']
+    rule_length = encoded['rule_length']
+    stack = [0]
+    index = 0
+    while True:
+        state = stack[-1]
+        terminal = ids[index]
+        action = action_table[state * width + terminal]
+        if action > 0:
+            stack.append(terminal)
+            stack.append(action)
+            index += 1
+        elif action < -1:
+            rule_num = -action - 1
+            del stack[-2 * rule_length[rule_num]:]
+            lhs = rule_lhs[rule_num]
+            target = goto[stack[-1] * goto_width + lhs]
+            if not target:
+                return False
+            stack.append(lhs)
+            stack.append(target)
+        else:
+            return action == -1
+
+
+def displaced_parser(input_tokens):
+    # The same on the row-displaced action table
+    encoded = zara_parser.encoded
+    input_tokens.append("$")
+    ids = zara_parser.terminal_ids(input_tokens)
+    action_base = encoded['action_base']
+    action_check = encoded['action_check']
+    action_value = encoded['action_value']
+    goto = encoded['goto']
+    goto_width = encoded['goto_width']
+    rule_lhs = encoded['rule_lhs']
+    rule_length = encoded['rule_length']
+    stack = [0]
+    index = 0
+    while True:
+        state = stack[-1]
+        terminal = ids[index]
+        slot = action_base[state] + terminal
+        action = action_value[slot] if action_check[slot] == state else 0
+        if action > 0:
+            stack.append(terminal)
+            stack.append(action)
+            index += 1
+        elif action < -1:
+            rule_num = -action - 1
+            del stack[-2 * rule_length[rule_num]:]
+            lhs = rule_lhs[rule_num]
+            target = goto[stack[-1] * goto_width + lhs]
+            if not target:
+                return False
+            stack.append(lhs)
+            stack.append(target)
+        else:
+            return action == -1
+
+
+DROP_EVERY = (1000, 100, 10)
+
+
+def drop_tokens(tokens, every, seed=0):
+    rng = random.Random(seed)
+    return [token for token in tokens if rng.randrange(every)]
+
+
+def sequence_items(tree):
+    # The single statements (U nodes and error nodes) of a sequence, in order
+    found = []
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if node.symbol == 'S':
+            pending.extend(reversed(node.children[::2]))
+        else:
+            found.append(node.symbol if node.rule is None else node.rule)
+    return found
+
+
+def check_recovery():
+    errors = []
+    tree = zara_parser.shift_reduce_parser("id = id ; id = id ; foo ; id = id".split(), errors=errors)
+    assert len(errors) == 1
+    assert sequence_items(tree) == [8, 8, 'error', 8], sequence_items(tree)
+    # Once recovery has taken the input to its end, reaching it is no error
+    errors = []
+    zara_parser.shift_reduce_parser("; ; ;".split(), errors=errors)
+    assert [error.index for error in errors] == [0, 1, 2], [str(error) for error in errors]
+    errors = []
+    zara_parser.shift_reduce_parser("id = id ;".split(), errors=errors)
+    assert [error.index for error in errors] == [4]
+
+
+def best_time(parse, tokens, rounds=3):
+    best = None
+    for _ in range(rounds):
+        copy = list(tokens)
+        start = time.perf_counter()
+        accepted = parse(copy)
+        elapsed = time.perf_counter() - start
+        assert accepted is not None and accepted is not False
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    tokens = make_tokens(statements)
+    trace = FullTrace()
+    assert zara_parser.shift_reduce_parser(list(tokens), trace) is not None
+    steps = len(trace.events())
+    encoded = zara_parser.encoded
+    print(f"{len(tokens)} tokens, {steps} steps")
+    print(f"action table: {len(encoded['action'])} entries dense, "
+          f"{len(encoded['action_value'])} row-displaced (+{len(encoded['action_base'])} bases)")
+
+    for name, parse in (("dict tables", legacy_parser),
+                        ("dense ints", dense_parser),
+                        ("row-displaced", displaced_parser),
+                        ("parser + tree", zara_parser.shift_reduce_parser)):
+        elapsed = best_time(parse, tokens)
+        print(f"{name:14} {elapsed:6.3f}s  {steps / elapsed:12,.0f} steps/s")
+
+    print()
+    for depth in (1000, 10000, 100000):
+        tokens = make_nested(depth)
+        trace = FullTrace()
+        zara_parser.shift_reduce_parser(list(tokens), trace)
+        steps = len(trace.events())
+        elapsed = best_time(zara_parser.shift_reduce_parser, tokens)
+        print(f"depth {depth:7}  {elapsed:6.3f}s  {elapsed / steps * 1e9:6.0f} ns/step")
+
+    print()
+    check_recovery()
+    tokens = make_tokens(statements)
+    for every in (None,) + DROP_EVERY:
+        damaged = drop_tokens(tokens, every) if every else tokens
+        errors = []
+
+        def parse(tokens):
+            del errors[:]
+            return zara_parser.shift_reduce_parser(tokens, errors=errors)
+
+        elapsed = best_time(parse, damaged)
+        name = f"1/{every} lost" if every else "no errors"
+        print(f"recover, {name:11} {elapsed:6.3f}s  {len(damaged) / elapsed:12,.0f} tokens/s  {len(errors):7} errors")
+
+if __name__ == "__main__":
+    main()
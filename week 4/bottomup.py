@@ -14,41 +14,78 @@
 
 """
 
+import os
 import re
+import sys
+
+# The token buffer, syntax errors and trace sinks are week 3's; that folder
+# goes after this one on the path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'week 3'))
+import token_buffer
+from diagnostics import Diagnostic, LineIndex, ParseError
+from parse_trace import NO_TRACE, FullTrace
+
+token_specification = [
+    ('NUMBER', r'\d+(\.\d*)?'),      # Integer or decimal number
+    ('ASSIGN', r'='),                 # Assignment operator
+    ('PLUS', r'\+'),                  # Addition operator
+    ('MINUS', r'-'),                  # Subtraction operator
+    ('MULT', r'\*'),                  # Multiplication operator
+    ('DIV', r'/'),                    # Division operator
+    ('IDENTIFIER', r'[A-Za-z_][A-Za-z0-9_]*'),  # Identifiers
+    ('LPAREN', r'\('),                # Parenthesis
+    ('RPAREN', r'\)'),                # Parenthesis
+    ('LBRACE', r'\{'),                # Left brace
+    ('RBRACE', r'\}'),                # Right brace
+    ('SEMICOLON', r';'),              # Semicolon
+    ('SKIP', r'[ \t]+'),              # Skip spaces and tabs
+    ('NEWLINE', r'\n'),               # Line endings
+    ('MISMATCH', r'.'),               # Any other character
+]
+
+tok_regex = re.compile('|'.join(f'(?P<{pair[0]}>{pair[1]})' for pair in token_specification))
+
+# Keywords are lexed as identifiers and looked up as whole words, so "iffy"
+# stays one identifier and "if" becomes IF
+KEYWORDS = {'if': 'IF', 'else': 'ELSE', 'while': 'WHILE', 'do': 'DO', 'for': 'FOR', 'return': 'RETURN'}
+
+# Token kinds that end up in the token stream, indexed by kind id
+TOKEN_KINDS = tuple(kind for kind, pattern in token_specification
+                    if kind not in ('SKIP', 'NEWLINE', 'MISMATCH')) + tuple(KEYWORDS.values())
+
+class TokenBuffer(token_buffer.TokenBuffer):
+    KINDS = TOKEN_KINDS
+
+# Trace events: (MATCHED, index) for each token the parse loop takes,
+# (EXPECTED, index, kind) for each token expect() takes and (NOTE, text)
+MATCHED, EXPECTED, NOTE = 0, 1, 2
+
+# Token kinds that start a statement; recovery stops before them
+STATEMENT_KINDS = ('IF', 'DO', 'FOR', 'RETURN')
 
 class Parser:
-    def __init__(self):
-        self.tokens = []
-        self.position = 0
+    def __init__(self, tokens=None, trace=NO_TRACE, recover=False):
+        # Accepts a TokenBuffer or a list of (kind, value) tuples; tokenize()
+        # fills the buffer from source code instead. Steps are recorded in
+        # trace (see parse_trace.py) rather than printed. With recover, a
+        # syntax error goes to self.errors and parsing goes on after it
+        # (see synchronize) instead of raising ParseError.
+        if tokens is not None and not isinstance(tokens, TokenBuffer):
+            tokens = TokenBuffer.from_tuples(tokens)
+        self.tokens = tokens if tokens is not None else TokenBuffer('')
+        self.cursor = self.tokens.cursor()
+        self.trace = trace
+        self.tracing = trace.enabled
+        self.recover = recover
+        self.errors = []
+        self.line_index = None
     
     def tokenize(self, code):
-        token_specification = [
-            ('NUMBER', r'\d+(\.\d*)?'),      # Integer or decimal number
-            ('ASSIGN', r'='),                 # Assignment operator
-            ('PLUS', r'\+'),                  # Addition operator
-            ('MINUS', r'-'),                  # Subtraction operator
-            ('MULT', r'\*'),                  # Multiplication operator
-            ('DIV', r'/'),                    # Division operator
-            ('IDENTIFIER', r'[A-Za-z_][A-Za-z0-9_]*'),  # Identifiers
-            ('LPAREN', r'\('),                # Parenthesis
-            ('RPAREN', r'\)'),                # Parenthesis
-            ('LBRACE', r'\{'),                # Left brace
-            ('RBRACE', r'\}'),                # Right brace
-            ('IF', r'if'),                    # If keyword
-            ('ELSE', r'else'),                # Else keyword
-            ('WHILE', r'while'),              # While keyword
-            ('DO', r'do'),                    # Do keyword
-            ('FOR', r'for'),                  # For keyword
-            ('RETURN', r'return'),            # Return keyword
-            ('SEMICOLON', r';'),              # Semicolon
-            ('SKIP', r'[ \t]+'),              # Skip spaces and tabs
-            ('NEWLINE', r'\n'),               # Line endings
-            ('MISMATCH', r'.'),               # Any other character
-        ]
-        tok_regex = '|'.join(f'(?P<{pair[0]}>{pair[1]})' for pair in token_specification)
+        self.tokens = TokenBuffer(code)
+        self.line_index = None
         line_number = 1
         line_start = 0
-        for mo in re.finditer(tok_regex, code):
+        for mo in tok_regex.finditer(code):
             kind = mo.lastgroup
             value = mo.group()
             if kind == 'NEWLINE':
@@ -59,78 +96,133 @@ class Parser:
             elif kind == 'MISMATCH':
                 raise RuntimeError(f'{value} unexpected on line {line_number}')
             else:
-                self.tokens.append((kind, value))
+                if kind == 'IDENTIFIER':
+                    kind = KEYWORDS.get(value, kind)
+                self.tokens.append(kind, mo.start(), mo.end())
+        self.cursor = self.tokens.cursor()
     
     def parse(self):
-        while self.position < len(self.tokens):
-            token = self.tokens[self.position]
-            print(f'Matched token: {token}')
-            self.position += 1
-            
-            # Implement parsing logic for shift/reduce parsing.
-            # This should include handling expressions, control structures, etc.
-            
-            # Example parsing logic for handling statements and control structures
-            if token[0] == 'IF':
-                # Handle if statement
-                print("Parsing if statement...")
-                self.expect('LPAREN')
-                self.expect('IDENTIFIER')  # Assuming the condition is an identifier
-                self.expect('ASSIGN')       # Assuming an assignment operation
-                self.expect('NUMBER')       # Assuming the number to compare against
-                self.expect('RPAREN')
-                self.expect('LBRACE')
-                # Parse the block statements
-                self.expect('RBRACE')
-            elif token[0] == 'DO':
-                print("Parsing do statement...")
-                self.expect('LBRACE')
-                # Assume some statements here
-                self.expect('RBRACE')
-                self.expect('WHILE')
-                self.expect('LPAREN')
-                self.expect('IDENTIFIER')
-                self.expect('LESS')         # Assuming a comparison operator
-                self.expect('NUMBER')
-                self.expect('RPAREN')
-            elif token[0] == 'FOR':
-                print("Parsing for loop...")
-                self.expect('LPAREN')
-                self.expect('IDENTIFIER')
-                self.expect('ASSIGN')
-                self.expect('NUMBER')
-                self.expect('SEMICOLON')
-                # Assuming loop condition
-                self.expect('IDENTIFIER')
-                self.expect('LESS')         # Assuming a comparison operator
-                self.expect('NUMBER')
-                self.expect('SEMICOLON')
-                # Assuming loop update
-                self.expect('IDENTIFIER')
-                self.expect('ASSIGN')
-                self.expect('IDENTIFIER')
-                self.expect('PLUS')
-                self.expect('NUMBER')
-                self.expect('RPAREN')
-                self.expect('LBRACE')
-                # Parse the loop body
-                self.expect('RBRACE')
-            elif token[0] == 'SEMICOLON':
-                print("Semicolon found, ending statement.")
+        cursor = self.cursor
+        trace = self.trace
+        while not cursor.at_end():
+            kind = cursor.kind()
+            if self.tracing:
+                trace.record((MATCHED, cursor.index))
+            cursor.advance()
+            if not self.recover:
+                self.statement(kind)
+                continue
+            try:
+                self.statement(kind)
+            except ParseError as error:
+                self.report(error)
+                self.synchronize()
+
+    def statement(self, kind):
+        # Parse the statement after its first token, of kind
+        trace = self.trace
+        # Implement parsing logic for shift/reduce parsing.
+        # This should include handling expressions, control structures, etc.
+        
+        # Example parsing logic for handling statements and control structures
+        if kind == 'IF':
+            # Handle if statement
+            if self.tracing:
+                trace.record((NOTE, "Parsing if statement..."))
+            self.expect('LPAREN')
+            self.expect('IDENTIFIER')  # Assuming the condition is an identifier
+            self.expect('ASSIGN')       # Assuming an assignment operation
+            self.expect('NUMBER')       # Assuming the number to compare against
+            self.expect('RPAREN')
+            self.expect('LBRACE')
+            # Parse the block statements
+            self.expect('RBRACE')
+        elif kind == 'DO':
+            if self.tracing:
+                trace.record((NOTE, "Parsing do statement..."))
+            self.expect('LBRACE')
+            # Assume some statements here
+            self.expect('RBRACE')
+            self.expect('WHILE')
+            self.expect('LPAREN')
+            self.expect('IDENTIFIER')
+            self.expect('LESS')         # Assuming a comparison operator
+            self.expect('NUMBER')
+            self.expect('RPAREN')
+        elif kind == 'FOR':
+            if self.tracing:
+                trace.record((NOTE, "Parsing for loop..."))
+            self.expect('LPAREN')
+            self.expect('IDENTIFIER')
+            self.expect('ASSIGN')
+            self.expect('NUMBER')
+            self.expect('SEMICOLON')
+            # Assuming loop condition
+            self.expect('IDENTIFIER')
+            self.expect('LESS')         # Assuming a comparison operator
+            self.expect('NUMBER')
+            self.expect('SEMICOLON')
+            # Assuming loop update
+            self.expect('IDENTIFIER')
+            self.expect('ASSIGN')
+            self.expect('IDENTIFIER')
+            self.expect('PLUS')
+            self.expect('NUMBER')
+            self.expect('RPAREN')
+            self.expect('LBRACE')
+            # Parse the loop body
+            self.expect('RBRACE')
+        elif kind == 'SEMICOLON':
+            if self.tracing:
+                trace.record((NOTE, "Semicolon found, ending statement."))
 
     def expect(self, expected_token_type):
-        if self.position < len(self.tokens):
-            token = self.tokens[self.position]
-            if token[0] == expected_token_type:
-                print(f'Expected {expected_token_type}, got {token}')
-                self.position += 1
+        cursor = self.cursor
+        if not cursor.at_end():
+            if cursor.kind() == expected_token_type:
+                if self.tracing:
+                    self.trace.record((EXPECTED, cursor.index, expected_token_type))
+                cursor.advance()
             else:
-                raise RuntimeError(f'Expected {expected_token_type}, got {token}')
+                raise ParseError(f'Expected {expected_token_type}, got {cursor.token()}', cursor.index)
         else:
-            raise RuntimeError(f'Expected {expected_token_type}, but reached end of input.')
+            raise ParseError(f'Expected {expected_token_type}, but reached end of input.', cursor.index)
+
+    def synchronize(self):
+        # Panic mode: skip tokens up to and including the next ';' or '}',
+        # or up to the next token that starts a statement
+        cursor = self.cursor
+        while not cursor.at_end():
+            kind = cursor.kind()
+            if kind in STATEMENT_KINDS:
+                return
+            cursor.advance()
+            if kind == 'SEMICOLON' or kind == 'RBRACE':
+                return
+
+    def report(self, error):
+        tokens = self.tokens
+        if self.line_index is None:
+            self.line_index = LineIndex(tokens.source)
+        offset = tokens.start[error.index] if error.index < len(tokens) else len(tokens.source)
+        line, column = self.line_index.position(offset)
+        self.errors.append(Diagnostic(line, column, str(error), error.index))
+
+    def format_trace(self, events, complete=True):
+        # Trace lines as the parser used to print them
+        for event in events:
+            if event[0] == MATCHED:
+                yield f'Matched token: {self.tokens[event[1]]}'
+            elif event[0] == EXPECTED:
+                yield f'Expected {event[2]}, got {self.tokens[event[1]]}'
+            else:
+                yield event[1]
+
+    def dump_trace(self, out=None):
+        self.trace.dump(self.format_trace, out)
 
 def main():
-    parser = Parser()
+    parser = Parser(trace=FullTrace(), recover=True)
     print("Enter Zara code (type 'exit' to finish input):")
     code_lines = []
     while True:
@@ -144,8 +236,29 @@ def main():
     try:
         parser.tokenize(code)
         parser.parse()
+        parser.dump_trace()
+        for error in parser.errors:
+            print(error)
     except RuntimeError as e:
+        parser.dump_trace()
         print(e)
 
 if __name__ == '__main__':
     main()
+
+
+# example input, with recovery resuming at the statement keyword after each
+# broken statement
+
+'''
+do { } while (x if (a = 1) { }
+for (i = 1 return x;
+exit
+'''
+
+# reports
+#
+#     1:17: Expected LESS, got ('IF', 'if')
+#     2:12: Expected SEMICOLON, got ('RETURN', 'return')
+#
+# and the trace shows the if statement parsed after the first error
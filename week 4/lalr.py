@@ -0,0 +1,349 @@
+# LALR(1) parse table generator
+#
+# build_tables(productions, start) turns a grammar into the action and goto
+# tables shift_reduce_parser runs on:
+#
+#   productions  list of (lhs, rhs) pairs, rhs a tuple of symbols; rule
+#                numbers start at 1 in list order
+#   start        the start symbol
+#
+# Every symbol that is never a lhs is a terminal, and "$" marks the end of
+# the input. Rule 0 is the added production start' -> start.
+#
+# The LR(0) item sets are built first, then LALR(1) lookaheads are spread
+# over their kernels (spontaneous generation plus propagation, as in the
+# dragon book). Conflicts are resolved the way yacc does it: shift wins over
+# reduce, and of two reductions the earlier rule wins. Every conflict is
+# listed in the tables' 'conflicts' for conflict_report().
+#
+# load_tables() keeps the result in a binary cache file named after a hash
+# of the grammar, so it is only rebuilt when the grammar changes.
+# encode_tables() turns the tables into integer arrays for the driver.
+
+import hashlib
+import marshal
+import os
+from array import array
+
+END = '$'
+
+# Bump when the table layout changes so that old cache files are ignored
+FORMAT_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.table_cache')
+
+
+class Grammar:
+    def __init__(self, productions, start):
+        self.start = start
+        self.productions = [(start + "'", (start,))] + [(lhs, tuple(rhs)) for lhs, rhs in productions]
+        self.nonterminals = list(dict.fromkeys(lhs for lhs, rhs in self.productions))
+        self.terminals = list(dict.fromkeys(
+            symbol for lhs, rhs in self.productions for symbol in rhs if symbol not in self.nonterminals
+        )) + [END]
+        if start not in self.nonterminals:
+            raise ValueError(f"Start symbol '{start}' has no productions")
+        self.by_lhs = {nonterminal: [] for nonterminal in self.nonterminals}
+        for number, (lhs, rhs) in enumerate(self.productions):
+            self.by_lhs[lhs].append(number)
+        self.compute_first()
+
+    def compute_first(self):
+        self.nullable = set()
+        self.first = {terminal: {terminal} for terminal in self.terminals}
+        for nonterminal in self.nonterminals:
+            self.first[nonterminal] = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.productions:
+                first = self.first[lhs]
+                size = len(first)
+                for symbol in rhs:
+                    first |= self.first[symbol]
+                    if symbol not in self.nullable:
+                        break
+                else:
+                    if lhs not in self.nullable:
+                        self.nullable.add(lhs)
+                        changed = True
+                if len(first) != size:
+                    changed = True
+
+    def first_of(self, symbols, lookahead):
+        # FIRST of a symbol sequence followed by lookahead
+        result = set()
+        for symbol in symbols:
+            result |= self.first[symbol]
+            if symbol not in self.nullable:
+                return result
+        result.add(lookahead)
+        return result
+
+    def describe(self, number):
+        lhs, rhs = self.productions[number]
+        return f"{lhs} -> {' '.join(rhs) or 'ε'}"
+
+
+def closure(grammar, items):
+    # LR(0) closure of a set of (rule, dot) items
+    result = set(items)
+    pending = list(items)
+    while pending:
+        rule, dot = pending.pop()
+        rhs = grammar.productions[rule][1]
+        if dot < len(rhs) and rhs[dot] in grammar.by_lhs:
+            for number in grammar.by_lhs[rhs[dot]]:
+                if (number, 0) not in result:
+                    result.add((number, 0))
+                    pending.append((number, 0))
+    return result
+
+
+def closure_lr1(grammar, items):
+    # LR(1) closure of a set of ((rule, dot), lookahead) items
+    result = set(items)
+    pending = list(items)
+    while pending:
+        (rule, dot), lookahead = pending.pop()
+        rhs = grammar.productions[rule][1]
+        if dot < len(rhs) and rhs[dot] in grammar.by_lhs:
+            for terminal in grammar.first_of(rhs[dot + 1:], lookahead):
+                for number in grammar.by_lhs[rhs[dot]]:
+                    item = ((number, 0), terminal)
+                    if item not in result:
+                        result.add(item)
+                        pending.append(item)
+    return result
+
+
+def lr0_states(grammar):
+    # Kernels of the LR(0) item sets and the transitions between them
+    kernels = [frozenset([(0, 0)])]
+    index = {kernels[0]: 0}
+    transitions = []
+    state = 0
+    while state < len(kernels):
+        moves = {}
+        for rule, dot in sorted(closure(grammar, kernels[state])):
+            rhs = grammar.productions[rule][1]
+            if dot < len(rhs):
+                moves.setdefault(rhs[dot], set()).add((rule, dot + 1))
+        targets = {}
+        for symbol, kernel in moves.items():
+            kernel = frozenset(kernel)
+            if kernel not in index:
+                index[kernel] = len(kernels)
+                kernels.append(kernel)
+            targets[symbol] = index[kernel]
+        transitions.append(targets)
+        state += 1
+    return kernels, transitions
+
+
+def lalr_lookaheads(grammar, kernels, transitions):
+    # Lookaheads of every kernel item, keyed by (state, item)
+    probe = '#'  # Stands for "whatever follows the kernel item"
+    lookaheads = {(state, item): set() for state, kernel in enumerate(kernels) for item in kernel}
+    lookaheads[(0, (0, 0))].add(END)
+    propagates = {key: [] for key in lookaheads}
+    for state, kernel in enumerate(kernels):
+        for item in kernel:
+            for (rule, dot), lookahead in closure_lr1(grammar, [(item, probe)]):
+                rhs = grammar.productions[rule][1]
+                if dot == len(rhs):
+                    continue
+                target = (transitions[state][rhs[dot]], (rule, dot + 1))
+                if lookahead == probe:
+                    propagates[(state, item)].append(target)
+                else:
+                    lookaheads[target].add(lookahead)
+
+    changed = True
+    while changed:
+        changed = False
+        for source, targets in propagates.items():
+            for target in targets:
+                size = len(lookaheads[target])
+                lookaheads[target] |= lookaheads[source]
+                if len(lookaheads[target]) != size:
+                    changed = True
+    return lookaheads
+
+
+def build_tables(productions, start):
+    # Returns a dict with the 'action' and 'goto' tables in the format of
+    # 4zara_parser.py ({state: {terminal: "S4" | "R2" | "Accept"}} and
+    # {state: {nonterminal: state}}), the 'rules' as (lhs, rhs length) by
+    # rule number, and the 'conflicts' found
+    grammar = Grammar(productions, start)
+    kernels, transitions = lr0_states(grammar)
+    lookaheads = lalr_lookaheads(grammar, kernels, transitions)
+
+    action_table = {}
+    goto_table = {}
+    conflicts = []
+    for state, kernel in enumerate(kernels):
+        actions = {}
+        reasons = {}
+        for symbol, target in transitions[state].items():
+            if symbol not in grammar.by_lhs:
+                actions[symbol] = f"S{target}"
+        items = closure_lr1(grammar, [(item, lookahead) for item in kernel
+                                      for lookahead in lookaheads[(state, item)]])
+        for (rule, dot), lookahead in sorted(items):
+            if dot != len(grammar.productions[rule][1]):
+                continue
+            action = "Accept" if rule == 0 else f"R{rule}"
+            current = actions.get(lookahead)
+            if current is None or current == action:
+                actions[lookahead] = action
+                reasons[lookahead] = rule
+                continue
+            kind = 'shift/reduce' if current.startswith("S") else 'reduce/reduce'
+            if kind == 'reduce/reduce' and rule < reasons[lookahead]:
+                actions[lookahead], action = action, current
+                reasons[lookahead] = rule
+            conflicts.append({'state': state, 'symbol': lookahead, 'kind': kind,
+                              'chosen': actions[lookahead], 'rejected': action})
+        action_table[state] = actions
+        goto_table[state] = {symbol: target for symbol, target in transitions[state].items()
+                             if symbol in grammar.by_lhs}
+
+    return {
+        'action': action_table,
+        'goto': goto_table,
+        'rules': {number: (lhs, len(rhs)) for number, (lhs, rhs) in enumerate(grammar.productions) if number},
+        'productions': [grammar.describe(number) for number in range(len(grammar.productions))],
+        'terminals': grammar.terminals,
+        'nonterminals': grammar.nonterminals[1:],
+        'conflicts': conflicts,
+    }
+
+
+def describe_action(tables, action):
+    if action.startswith("S"):
+        return f"shift to state {action[1:]}"
+    if action.startswith("R"):
+        return f"reduce by {tables['productions'][int(action[1:])]}"
+    return "accept"
+
+
+def conflict_report(tables):
+    # One line per conflict, saying which action the table kept
+    return [f"state {conflict['state']}, on '{conflict['symbol']}': {conflict['kind']} conflict, "
+            f"chose {describe_action(tables, conflict['chosen'])} "
+            f"over {describe_action(tables, conflict['rejected'])}"
+            for conflict in tables['conflicts']]
+
+
+def grammar_hash(productions, start):
+    text = repr((FORMAT_VERSION, start, [(lhs, tuple(rhs)) for lhs, rhs in productions]))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def load_tables(productions, start, cache_dir=CACHE_DIR):
+    # Tables for the grammar from the cache, building and saving them first
+    # if the grammar has not been seen before
+    path = os.path.join(cache_dir, f"lalr-{grammar_hash(productions, start)[:32]}.bin")
+    try:
+        with open(path, 'rb') as cache:
+            return marshal.load(cache)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    tables = build_tables(productions, start)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as cache:
+            marshal.dump(tables, cache)
+        os.replace(temporary, path)
+    except OSError:
+        pass  # Without a writable cache the tables are rebuilt every time
+    return tables
+
+
+# Integer encoding. Actions are ints: shift to state s is s (state 0 is
+# never entered by a shift), reduce by rule r is -(r + 1), which makes
+# reducing by rule 0, i.e. accepting, -1; 0 is a syntax error.
+ERROR = 0
+ACCEPT = -1
+
+
+def encode_action(action):
+    if action.startswith("S"):
+        return int(action[1:])
+    if action.startswith("R"):
+        return -(int(action[1:]) + 1)
+    return ACCEPT
+
+
+def compress_rows(table, rows, width):
+    # Row displacement: all rows are laid over one vector, each shifted by
+    # its own base so that no two rows' non-zero entries share a slot. The
+    # entry for (row, column) is value[base[row] + column] when
+    # check[base[row] + column] == row, and 0 otherwise. Rows with most
+    # entries are placed first, each at the first base where it fits.
+    check = array('i')
+    value = array('i')
+    base = array('i', [0] * rows)
+    order = sorted(range(rows), key=lambda row: -sum(1 for column in range(width) if table[row * width + column]))
+    for row in order:
+        columns = [column for column in range(width) if table[row * width + column]]
+        offset = 0
+        while any(offset + column < len(check) and check[offset + column] != -1 for column in columns):
+            offset += 1
+        needed = offset + width - len(check)
+        if needed > 0:
+            check.extend([-1] * needed)
+            value.extend([0] * needed)
+        for column in columns:
+            check[offset + column] = row
+            value[offset + column] = table[row * width + column]
+        base[row] = offset
+    return base, check, value
+
+
+def encode_tables(tables):
+    # Dense integer tables indexed by state * width + symbol id:
+    #   action  one column per terminal plus a last, always empty one for
+    #           tokens the grammar does not know (UNKNOWN_TERMINAL)
+    #   goto    target state per nonterminal, 0 if there is none
+    # plus the row-displaced form of action (action_base, action_check,
+    # action_value) and, per rule, its lhs id and length
+    terminals = tables['terminals']
+    nonterminals = tables['nonterminals']
+    terminal_ids = {terminal: index for index, terminal in enumerate(terminals)}
+    nonterminal_ids = {nonterminal: index for index, nonterminal in enumerate(nonterminals)}
+    states = len(tables['action'])
+    width = len(terminals) + 1
+
+    action = array('i', [ERROR] * (states * width))
+    goto = array('i', [0] * (states * len(nonterminals)))
+    for state in range(states):
+        for terminal, entry in tables['action'][state].items():
+            action[state * width + terminal_ids[terminal]] = encode_action(entry)
+        for nonterminal, target in tables['goto'][state].items():
+            goto[state * len(nonterminals) + nonterminal_ids[nonterminal]] = target
+
+    rule_count = len(tables['rules']) + 1
+    rule_lhs = array('i', [0] * rule_count)
+    rule_length = array('i', [0] * rule_count)
+    for number, (lhs, length) in tables['rules'].items():
+        rule_lhs[number] = nonterminal_ids[lhs]
+        rule_length[number] = length
+
+    action_base, action_check, action_value = compress_rows(action, states, width)
+    return {
+        'terminal_ids': terminal_ids,
+        'unknown_terminal': width - 1,
+        'action_width': width,
+        'goto_width': len(nonterminals),
+        'action': action,
+        'goto': goto,
+        'action_base': action_base,
+        'action_check': action_check,
+        'action_value': action_value,
+        'rule_lhs': rule_lhs,
+        'rule_length': rule_length,
+    }
@@ -0,0 +1,255 @@
+# Semantic analysis service, for editors and build tools that check often
+#
+# Usage: python analyzer_daemon.py --socket PATH    serve on a Unix socket
+#        python analyzer_daemon.py --stdio          serve on stdin/stdout
+#
+# Requests and responses are JSON objects, one per line. A request has a
+# method and, optionally, an id that its response repeats:
+#
+#     {"id": 1, "method": "check_file", "path": "prog.zara"}
+#     {"id": 2, "method": "check_buffer", "name": "prog.zara", "text": "..."}
+#     {"id": 3, "method": "stats"}
+#     {"id": 4, "method": "shutdown"}
+#
+# A check answers {"id": 1, "errors": [{"line": 4, "type": "ValueError",
+# "message": "..."}, ...]} with the errors of a recovering
+# SemanticAnalyzer, or only the first one if the request has
+# "recover": false, which is what a run without recover raises. A bad
+# request gets {"id": ..., "error": "..."} and the connection stays open.
+#
+# The service stays warm between requests. For each of the last DOCUMENTS
+# files or buffers (by path or name) it keeps the analyzer, with its type
+# DAG and cached types, and a checkpoint of the analyzer's state every
+# CHECKPOINT_LINES lines: the symbols, a PersistentMap, are shared rather
+# than copied. A new version of a document is checked from the last
+# checkpoint before its first changed line, up to the first checkpoint
+# past its last changed line whose state is the same as before, if the
+# number of lines is unchanged. A file whose size and modification time
+# are unchanged is not read again.
+
+import json
+import os
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+
+from test import SemanticAnalyzer
+
+DOCUMENTS = 64
+CHECKPOINT_LINES = 256
+
+
+class Document:
+    def __init__(self):
+        self.analyzer = SemanticAnalyzer(recover=True)
+        self.lines = []
+        self.stat = None  # (size, mtime_ns) of the file the lines came from
+        # (line index, symbols, local symbols, scopes, functions, error
+        # count) for the state before lines[index], every CHECKPOINT_LINES
+        # lines
+        self.checkpoints = []
+        self.errors = []
+        self.line_errors = 0  # errors before check_end's
+
+    def restore(self, index):
+        # Put the analyzer back to the state before lines[index], or the
+        # nearest checkpoint before it; returns where to go on from
+        while self.checkpoints and self.checkpoints[-1][0] > index:
+            self.checkpoints.pop()
+        if not self.checkpoints:
+            self.analyzer = SemanticAnalyzer(recover=True)
+            return 0
+        index, symbols, local, scopes, functions, error_count = self.checkpoints[-1]
+        analyzer = self.analyzer
+        analyzer.symbol_table.symbols = symbols
+        analyzer.symbol_table.local = local
+        analyzer.symbol_table.scopes = list(scopes)
+        analyzer.functions = list(functions)
+        del analyzer.errors[error_count:]
+        return index
+
+    def update(self, lines):
+        # Errors of the document with the given lines; returns the number
+        # of lines checked again
+        if lines == self.lines:
+            return 0
+        unchanged = 0
+        for old, new in zip(self.lines, lines):
+            if old != new:
+                break
+            unchanged += 1
+        # With as many lines as before, once the state at an old checkpoint
+        # past the last changed line comes out the same, so does everything
+        # after it, and the old errors from there on still hold. When lines
+        # were added or removed they do not: messages hold line numbers.
+        reusable = {}
+        if len(lines) == len(self.lines):
+            changed_end = len(lines)
+            while lines[changed_end - 1] == self.lines[changed_end - 1]:
+                changed_end -= 1
+            reusable = {checkpoint[0]: checkpoint for checkpoint in self.checkpoints
+                        if checkpoint[0] >= changed_end}
+        old_errors = self.errors
+        old_line_errors = self.line_errors
+        start = self.restore(unchanged)
+        analyzer = self.analyzer
+        checkpoints = self.checkpoints
+        for index in range(start, len(lines)):
+            if index % CHECKPOINT_LINES == 0 and (not checkpoints or checkpoints[-1][0] < index):
+                table = analyzer.symbol_table
+                checkpoint = (index, table.symbols, table.local, tuple(table.scopes),
+                              tuple(analyzer.functions), len(analyzer.errors))
+                checkpoints.append(checkpoint)
+                old = reusable.get(index)
+                if old is not None and old[1:5] == checkpoint[1:5]:
+                    shift = checkpoint[5] - old[5]
+                    checkpoints.extend(later[:5] + (later[5] + shift,)
+                                       for later in reusable.values() if later[0] > index)
+                    analyzer.errors.extend(old_errors[old[5]:old_line_errors])
+                    self.line_errors = len(analyzer.errors)
+                    self.errors = analyzer.errors + old_errors[old_line_errors:]
+                    self.lines = lines
+                    return index - start
+            analyzer.check_line(lines[index], index + 1)
+        self.line_errors = len(analyzer.errors)
+        analyzer.check_end(len(lines))
+        self.errors = analyzer.errors[:]
+        # check_end's error is not part of any checkpoint's state
+        del analyzer.errors[self.line_errors:]
+        self.lines = lines
+        return len(lines) - start
+
+
+class AnalyzerService:
+    def __init__(self, documents=DOCUMENTS):
+        self.documents = OrderedDict()  # path or name -> Document, least recent first
+        self.capacity = documents
+        self.requests = 0
+        self.lines_checked = 0
+        self.lock = threading.Lock()
+
+    def document(self, key):
+        document = self.documents.get(key)
+        if document is None:
+            document = self.documents[key] = Document()
+            if len(self.documents) > self.capacity:
+                self.documents.popitem(last=False)
+        else:
+            self.documents.move_to_end(key)
+        return document
+
+    def check_file(self, path):
+        path = os.path.abspath(path)
+        status = os.stat(path)
+        document = self.document(('file', path))
+        stat = (status.st_size, status.st_mtime_ns)
+        if stat != document.stat:
+            with open(path) as file:
+                self.lines_checked += document.update(file.read().split('\n'))
+            document.stat = stat
+        return document.errors
+
+    def check_buffer(self, name, text):
+        if not isinstance(text, str):
+            raise ValueError("text must be a string")
+        document = self.document(('buffer', name))
+        self.lines_checked += document.update(text.split('\n'))
+        return document.errors
+
+    def handle(self, request):
+        # Response to one decoded request
+        with self.lock:
+            self.requests += 1
+            response = {'id': request.get('id')}
+            method = request.get('method')
+            try:
+                if method == 'check_file':
+                    errors = self.check_file(request['path'])
+                elif method == 'check_buffer':
+                    errors = self.check_buffer(request.get('name', '<buffer>'), request['text'])
+                elif method == 'stats':
+                    response.update(requests=self.requests, documents=len(self.documents),
+                                    lines_checked=self.lines_checked)
+                    return response
+                elif method == 'shutdown':
+                    response['shutdown'] = True
+                    return response
+                else:
+                    raise ValueError(f"unknown method {method!r}")
+            except (KeyError, OSError, TypeError, ValueError) as error:
+                response['error'] = f"{type(error).__name__}: {error}"
+                return response
+            if not request.get('recover', True):
+                errors = errors[:1]
+            response['errors'] = [{'line': line_number, 'type': type(error).__name__, 'message': str(error)}
+                                  for line_number, error in errors]
+            return response
+
+    def handle_line(self, line):
+        # (response line, whether to shut down) for one request line
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+        except ValueError as error:
+            response = {'id': None, 'error': f"bad request: {error}"}
+        else:
+            response = self.handle(request)
+        return json.dumps(response) + '\n', bool(response.get('shutdown'))
+
+    def serve_stdio(self, stdin=sys.stdin, stdout=sys.stdout):
+        for line in stdin:
+            if not line.strip():
+                continue
+            response, shutdown = self.handle_line(line)
+            stdout.write(response)
+            stdout.flush()
+            if shutdown:
+                break
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response, shutdown = self.server.service.handle_line(line)
+            self.wfile.write(response.encode())
+            self.wfile.flush()
+            if shutdown:
+                threading.Thread(target=self.server.shutdown).start()
+                break
+
+
+class AnalyzerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        self.service = service
+        super().__init__(path, RequestHandler)
+
+
+def serve_socket(path, service):
+    if os.path.exists(path):
+        os.unlink(path)
+    with AnalyzerServer(path, service) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def main():
+    args = sys.argv[1:]
+    service = AnalyzerService()
+    if '--stdio' in args:
+        service.serve_stdio()
+    elif '--socket' in args:
+        serve_socket(args[args.index('--socket') + 1], service)
+    else:
+        print("Usage: python analyzer_daemon.py --socket PATH | --stdio")
+        sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# Throughput and latency of analyzer_daemon.py against one process per check
+#
+# Usage: python bench_analyzer_daemon.py [functions] [--requests N]
+#
+# Starts the daemon on a Unix socket and sends it, over one connection,
+# --requests requests (1000 by default) per workload, one at a time:
+#
+#   file unchanged   check_file of a program of the given number of
+#                    functions (120 by default, about 7000 lines) that
+#                    does not change
+#   buffer edit      check_buffer of that program with one line changed at
+#                    a random place each time, as an editor sends it
+#   small buffers    check_buffer of a different 50 lines of the program
+#                    each time, under a new name
+#
+# and prints requests per second and the median and 99th percentile
+# latency of each, measured by the client. For comparison it runs
+# COLD_RUNS checks of the program the way they were done before, a new
+# Python process running the analyzer on the file per check.
+
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_parallel_analyzer import generate_program
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLD_RUNS = 20
+COLD_CHECK = ("import sys; from test import SemanticAnalyzer; "
+              "analyzer = SemanticAnalyzer(recover=True); analyzer.analyze(open(sys.argv[1]).read()); "
+              "print(len(analyzer.errors))")
+
+
+class Client:
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile('rb')
+
+    def request(self, line):
+        self.socket.sendall(line)
+        return self.reader.readline()
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    print(f"{name:16} {len(latencies) / total:9.0f} req/s  p50 {percentile(latencies, 0.5) * 1e3:8.3f} ms"
+          f"  p99 {percentile(latencies, 0.99) * 1e3:8.3f} ms")
+
+
+def timed_requests(client, lines):
+    latencies = []
+    for line in lines:
+        start = time.perf_counter()
+        response = json.loads(client.request(line))
+        latencies.append(time.perf_counter() - start)
+        assert 'errors' in response, response
+    return latencies
+
+
+def encode(request):
+    return (json.dumps(request) + '\n').encode()
+
+
+def wait_for(path, process):
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("analyzer daemon did not start")
+        time.sleep(0.01)
+
+
+def main():
+    args = sys.argv[1:]
+    functions = int(args[0]) if args and not args[0].startswith('-') else 120
+    requests = int(args[args.index('--requests') + 1]) if '--requests' in args else 1000
+    rng = random.Random(0)
+    program = generate_program(functions)
+    lines = program.split('\n')
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'program.zara')
+        with open(source, 'w') as out:
+            out.write(program)
+        path = os.path.join(directory, 'analyzer.sock')
+        daemon = subprocess.Popen([sys.executable, os.path.join(HERE, 'analyzer_daemon.py'), '--socket', path])
+        try:
+            wait_for(path, daemon)
+            client = Client(path)
+            print(f"Program: {len(lines)} lines, {requests} requests per workload")
+
+            client.request(encode({'method': 'check_file', 'path': source}))
+            report("file unchanged", timed_requests(
+                client, [encode({'id': index, 'method': 'check_file', 'path': source}) for index in range(requests)]))
+
+            edits = []
+            for index in range(requests):
+                edited = list(lines)
+                edited[rng.randrange(len(lines))] = f"use g{rng.randrange(100)}"
+                edits.append(encode({'id': index, 'method': 'check_buffer', 'name': 'edited', 'text': '\n'.join(edited)}))
+            client.request(encode({'method': 'check_buffer', 'name': 'edited', 'text': program}))
+            report("buffer edit", timed_requests(client, edits))
+
+            small = []
+            for index in range(requests):
+                offset = rng.randrange(len(lines) - 50)
+                small.append(encode({'id': index, 'method': 'check_buffer', 'name': f"small{index}",
+                                     'text': '\n'.join(lines[offset:offset + 50])}))
+            report("small buffers", timed_requests(client, small))
+
+            client.request(encode({'method': 'shutdown'}))
+            client.close()
+        finally:
+            try:
+                daemon.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                daemon.kill()
+
+        latencies = []
+        for _ in range(COLD_RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', COLD_CHECK, source], cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+            latencies.append(time.perf_counter() - start)
+        report("process per check", latencies)
+
+if __name__ == '__main__':
+    main()
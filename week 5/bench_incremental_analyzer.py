@@ -0,0 +1,65 @@
+# Cost of IncrementalAnalyzer.edit against analyzing the program again
+#
+# Usage: python bench_incremental_analyzer.py [functions]
+#
+# On the program of bench_parallel_analyzer.py (5000 functions by default)
+# makes a series of edits, printing for each the lines edit checked again,
+# its time, and the time of a full SemanticAnalyzer run on the new program,
+# whose errors it is checked against:
+#
+#   local type      change the type of a local of one function
+#   global type     change the type of a global used all over
+#   insert use      add a line using a global in the middle, moving every
+#                   line after it
+#   remove global   delete a global declaration, so its uses fail
+#   restore global  put it back
+#   shadow global   declare a global again inside a function, which hides
+#                   it there
+#   new function    add a function: a scope change, analyzed in full
+
+import sys
+import time
+from collections import Counter
+
+from bench_parallel_analyzer import generate_program
+from incremental_analyzer import IncrementalAnalyzer
+from parallel_analyzer import describe
+from test import SemanticAnalyzer
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    lines = generate_program(functions).split('\n')
+
+    start = time.perf_counter()
+    document = IncrementalAnalyzer('\n'.join(lines))
+    build_time = time.perf_counter() - start
+    print(f"Program: {len(lines)} lines, {functions} functions; first analysis {build_time:.3f}s")
+
+    middle = lines.index(f"function f{functions // 2} {'ab'[:1 + functions // 2 % 2]}")
+    # The global used most
+    busiest = int(Counter(line for line in lines if line.startswith("use g")).most_common(1)[0][0][5:])
+    edits = [
+        ("local type", middle + 3, middle + 4, ["declare l2 float"]),
+        ("global type", busiest, busiest + 1, [f"declare g{busiest} float"]),
+        ("insert use", middle + 20, middle + 20, [f"use g{busiest}"]),
+        ("remove global", busiest, busiest + 1, []),
+        ("restore global", busiest, busiest, [f"declare g{busiest} int"]),
+        ("shadow global", middle + 5, middle + 5, [f"declare g{busiest} int"]),
+        ("new function", middle, middle, ["function extra a", "use g1", "end"]),
+    ]
+    for name, first, last, new in edits:
+        start = time.perf_counter()
+        checked = document.edit(first, last, new)
+        elapsed = time.perf_counter() - start
+        lines[first:last] = new
+        start = time.perf_counter()
+        analyzer = SemanticAnalyzer(recover=True)
+        analyzer.analyze('\n'.join(lines))
+        full_time = time.perf_counter() - start
+        assert describe(document.errors()) == describe(analyzer.errors), name
+        print(f"{name:15} {len(checked):7} lines checked  {elapsed * 1e3:9.2f} ms"
+              f"  full {full_time * 1e3:8.1f} ms  {len(analyzer.errors):6} errors")
+
+if __name__ == '__main__':
+    main()
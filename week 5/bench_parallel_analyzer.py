@@ -0,0 +1,95 @@
+# Speedup of analyze_parallel over a serial SemanticAnalyzer run
+#
+# Usage: python bench_parallel_analyzer.py [functions] [--seed N] [--workers N,N,...]
+#
+# Generates a program of GLOBALS global declarations and the given number
+# of functions (5000 by default), each a body of about BODY_LINES lines
+# using its own locals, the globals and the functions declared before it,
+# with a global declared between functions now and then. Times the serial
+# analyzer, the first pass alone, and analyze_parallel with 1, 2, 4, ...
+# workers up to the number of cores (or the given counts), in recover
+# mode, checking every result against the serial one. Pool start-up and
+# sending the chunks to the workers are part of the parallel times.
+
+import os
+import random
+import sys
+import time
+
+from parallel_analyzer import analyze_parallel, describe, first_pass
+from test import SemanticAnalyzer
+
+GLOBALS = 2000
+BODY_LINES = 40
+
+
+def worker_counts(cores):
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def generate_program(functions, seed=0):
+    rng = random.Random(seed)
+    lines = [f"declare g{index} {('int', 'float', 'array', 'stack')[index % 4]}" for index in range(GLOBALS)]
+    globals_count = GLOBALS
+    for function in range(functions):
+        lines.append(f"function f{function} {'ab'[:1 + function % 2]}")
+        for local in range(BODY_LINES // 4):
+            lines.append(f"declare l{local} int")
+        for _ in range(BODY_LINES - BODY_LINES // 4):
+            choice = rng.random()
+            if choice < 0.4:
+                lines.append(f"use l{rng.randrange(BODY_LINES // 4)}")
+            elif choice < 0.7:
+                lines.append(f"use g{rng.randrange(globals_count)}")
+            elif choice < 0.8:
+                callee = rng.randrange(function + 1)
+                lines.append(f"function_call f{callee} " + " x" * (1 + callee % 2))
+            elif choice < 0.9:
+                lines.append(f"array_access g{rng.randrange(GLOBALS // 4) * 4 + 2} {rng.randrange(10)}")
+            else:
+                lines.append(f"stack_operation g{rng.randrange(GLOBALS // 4) * 4 + 3}")
+        lines.append("end")
+        if function % 50 == 49:
+            lines.append(f"declare g{globals_count} int")
+            globals_count += 1
+    return '\n'.join(lines)
+
+
+def main():
+    args = sys.argv[1:]
+    functions = int(args[0]) if args and not args[0].startswith('-') else 5000
+    seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+    cores = os.cpu_count() or 1
+    if '--workers' in args:
+        counts = [int(count) for count in args[args.index('--workers') + 1].split(',')]
+    else:
+        counts = worker_counts(cores)
+
+    code = generate_program(functions, seed)
+    start = time.perf_counter()
+    analyzer = SemanticAnalyzer(recover=True)
+    analyzer.analyze(code)
+    serial_time = time.perf_counter() - start
+    serial = describe(analyzer.errors)
+    start = time.perf_counter()
+    first_pass(code.split('\n'), recover=True)
+    first_time = time.perf_counter() - start
+    print(f"Input: {code.count(chr(10)) + 1} lines, {functions} functions, "
+          f"{len(serial)} errors, {cores} cores")
+    print(f"serial       {serial_time:6.3f}s")
+    print(f"first pass   {first_time:6.3f}s")
+
+    for workers in counts:
+        start = time.perf_counter()
+        errors = analyze_parallel(code, workers, recover=True)
+        elapsed = time.perf_counter() - start
+        assert describe(errors) == serial
+        print(f"{workers:2} workers   {elapsed:6.3f}s  speedup {serial_time / elapsed:5.2f}x")
+
+if __name__ == '__main__':
+    main()
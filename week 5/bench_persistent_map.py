@@ -0,0 +1,120 @@
+# Cost of test.py's SymbolTable on a PersistentMap
+#
+# Usage: python bench_persistent_map.py [symbols,symbols,...]
+#
+# For each number of symbols (10^3 to 10^5 by default):
+#
+#   declare + lookup  declare every symbol in one scope, then look each one
+#                     up, against the nested-list table it replaced (only
+#                     while that stays under LEGACY_LIMIT seconds)
+#   snapshots         keep SNAPSHOTS versions of a table of that size, each
+#                     with one more symbol, as scopes of the same
+#                     environment do; time and memory held against copying
+#                     a dict for each
+#   pickle            size and time of pickling one snapshot, as a worker
+#                     process would receive it
+
+import pickle
+import sys
+import time
+import tracemalloc
+
+from test import SymbolTable
+
+LEGACY_LIMIT = 5.0
+SNAPSHOTS = 1000
+
+
+class LegacySymbolTable:
+    def __init__(self):
+        self.symbols = {}
+        self.scopes = [[]]
+
+    def declare(self, name, type_):
+        if name in self.symbols:
+            raise ValueError(f"Variable '{name}' already declared")
+        self.symbols[name] = type_
+        self.scopes[-1].append((name, type_))
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            for symbol in scope:
+                if symbol[0] == name:
+                    return symbol[1]
+        raise ValueError(f"Variable '{name}' not found")
+
+
+def declare_and_lookup(table, names):
+    start = time.perf_counter()
+    for name in names:
+        table.declare(name, 'int')
+    for name in names:
+        table.lookup(name)
+    return time.perf_counter() - start
+
+
+def snapshots(names, copy):
+    # Time and traced memory of SNAPSHOTS versions on top of a table that
+    # already holds names; the memory is measured in a second, traced run
+    if copy:
+        base = {name: 'int' for name in names}
+    else:
+        base = SymbolTable()
+        for name in names:
+            base.declare(name, 'int')
+
+    def make_versions():
+        versions = []
+        if copy:
+            symbols = base
+            for index in range(SNAPSHOTS):
+                symbols = dict(symbols)
+                symbols[f"extra{index}"] = 'float'
+                versions.append(symbols)
+        else:
+            table = SymbolTable(base.snapshot())
+            for index in range(SNAPSHOTS):
+                table.declare(f"extra{index}", 'float')
+                versions.append(table.snapshot())
+        return versions
+
+    start = time.perf_counter()
+    make_versions()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    versions = make_versions()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, memory
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    legacy = None
+    for symbols in sizes:
+        names = [f"v{index}" for index in range(symbols)]
+        elapsed = declare_and_lookup(SymbolTable(), names)
+        line = f"{symbols:7} symbols  declare + lookup  persistent {elapsed * 1e3:9.1f} ms"
+        if legacy is None or legacy[1] * (symbols / legacy[0]) ** 2 < LEGACY_LIMIT:
+            legacy_elapsed = declare_and_lookup(LegacySymbolTable(), names)
+            line += f"  nested lists {legacy_elapsed * 1e3:9.1f} ms"
+            legacy = symbols, legacy_elapsed
+        print(line)
+
+        shared_time, shared_memory = snapshots(names, copy=False)
+        copy_time, copy_memory = snapshots(names, copy=True)
+        print(f"{'':16} {SNAPSHOTS} snapshots  persistent {shared_time * 1e3:9.1f} ms {shared_memory / 1e6:8.1f} MB"
+              f"  dict copies {copy_time * 1e3:9.1f} ms {copy_memory / 1e6:8.1f} MB")
+
+        table = SymbolTable()
+        for name in names:
+            table.declare(name, 'int')
+        start = time.perf_counter()
+        data = pickle.dumps(table.snapshot())
+        loaded = pickle.loads(data)
+        elapsed = time.perf_counter() - start
+        assert loaded == table.snapshot()
+        print(f"{'':16} pickle round trip {elapsed * 1e3:9.1f} ms  {len(data) / 1e6:6.2f} MB")
+
+if __name__ == "__main__":
+    main()
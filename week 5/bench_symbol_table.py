@@ -0,0 +1,109 @@
+# Scaling of SemanticAnalyzer's scope handling with the number of symbols
+#
+# Usage: python bench_symbol_table.py [symbols,symbols,...]
+#
+# Two workloads, each with the given numbers of symbols (10^3 to 10^5 by
+# default):
+#
+#   blocks  half the symbols global, the rest declared in small blocks
+#           that are entered, looked up in (their own names and globals)
+#           and left again
+#   nested  scopes nested 1000 deep holding the symbols between them, every
+#           symbol looked up from the innermost one, then all scopes left
+#
+# Compares the scope chain SymbolTable with the list it replaced, which
+# scanned every symbol per lookup and rebuilt the list on every scope exit.
+# The old table is quadratic, so it is skipped for sizes it would take more
+# than LEGACY_LIMIT seconds on, going by its previous time. The lookups of
+# both are checked to find the same declarations.
+
+import sys
+import time
+
+from semantic_analyzer import SemanticAnalyzer, Type
+
+LEGACY_LIMIT = 5.0
+BLOCK_SIZE = 8
+DEPTH = 1000
+
+
+class LegacySymbolTable:
+    def __init__(self):
+        self.table = []
+
+    def add_symbol(self, symbol):
+        self.table.append(symbol)
+
+    def get_symbol(self, name, scope_level):
+        for symbol in reversed(self.table):
+            if symbol.name == name and symbol.scope_level <= scope_level:
+                return symbol
+        return None
+
+
+class LegacyAnalyzer(SemanticAnalyzer):
+    def __init__(self):
+        super().__init__()
+        self.symbol_table = LegacySymbolTable()
+
+    def exit_scope(self):
+        self.symbol_table.table = [
+            sym for sym in self.symbol_table.table if sym.scope_level < self.current_scope_level
+        ]
+        self.current_scope_level -= 1
+
+
+def blocks(analyzer, symbols):
+    # Returns the scope level of every symbol found, to compare tables
+    found = []
+    globals_count = symbols // 2
+    for index in range(globals_count):
+        analyzer.declare_variable(f"g{index}", Type.INTEGER)
+    for block in range((symbols - globals_count) // BLOCK_SIZE):
+        analyzer.enter_scope()
+        for index in range(BLOCK_SIZE):
+            analyzer.declare_variable(f"local{index}", Type.FLOAT)
+        for index in range(BLOCK_SIZE):
+            found.append(analyzer.check_variable(f"local{index}").scope_level)
+            found.append(analyzer.check_variable(f"g{(block * BLOCK_SIZE + index) % globals_count}").scope_level)
+        analyzer.exit_scope()
+    return found
+
+
+def nested(analyzer, symbols):
+    found = []
+    per_scope = max(symbols // DEPTH, 1)
+    for level in range(DEPTH):
+        analyzer.enter_scope()
+        for index in range(per_scope):
+            analyzer.declare_variable(f"v{level}_{index}", Type.INTEGER)
+    for level in range(DEPTH):
+        for index in range(per_scope):
+            found.append(analyzer.check_variable(f"v{level}_{index}").scope_level)
+    for _ in range(DEPTH):
+        analyzer.exit_scope()
+    return found
+
+
+def timed(workload, analyzer, symbols):
+    start = time.perf_counter()
+    found = workload(analyzer, symbols)
+    return found, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    for workload in (blocks, nested):
+        legacy = None
+        for symbols in sizes:
+            found, elapsed = timed(workload, SemanticAnalyzer(), symbols)
+            line = f"{workload.__name__:7} {symbols:7} symbols  scope chain {elapsed:8.3f}s"
+            if legacy is None or legacy[1] * (symbols / legacy[0]) ** 2 < LEGACY_LIMIT:
+                legacy_found, legacy_elapsed = timed(workload, LegacyAnalyzer(), symbols)
+                assert legacy_found == found
+                line += f"  list {legacy_elapsed:8.3f}s  ({legacy_elapsed / elapsed:6.1f}x)"
+                legacy = symbols, legacy_elapsed
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Cost of TypeChecker.check_expression on generated expressions
+#
+# Usage: python bench_type_checker.py [expressions,expressions,...]
+#
+# Three workloads:
+#
+#   corpus   the given numbers of random expressions (10^3 to 10^5 by
+#            default) over a few hundred typed variables and small int
+#            constants (declared as names, since a literal's type is the
+#            literal itself), drawn from a pool a tenth the size as
+#            generated code repeats itself, each checked
+#            once (cold) and then all checked again (warm), against the
+#            recursive checker it replaced
+#   shared   an expression of depth d whose two operands are the same
+#            subexpression, d up to SHARED_DEPTH; a tree walk visits 2^d
+#            nodes, so the old checker only runs while it is predicted to
+#            stay under LEGACY_LIMIT seconds
+#   deep     a chain of '+' nested DEEP_DEPTH levels, which the old checker
+#            cannot walk without a RecursionError
+#
+# The types, or the error raised, are checked to be the same as the old
+# checker's wherever it runs.
+
+import random
+import sys
+import time
+
+from test import SymbolTable, TypeChecker
+
+LEGACY_LIMIT = 5.0
+VARIABLES = 300
+LITERALS = 10
+MAX_DEPTH = 6
+SHARED_DEPTH = 60
+DEEP_DEPTH = 100000
+
+
+class LegacyTypeChecker:
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+
+    def check_expression(self, expr):
+        if isinstance(expr, tuple):
+            operator, left, right = expr
+            left_type = self.check_expression(left)
+            right_type = self.check_expression(right)
+
+            if operator == "+":
+                if left_type == right_type:
+                    return left_type
+                else:
+                    raise TypeError(f"Cannot add '{left_type}' and '{right_type}' types")
+            elif operator == "-":
+                if left_type == right_type:
+                    return left_type
+                else:
+                    raise TypeError(f"Cannot subtract '{left_type}' and '{right_type}' types")
+        elif isinstance(expr, str):
+            return self.symbol_table.lookup(expr)
+        return expr
+
+
+def make_table():
+    table = SymbolTable()
+    for index in range(VARIABLES):
+        table.declare(f"v{index}", 'int' if index % 4 else 'float')
+    for value in range(LITERALS):
+        table.declare(str(value), 'int')
+    return table
+
+
+def random_expression(rng, depth):
+    # Mostly '+' and '-' over one type, so most expressions check cleanly
+    if depth == 0 or rng.random() < 0.2:
+        if rng.random() < 0.2:
+            return str(rng.randrange(LITERALS))
+        if rng.random() < 0.005:
+            return f"v{rng.randrange(0, VARIABLES, 4)}"  # a float
+        return f"v{rng.randrange(VARIABLES // 4) * 4 + rng.randrange(1, 4)}"
+    # '*' has no rule of its own, so an expression over one is an error
+    operator = '*' if rng.random() < 0.01 else rng.choice('+-')
+    return (operator, random_expression(rng, depth - 1), random_expression(rng, depth - 1))
+
+
+def check_all(checker, expressions):
+    # (elapsed, outcomes) with each outcome a type or (error class, message)
+    outcomes = []
+    start = time.perf_counter()
+    for expr in expressions:
+        try:
+            outcomes.append(checker.check_expression(expr))
+        except (TypeError, ValueError) as error:
+            outcomes.append((type(error), str(error)))
+    return time.perf_counter() - start, outcomes
+
+
+def corpus(count):
+    rng = random.Random(count)
+    pool = [random_expression(rng, MAX_DEPTH) for _ in range(max(count // 10, 1))]
+    expressions = [rng.choice(pool) for _ in range(count)]
+    table = make_table()
+    checker = TypeChecker(table)
+    cold, outcomes = check_all(checker, expressions)
+    warm, warm_outcomes = check_all(checker, expressions)
+    legacy, legacy_outcomes = check_all(LegacyTypeChecker(table), expressions)
+    assert outcomes == warm_outcomes == legacy_outcomes
+    errors = sum(type(outcome) is tuple for outcome in outcomes)
+    print(f"corpus  {count:7} expressions  dag cold {cold * 1e3:8.1f} ms  warm {warm * 1e3:8.1f} ms"
+          f"  recursive {legacy * 1e3:8.1f} ms  ({legacy / cold:5.1f}x cold, {legacy / warm:5.1f}x warm)"
+          f"  {errors} errors")
+
+
+def shared_expression(depth):
+    expr = 'v1'
+    for _ in range(depth):
+        expr = ('+', expr, expr)
+    return expr
+
+
+def shared():
+    table = make_table()
+    legacy = None
+    for depth in range(10, SHARED_DEPTH + 1, 10):
+        expr = shared_expression(depth)
+        start = time.perf_counter()
+        result = TypeChecker(table).check_expression(expr)
+        elapsed = time.perf_counter() - start
+        line = f"shared  depth {depth:3}  dag {elapsed * 1e3:8.3f} ms"
+        if legacy is None or legacy[1] * 2 ** (depth - legacy[0]) < LEGACY_LIMIT:
+            start = time.perf_counter()
+            legacy_result = LegacyTypeChecker(table).check_expression(expr)
+            legacy_elapsed = time.perf_counter() - start
+            assert legacy_result == result
+            line += f"  recursive {legacy_elapsed * 1e3:10.1f} ms"
+            legacy = depth, legacy_elapsed
+        else:
+            line += f"  recursive ~{legacy[1] * 2 ** (depth - legacy[0]):.1e} s (skipped)"
+        print(line)
+
+
+def deep():
+    table = make_table()
+    expr = 'v1'
+    for index in range(DEEP_DEPTH):
+        expr = ('+', expr, f"v{1 + index % 3}")
+    start = time.perf_counter()
+    result = TypeChecker(table).check_expression(expr)
+    elapsed = time.perf_counter() - start
+    try:
+        LegacyTypeChecker(table).check_expression(expr)
+        legacy = "recursive ran"
+    except RecursionError:
+        legacy = "recursive: RecursionError"
+    print(f"deep    depth {DEEP_DEPTH}  dag {elapsed * 1e3:8.1f} ms -> {result}  {legacy}")
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    for count in sizes:
+        corpus(count)
+    shared()
+    deep()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Hash-consed expressions for TypeChecker
+#
+# ExpressionDAG.intern turns a nested (operator, left, right) expression
+# into a node id, giving structurally equal subexpressions the same node:
+#
+#     dag = ExpressionDAG()
+#     dag.intern(('+', ('*', 'a', 'b'), ('*', 'a', 'b')))
+#
+# has three nodes, 'a', 'b' and ('*', a, b), under the '+'. The nodes are
+# keyed as
+#
+#     ('name', name)               a string leaf, a variable
+#     (type(value), value)         any other leaf, its own type
+#     (operator, left, right)      with the children's node ids
+#
+# The walks here use an explicit stack, so an expression nested 100000
+# deep is no problem. A subtuple that appears more than once in the same
+# expression, the same object, is walked once. So is a whole expression
+# checked again: the DAG keeps up to INTERNED_LIMIT expressions it
+# interned alive and remembers their nodes by identity. That table only
+# saves walks; it is emptied when full, and by forget_tuples, which
+# TypeChecker calls when its types are reset.
+
+MISSING = object()
+INTERNED_LIMIT = 1 << 16
+
+
+class ExpressionDAG:
+    def __init__(self):
+        self.ids = {}
+        self.nodes = []
+        self.expressions = {}  # node -> nested tuples, built on demand
+        self.interned = {}  # id of an expression's tuple -> (the tuple, its node)
+
+    def node_id(self, key):
+        node = self.ids.get(key)
+        if node is None:
+            node = self.ids[key] = len(self.nodes)
+            self.nodes.append(key)
+        return node
+
+    def leaf(self, expr):
+        if isinstance(expr, str):
+            return self.node_id(('name', expr))
+        return self.node_id((type(expr), expr))
+
+    def forget_tuples(self):
+        # Drop the tuples kept for lookups by identity; nodes stay
+        self.interned = {}
+
+    def intern(self, expr):
+        if not isinstance(expr, tuple):
+            return self.leaf(expr)
+        known = self.interned.get(id(expr))
+        if known is not None:
+            return known[1]
+        # id of a tuple in expr -> its node. Only tuples not walked yet go
+        # on the stack; a tuple stays there until both of its children have
+        # nodes
+        walked = {}
+        stack = [expr]
+        while stack:
+            current = stack[-1]
+            operator, left, right = current
+            if isinstance(left, tuple):
+                known = walked.get(id(left))
+                if known is None:
+                    stack.append(left)
+                    continue
+                left = known
+            else:
+                left = self.leaf(left)
+            if isinstance(right, tuple):
+                known = walked.get(id(right))
+                if known is None:
+                    stack.append(right)
+                    continue
+                right = known
+            else:
+                right = self.leaf(right)
+            walked[id(current)] = self.node_id((operator, left, right))
+            stack.pop()
+        if len(self.interned) >= INTERNED_LIMIT:
+            self.forget_tuples()
+        node = walked[id(expr)]
+        self.interned[id(expr)] = expr, node
+        return node
+
+    def expression(self, node):
+        # The node as nested tuples again, sharing the tuples of subtrees
+        # built before
+        expressions = self.expressions
+        nodes = self.nodes
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if current in expressions:
+                stack.pop()
+                continue
+            key = nodes[current]
+            if len(key) == 2:
+                expressions[current] = key[1]
+                stack.pop()
+                continue
+            operator, left, right = key
+            if left not in expressions:
+                stack.append(left)
+            elif right not in expressions:
+                stack.append(right)
+            else:
+                expressions[current] = (operator, expressions[left], expressions[right])
+                stack.pop()
+        return expressions[node]
+
+    def infer(self, node, types, leaf_type, combine):
+        # Type of node, filling types (node -> type) for it and everything
+        # under it that is not there yet. leaf_type(name) gives a variable's
+        # type, combine(node, operator, left_type, right_type) an
+        # operation's.
+        # Left subtrees are done before right ones, as a recursive walk
+        # would, so the first error raised is the same.
+        nodes = self.nodes
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if current in types:
+                stack.pop()
+                continue
+            key = nodes[current]
+            if len(key) == 2:
+                types[current] = leaf_type(key[1]) if key[0] == 'name' else key[1]
+                stack.pop()
+                continue
+            operator, left, right = key
+            left_type = types.get(left, MISSING)
+            if left_type is MISSING:
+                stack.append(left)
+                continue
+            right_type = types.get(right, MISSING)
+            if right_type is MISSING:
+                stack.append(right)
+                continue
+            types[current] = combine(current, operator, left_type, right_type)
+            stack.pop()
+        return types[node]
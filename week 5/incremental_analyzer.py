@@ -0,0 +1,274 @@
+# Incremental semantic analysis for the week 5 SemanticAnalyzer
+#
+# IncrementalAnalyzer keeps the result of every line of a program and the
+# dependencies between them, and after an edit checks again only the lines
+# whose result can have changed:
+#
+#     document = IncrementalAnalyzer(code)
+#     checked = document.edit(start, end, lines)   # lines[start:end] = lines
+#     document.errors()
+#
+# edit returns the numbers of the lines it checked again, and errors() is
+# always what SemanticAnalyzer(recover=True) gives for the whole new
+# program.
+#
+# Every line in LOOKUPS looks up one name, and the result of checking it
+# depends only on its own text and on the declaration that name resolves
+# to (its type, or that there is none). The first full analysis records
+# that declaration for each line (SemanticAnalyzer's track). A name can
+# be declared again in a nested body, shadowing the outer declaration, but
+# not twice in one scope, so at any line it resolves to the innermost
+# visible declaration: the last successful one before it whose scope (the
+# body it is in, or the whole program) is still open there. A declaration
+# succeeds unless that one is in its own scope.
+#
+# After an edit, the new lines are checked, and so are
+#
+#   - the lines that resolved to a removed declaration (its dependents)
+#   - the lines that look up a name in the scope of a new declaration
+#   - transitively, the dependents of a declaration that stops being one
+#     (it now finds the name declared) and the lines in the scope of one
+#     that becomes one
+#   - the lines with an error, if the edit moved them, as most messages
+#     hold the line number
+#
+# A line is checked again with SemanticAnalyzer.check_node itself, against
+# a symbol table holding only the declaration its name resolves to, so the
+# errors are exactly the full analysis's. Lines are checked in source
+# order, so each is checked at most once per edit.
+#
+# An edit that adds or removes 'function' or 'end' lines changes the
+# scopes of everything after it; it is analyzed again in full.
+
+import heapq
+from bisect import bisect_left, insort
+
+from persistent_map import PersistentMap
+from test import LOOKUPS, SemanticAnalyzer
+
+SCOPE_KEYWORDS = ("function", "end")
+DECLARATIONS = ("declare", "function")
+EMPTY = PersistentMap()
+
+
+def keyword(text):
+    tokens = text.split(None, 1)
+    return tokens[0] if tokens else None
+
+
+def node_index(node):
+    return node.index
+
+
+def remove_sorted(nodes, node):
+    # Remove node from a list of nodes in source order
+    del nodes[bisect_left(nodes, node.index, key=node_index)]
+
+
+class Node:
+    # One line. name is the name it looks up and type the type it declares
+    # (if it is a declaration). scope is the function whose body it is in
+    # (for an 'end', the one it closes), end a function's 'end'. resolved
+    # is the declaration its name resolved to, dependents the lines that
+    # resolved to it, binding whether it declared its name.
+    __slots__ = ('text', 'keyword', 'name', 'type', 'index', 'scope', 'end',
+                 'resolved', 'dependents', 'binding', 'error')
+
+    def __init__(self, text, index, scope):
+        tokens = text.split()
+        self.text = text
+        self.keyword = tokens[0] if tokens else None
+        self.name = tokens[1] if self.keyword in LOOKUPS and len(tokens) > 1 else None
+        self.type = tokens[2] if self.keyword in DECLARATIONS and len(tokens) > 2 else None
+        self.index = index
+        self.scope = scope
+        self.end = None
+        self.resolved = None
+        self.dependents = set()
+        self.binding = False
+        self.error = None
+
+
+class IncrementalAnalyzer:
+    def __init__(self, code):
+        self.checker = SemanticAnalyzer()
+        self.build(code.split('\n'))
+
+    def build(self, lines):
+        # Full analysis, recording every line's resolution
+        analyzer = SemanticAnalyzer(recover=True, track=True)
+        analyzer.analyze('\n'.join(lines))
+        self.nodes = nodes = []
+        functions = []
+        for index, text in enumerate(lines):
+            node = Node(text, index, functions[-1] if functions else None)
+            nodes.append(node)
+            if node.keyword == "function":
+                functions.append(node)
+            elif node.keyword == "end" and functions:
+                functions.pop().end = node
+        # The outermost function left open, reported after the last line's
+        # errors by errors()
+        self.unclosed = functions[0] if functions else None
+        self.error_nodes = set()
+        for line_number, error in analyzer.errors[:-1] if self.unclosed else analyzer.errors:
+            node = nodes[line_number - 1]
+            node.error = error
+            self.error_nodes.add(node)
+        self.bindings = {}  # name -> its declarations, in source order
+        self.readers = {}  # name -> the lines looking it up, in source order
+        for node in nodes:
+            if node.name is None:
+                continue
+            self.readers.setdefault(node.name, []).append(node)
+            line = analyzer.resolutions.get(node.index + 1)
+            if line is not None:
+                node.resolved = nodes[line - 1]
+                node.resolved.dependents.add(node)
+            if node.keyword in DECLARATIONS and node.error is None:
+                node.binding = True
+                self.bindings.setdefault(node.name, []).append(node)
+
+    def errors(self):
+        # (line number, error) of every error, as SemanticAnalyzer's recover
+        # mode gives them
+        errors = [(node.index + 1, node.error) for node in sorted(self.error_nodes, key=node_index)]
+        if self.unclosed is not None:
+            checker = SemanticAnalyzer(recover=True)
+            checker.functions.append(self.unclosed.index + 1)
+            checker.check_end(len(self.nodes))
+            errors.extend(checker.errors)
+        return errors
+
+    def scope_end(self, declaration):
+        # Index of the line its scope ends at, or past the last line
+        scope = declaration.scope
+        if scope is None or scope.end is None:
+            return len(self.nodes)
+        return scope.end.index
+
+    def resolve(self, name, index):
+        # The declaration name resolves to on the line at index, or None.
+        # Going back from the line, the declarations whose scope has ended
+        # before it are in closed bodies nested in its scope.
+        bindings = self.bindings.get(name)
+        if not bindings:
+            return None
+        position = bisect_left(bindings, index, key=node_index) - 1
+        while position >= 0:
+            declaration = bindings[position]
+            if index < self.scope_end(declaration):
+                return declaration
+            position -= 1
+        return None
+
+    def edit(self, start, end, lines):
+        nodes = self.nodes
+        lines = list(lines)
+        # Lines that stay the same at either end of the edit are kept
+        while start < end and lines and nodes[start].text == lines[0]:
+            start += 1
+            lines.pop(0)
+        while start < end and lines and nodes[end - 1].text == lines[-1]:
+            end -= 1
+            lines.pop()
+        removed = nodes[start:end]
+        if (any(node.keyword in SCOPE_KEYWORDS for node in removed)
+                or any(keyword(text) in SCOPE_KEYWORDS for text in lines)):
+            self.build([node.text for node in nodes[:start]] + lines + [node.text for node in nodes[end:]])
+            return list(range(1, len(self.nodes) + 1))
+
+        queue = []
+        queued = set()
+
+        def enqueue(node):
+            if node not in queued:
+                queued.add(node)
+                heapq.heappush(queue, (node.index, id(node), node))
+
+        # Lines that resolved to a removed declaration, queued once the
+        # lines after the edit are renumbered
+        orphans = []
+        for node in removed:
+            if node.name is not None:
+                remove_sorted(self.readers[node.name], node)
+                if node.binding:
+                    remove_sorted(self.bindings[node.name], node)
+                    orphans.extend(node.dependents)
+                if node.resolved is not None:
+                    node.resolved.dependents.discard(node)
+            self.error_nodes.discard(node)
+        for node in removed:
+            node.index = -1
+
+        if start:
+            before = nodes[start - 1]
+            scope = before if before.keyword == "function" else before.scope
+            if before.keyword == "end" and scope is not None:
+                scope = scope.scope
+        else:
+            scope = None
+        added = [Node(text, start + offset, scope) for offset, text in enumerate(lines)]
+        nodes[start:end] = added
+        if len(added) != len(removed):
+            for index in range(start + len(added), len(nodes)):
+                nodes[index].index = index
+            for node in self.error_nodes:
+                if node.index >= start + len(added):
+                    enqueue(node)
+        for node in orphans:
+            if node.index >= 0:
+                enqueue(node)
+        for node in added:
+            if node.name is not None:
+                insort(self.readers.setdefault(node.name, []), node, key=node_index)
+            enqueue(node)
+
+        checked = []
+        while queue:
+            _, _, node = heapq.heappop(queue)
+            if node.index >= 0:
+                self.check(node, enqueue)
+                checked.append(node.index + 1)
+        return checked
+
+    def check(self, node, enqueue):
+        # Check one line again, updating the dependencies and queueing the
+        # lines its change of declaration affects
+        name = node.name
+        resolved = self.resolve(name, node.index) if name is not None else None
+        checker = self.checker
+        table = checker.symbol_table
+        table.symbols = EMPTY if resolved is None else EMPTY.set(name, resolved.type)
+        # A declaration only fails against one in its own scope
+        table.local = table.symbols if resolved is not None and resolved.scope is node.scope else EMPTY
+        table.scopes = []
+        checker.functions = []
+        try:
+            checker.check_node(node.text, node.index + 1)
+            node.error = None
+            self.error_nodes.discard(node)
+        except Exception as error:
+            node.error = error
+            self.error_nodes.add(node)
+        if resolved is not node.resolved:
+            if node.resolved is not None:
+                node.resolved.dependents.discard(node)
+            if resolved is not None:
+                resolved.dependents.add(node)
+            node.resolved = resolved
+        binding = node.keyword in DECLARATIONS and name is not None and node.error is None
+        if binding != node.binding:
+            node.binding = binding
+            bindings = self.bindings.setdefault(name, [])
+            if binding:
+                insort(bindings, node, key=node_index)
+                readers = self.readers[name]
+                first = bisect_left(readers, node.index + 1, key=node_index)
+                last = bisect_left(readers, self.scope_end(node), key=node_index)
+                for reader in readers[first:last]:
+                    enqueue(reader)
+            else:
+                remove_sorted(bindings, node)
+                for dependent in node.dependents:
+                    enqueue(dependent)
@@ -0,0 +1,165 @@
+# Parallel semantic analysis of top-level function bodies
+#
+# analyze_parallel(code) gives the same errors as
+#
+#     analyzer = SemanticAnalyzer(recover=recover)
+#     analyzer.analyze(code)
+#
+# raising the first one unless recover is set, and returning the
+# (line number, error) list of analyzer.errors if it is.
+#
+# It works in two phases:
+#
+#   1. A serial pass checks the top-level lines, declaring the globals and
+#      the functions' own names, and skips the body of each top-level
+#      function (from its 'function' line to its 'end'), noting the
+#      symbols the body starts with.
+#   2. The bodies are checked in a process pool, a chunk of consecutive
+#      bodies of about chunk_lines lines per task. A task starts from the
+#      symbols of its first body, a PersistentMap that is sent as is, and
+#      checks the top-level lines between its bodies again to keep them up
+#      to date, but only reports errors inside the bodies; the top-level
+#      ones are the first pass's.
+#
+# The errors of both phases are merged in source order. Without recover,
+# the first pass stops at the first top-level error, and bodies after it
+# are not checked, as a serial run never reaches them.
+#
+# Usage: python parallel_analyzer.py <file> [--workers N] [--compare]
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from test import SemanticAnalyzer
+
+# Tasks are at least this many lines, so that each one outweighs sending
+# its symbols to a worker
+CHUNK_LINES = 20000
+
+
+def keyword(line):
+    tokens = line.split(None, 1)
+    return tokens[0] if tokens else None
+
+
+def body_end(lines, start):
+    # Index of the 'end' closing the function whose body starts at index
+    # start, or len(lines) if it is never closed
+    depth = 1
+    for index in range(start, len(lines)):
+        word = keyword(lines[index])
+        if word == "function":
+            depth += 1
+        elif word == "end":
+            depth -= 1
+            if depth == 0:
+                return index
+    return len(lines)
+
+
+def first_pass(lines, recover):
+    # (analyzer, bodies): the analyzer has checked the top-level lines, and
+    # bodies holds (start, end, symbols) for the lines of each top-level
+    # function body, lines[start:end]
+    analyzer = SemanticAnalyzer(recover=True)
+    bodies = []
+    index = 0
+    while index < len(lines):
+        analyzer.check_line(lines[index], index + 1)
+        if analyzer.errors and not recover:
+            break
+        index += 1
+        if analyzer.functions:
+            end = body_end(lines, index)
+            bodies.append((index, end, analyzer.symbol_table.symbols))
+            index = end
+    return analyzer, bodies
+
+
+def check_chunk(symbols, first_line, lines, recover):
+    # Errors of the body lines among lines, which start with a function
+    # body on line first_line and end with one
+    analyzer = SemanticAnalyzer(recover=True, symbols=symbols)
+    analyzer.functions.append(first_line - 1)
+    analyzer.symbol_table.enter_scope()
+    errors = []
+    for line_number, line in enumerate(lines, first_line):
+        in_body = bool(analyzer.functions)
+        analyzer.check_line(line, line_number)
+        if analyzer.errors:
+            if in_body:
+                errors.extend(analyzer.errors)
+                if not recover:
+                    break
+            analyzer.errors = []
+    return errors
+
+
+def chunks(bodies, chunk_lines):
+    # Consecutive bodies grouped into (start, end, symbols) ranges of at
+    # least chunk_lines lines
+    grouped = []
+    for start, end, symbols in bodies:
+        if grouped and grouped[-1][1] - grouped[-1][0] < chunk_lines:
+            grouped[-1][1] = end
+        else:
+            grouped.append([start, end, symbols])
+    return grouped
+
+
+def analyze_parallel(code, workers=None, recover=False, chunk_lines=CHUNK_LINES):
+    lines = code.split('\n')
+    analyzer, bodies = first_pass(lines, recover)
+    errors = analyzer.errors
+    if bodies:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(check_chunk, symbols, start + 1, lines[start:end], recover)
+                       for start, end, symbols in chunks(bodies, chunk_lines)]
+            for future in futures:
+                errors.extend(future.result())
+        errors.sort(key=lambda error: error[0])
+    if recover or not errors:
+        # An unclosed body is reported after every line's errors (errors
+        # is analyzer.errors), or raised if there are none
+        analyzer.check_end(len(lines))
+    if errors and not recover:
+        raise errors[0][1]
+    return errors
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python parallel_analyzer.py <file> [--workers N] [--compare]")
+        sys.exit(2)
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else None
+    with open(args[0]) as file:
+        code = file.read()
+
+    start = time.perf_counter()
+    errors = analyze_parallel(code, workers, recover=True)
+    elapsed = time.perf_counter() - start
+    for line_number, error in errors:
+        print(f"{args[0]}:{line_number}: {error}")
+    print(f"parallel: {len(errors)} errors, {elapsed:.2f}s")
+
+    if '--compare' in args:
+        start = time.perf_counter()
+        analyzer = SemanticAnalyzer(recover=True)
+        analyzer.analyze(code)
+        serial_elapsed = time.perf_counter() - start
+        print(f"serial: {serial_elapsed:.2f}s")
+        if describe(analyzer.errors) != describe(errors):
+            print("Parallel results differ from the serial run")
+            sys.exit(1)
+        print(f"Speedup: {serial_elapsed / elapsed:.2f}x with {workers or os.cpu_count()} workers")
+
+
+def describe(errors):
+    # Errors in a form that compares equal between processes
+    return [(line_number, type(error), str(error)) for line_number, error in errors]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# Immutable hash map with structural sharing (a hash array mapped trie)
+#
+#     empty = PersistentMap()
+#     outer = empty.set('x', 'int')
+#     inner = outer.set('y', 'float')    # outer is unchanged
+#
+# set returns a new map that shares everything but the path to the changed
+# key with the old one, so keeping every version costs O(log n) per set
+# and a snapshot is just the map itself. Lookups and sets take at most
+# seven levels for 32 bits of hash.
+#
+# Each node holds a bitmap of which of its 32 slots are used and a tuple
+# of the used ones in order. A slot holds a leaf (hash, key, value), a
+# deeper node, or a _Collision of keys whose hashes are all equal.
+#
+# Maps pickle as their items and are rebuilt on load, as the hash of a
+# string differs between processes.
+
+HASH_BITS = 32
+HASH_MASK = (1 << HASH_BITS) - 1
+LEVEL_BITS = 5
+SLOT_MASK = (1 << LEVEL_BITS) - 1
+
+MISSING = object()
+
+
+class _Node:
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children
+
+
+class _Collision:
+    __slots__ = ('hash', 'items')
+
+    def __init__(self, hash_, items):
+        self.hash = hash_
+        self.items = items
+
+
+EMPTY_NODE = _Node(0, ())
+
+
+def _entry_hash(entry):
+    return entry[0] if type(entry) is tuple else entry.hash
+
+
+def _merge(shift, first, second):
+    # A node holding two entries with different hashes, or a collision
+    # for two leaves with the same one
+    first_hash = _entry_hash(first)
+    second_hash = _entry_hash(second)
+    if first_hash == second_hash:
+        return _Collision(first_hash, ((first[1], first[2]), (second[1], second[2])))
+    first_slot = (first_hash >> shift) & SLOT_MASK
+    second_slot = (second_hash >> shift) & SLOT_MASK
+    if first_slot == second_slot:
+        return _Node(1 << first_slot, (_merge(shift + LEVEL_BITS, first, second),))
+    if first_slot > second_slot:
+        first, second = second, first
+    return _Node((1 << first_slot) | (1 << second_slot), (first, second))
+
+
+def _set(node, shift, hash_, key, value):
+    # (new node, whether key was added) for node with key set to value
+    bit = 1 << ((hash_ >> shift) & SLOT_MASK)
+    position = (node.bitmap & (bit - 1)).bit_count()
+    children = node.children
+    if not node.bitmap & bit:
+        return _Node(node.bitmap | bit, children[:position] + ((hash_, key, value),) + children[position:]), True
+    child = children[position]
+    if type(child) is tuple:
+        if child[0] == hash_ and (child[1] is key or child[1] == key):
+            if child[2] is value:
+                return node, False
+            new_child, added = (hash_, key, value), False
+        else:
+            new_child, added = _merge(shift + LEVEL_BITS, child, (hash_, key, value)), True
+    elif type(child) is _Collision:
+        if child.hash == hash_:
+            items = [item for item in child.items if item[0] != key]
+            added = len(items) == len(child.items)
+            new_child = _Collision(hash_, tuple(items) + ((key, value),))
+        else:
+            new_child, added = _merge(shift + LEVEL_BITS, child, (hash_, key, value)), True
+    else:
+        new_child, added = _set(child, shift + LEVEL_BITS, hash_, key, value)
+        if new_child is child:
+            return node, False
+    return _Node(node.bitmap, children[:position] + (new_child,) + children[position + 1:]), added
+
+
+class PersistentMap:
+    __slots__ = ('root', 'count')
+
+    def __init__(self, items=()):
+        self.root = EMPTY_NODE
+        self.count = 0
+        for key, value in items:
+            self.root, added = _set(self.root, 0, hash(key) & HASH_MASK, key, value)
+            self.count += added
+
+    def get(self, key, default=None):
+        hash_ = hash(key) & HASH_MASK
+        node = self.root
+        shift = 0
+        while True:
+            bit = 1 << ((hash_ >> shift) & SLOT_MASK)
+            if not node.bitmap & bit:
+                return default
+            child = node.children[(node.bitmap & (bit - 1)).bit_count()]
+            if type(child) is tuple:
+                if child[0] == hash_ and (child[1] is key or child[1] == key):
+                    return child[2]
+                return default
+            if type(child) is _Collision:
+                if child.hash == hash_:
+                    for item_key, value in child.items:
+                        if item_key == key:
+                            return value
+                return default
+            node = child
+            shift += LEVEL_BITS
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def set(self, key, value):
+        root, added = _set(self.root, 0, hash(key) & HASH_MASK, key, value)
+        if root is self.root:
+            return self
+        updated = PersistentMap()
+        updated.root = root
+        updated.count = self.count + added
+        return updated
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        stack = [self.root]
+        while stack:
+            for child in reversed(stack.pop().children):
+                if type(child) is tuple:
+                    yield child[1], child[2]
+                elif type(child) is _Collision:
+                    yield from child.items
+                else:
+                    stack.append(child)
+
+    def __iter__(self):
+        return (key for key, value in self.items())
+
+    def __eq__(self, other):
+        if not isinstance(other, PersistentMap):
+            return NotImplemented
+        return self.count == other.count and all(other.get(key, MISSING) == value for key, value in self.items())
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+    def __reduce__(self):
+        return PersistentMap, (list(self.items()),)
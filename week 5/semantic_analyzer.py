@@ -7,17 +7,34 @@ class Symbol:
 
 class SymbolTable:
     def __init__(self):
-        self.table = []
-        
+        # Visible symbols by name, the most recent last
+        self.chains = {}
+        # Names added at each scope level, to take back out when it closes
+        self.scopes = []
+
     def add_symbol(self, symbol):
-        self.table.append(symbol)
-        
+        self.chains.setdefault(symbol.name, []).append(symbol)
+        while len(self.scopes) <= symbol.scope_level:
+            self.scopes.append([])
+        self.scopes[symbol.scope_level].append(symbol.name)
+
     def get_symbol(self, name, scope_level):
-        for symbol in reversed(self.table):
-            if symbol.name == name and symbol.scope_level <= scope_level:
+        for symbol in reversed(self.chains.get(name, ())):
+            if symbol.scope_level <= scope_level:
                 return symbol
         return None
 
+    def remove_scope(self, scope_level):
+        # Drop the symbols at scope_level and deeper. They are the last ones
+        # in their chains, since a deeper scope closes before anything is
+        # added to a shallower one.
+        while len(self.scopes) > scope_level:
+            for name in self.scopes.pop():
+                chain = self.chains[name]
+                chain.pop()
+                if not chain:
+                    del self.chains[name]
+
 class Type:
     INTEGER = 'int'
     FLOAT = 'float'
@@ -36,9 +53,7 @@ class SemanticAnalyzer:
 
     def exit_scope(self):
         # Clean up symbols at the current scope level when exiting
-        self.symbol_table.table = [
-            sym for sym in self.symbol_table.table if sym.scope_level < self.current_scope_level
-        ]
+        self.symbol_table.remove_scope(self.current_scope_level)
         self.current_scope_level -= 1
 
     def declare_variable(self, name, sym_type):
@@ -121,8 +136,9 @@ def test_incorrect_usage(analyzer):
     analyzer.exit_scope()
 
 # Running tests
-analyzer = SemanticAnalyzer()
-print("Testing correct usage:")
-test_correct_usage(analyzer)
-print("\nTesting incorrect usage:")
-test_incorrect_usage(analyzer)
+if __name__ == "__main__":
+    analyzer = SemanticAnalyzer()
+    print("Testing correct usage:")
+    test_correct_usage(analyzer)
+    print("\nTesting incorrect usage:")
+    test_incorrect_usage(analyzer)
@@ -1,26 +1,41 @@
+from expression_dag import ExpressionDAG
+from persistent_map import PersistentMap
+
+
 class SymbolTable:
-    def __init__(self):
-        self.symbols = {}
-        self.scopes = [[]]  # list of symbols for each scope
+    def __init__(self, symbols=None):
+        # Visible names and their types. A PersistentMap never changes, so
+        # any version of it can be kept as a snapshot and shared, e.g. by
+        # function bodies checked from the same enclosing scope.
+        self.symbols = PersistentMap() if symbols is None else symbols
+        # The names declared in the current scope, the only ones a
+        # declaration may not repeat: a name from an enclosing scope can be
+        # declared again, shadowing it until the scope ends. The symbols
+        # given to start with are the outermost scope's own.
+        self.local = self.symbols
+        self.scopes = []  # (symbols, local) of each enclosing scope
 
     def enter_scope(self):
-        self.scopes.append([])
+        self.scopes.append((self.symbols, self.local))
+        self.local = PersistentMap()
 
     def exit_scope(self):
-        self.scopes.pop()
+        self.symbols, self.local = self.scopes.pop()
+
+    def snapshot(self):
+        return self.symbols
 
     def declare(self, name, type_):
-        if name in self.symbols:
+        if name in self.local:
             raise ValueError(f"Variable '{name}' already declared")
-        self.symbols[name] = type_
-        self.scopes[-1].append((name, type_))
+        self.symbols = self.symbols.set(name, type_)
+        self.local = self.local.set(name, type_)
 
     def lookup(self, name):
-        for scope in reversed(self.scopes):
-            for symbol in scope:
-                if symbol[0] == name:
-                    return symbol[1]
-        raise ValueError(f"Variable '{name}' not found")
+        try:
+            return self.symbols[name]
+        except KeyError:
+            raise ValueError(f"Variable '{name}' not found")
 
     def check_type(self, name, expected_type):
         actual_type = self.lookup(name)
@@ -31,26 +46,34 @@ class SymbolTable:
 class TypeChecker:
     def __init__(self, symbol_table):
         self.symbol_table = symbol_table
+        # Expressions are interned into one DAG, and the type of each node
+        # is kept for as long as the visible symbols stay the same. The
+        # tuples the DAG holds for lookups by identity go with the types.
+        self.dag = ExpressionDAG()
+        self.types = {}
+        self.types_symbols = None
 
     def check_expression(self, expr):
-        if isinstance(expr, tuple):
-            operator, left, right = expr
-            left_type = self.check_expression(left)
-            right_type = self.check_expression(right)
-
-            if operator == "+":
-                if left_type == right_type:
-                    return left_type
-                else:
-                    raise TypeError(f"Cannot add '{left_type}' and '{right_type}' types")
-            elif operator == "-":
-                if left_type == right_type:
-                    return left_type
-                else:
-                    raise TypeError(f"Cannot subtract '{left_type}' and '{right_type}' types")
-        elif isinstance(expr, str):
-            return self.symbol_table.lookup(expr)
-        return expr
+        if self.types_symbols is not self.symbol_table.symbols:
+            self.types = {}
+            self.types_symbols = self.symbol_table.symbols
+            self.dag.forget_tuples()
+        node = self.dag.intern(expr)
+        return self.dag.infer(node, self.types, self.symbol_table.lookup, self.operation_type)
+
+    def operation_type(self, node, operator, left_type, right_type):
+        if operator == "+":
+            if left_type == right_type:
+                return left_type
+            else:
+                raise TypeError(f"Cannot add '{left_type}' and '{right_type}' types")
+        elif operator == "-":
+            if left_type == right_type:
+                return left_type
+            else:
+                raise TypeError(f"Cannot subtract '{left_type}' and '{right_type}' types")
+        # Any other operation stands for its own type, as a literal does
+        return self.dag.expression(node)
 
 
 class ScopeChecker:
@@ -94,9 +117,26 @@ class ArrayStackChecker:
             raise TypeError(f"Line {line}: '{name}' is not a stack")
 
 
+# Lines that look up the name after their keyword: uses, and declarations,
+# which must not find it
+LOOKUPS = ("declare", "use", "function_call", "array_access", "stack_operation", "function")
+
+
 class SemanticAnalyzer:
-    def __init__(self):
-        self.symbol_table = SymbolTable()
+    def __init__(self, recover=False, symbols=None, track=False):
+        # With recover, an error is kept in errors as (line number, error)
+        # and analysis goes on with the next line, instead of raising it
+        self.recover = recover
+        self.errors = []
+        self.functions = []  # line numbers of the functions whose body we are in
+        # With track, resolutions maps the number of each line in LOOKUPS
+        # to the line of the declaration its name resolved to, or None.
+        # declared_at is the line of each visible declaration, scoped like
+        # the symbols.
+        self.resolutions = {} if track else None
+        self.declared_at = PersistentMap()
+        self.declaration_scopes = []
+        self.symbol_table = SymbolTable(symbols)
         self.type_checker = TypeChecker(self.symbol_table)
         self.scope_checker = ScopeChecker(self.symbol_table)
         self.function_checker = FunctionChecker(self.symbol_table)
@@ -105,15 +145,36 @@ class SemanticAnalyzer:
     def analyze(self, code):
         lines = code.split('\n')
         for line_number, line in enumerate(lines, 1):
+            self.check_line(line, line_number)
+        self.check_end(len(lines))
+
+    def check_line(self, line, line_number):
+        try:
             self.check_node(line, line_number)
+        except Exception as error:
+            if not self.recover:
+                raise
+            self.errors.append((line_number, error))
+
+    def check_end(self, line_number):
+        # Every function body has to be closed by the last line
+        if self.functions:
+            error = ValueError(f"Line {line_number}: Function on line {self.functions[0]} has no 'end'")
+            if not self.recover:
+                raise error
+            self.errors.append((line_number, error))
 
     def check_node(self, line, line_number):
         tokens = line.split()
         if not tokens:
             return  # Ignore empty lines
 
+        if self.resolutions is not None and tokens[0] in LOOKUPS and len(tokens) > 1:
+            self.resolutions[line_number] = self.declared_at.get(tokens[1])
+
         if tokens[0] == "declare":
             self.symbol_table.declare(tokens[1], tokens[2])
+            self.declared(tokens[1], line_number)
         elif tokens[0] == "use":
             self.scope_checker.check_use(tokens[1], line_number)
             self.type_checker.check_expression(tokens[1])
@@ -123,6 +184,28 @@ class SemanticAnalyzer:
             self.array_stack_checker.check_array_usage(tokens[1], int(tokens[2]), line_number)
         elif tokens[0] == "stack_operation":
             self.array_stack_checker.check_stack_usage(tokens[1], line_number)
+        elif tokens[0] == "function":
+            # The name goes in the enclosing scope. The body gets a scope of
+            # its own even if that fails, so that its 'end' always closes it.
+            self.functions.append(line_number)
+            try:
+                self.symbol_table.declare(tokens[1], tokens[2])
+                self.declared(tokens[1], line_number)
+            finally:
+                self.symbol_table.enter_scope()
+                if self.resolutions is not None:
+                    self.declaration_scopes.append(self.declared_at)
+        elif tokens[0] == "end":
+            if not self.functions:
+                raise ValueError(f"Line {line_number}: 'end' outside a function")
+            self.functions.pop()
+            self.symbol_table.exit_scope()
+            if self.resolutions is not None:
+                self.declared_at = self.declaration_scopes.pop()
+
+    def declared(self, name, line_number):
+        if self.resolutions is not None:
+            self.declared_at = self.declared_at.set(name, line_number)
 
 
 def get_input_code():
@@ -148,7 +231,8 @@ def test_analyzer():
 
 
 # Run the program
-test_analyzer()
+if __name__ == "__main__":
+    test_analyzer()
 
 
 # example input
@@ -156,6 +240,11 @@ test_analyzer()
 '''
 declare x int
 declare y float
+function twice ab
+declare z int
+use z
+end
+function_call twice x y
 use x
 use z
 function_call myFunc x y
@@ -126,12 +126,13 @@ sample_code = [
 ]
 
 # Run the code generator
-generator = IntermediateCodeGenerator()
+if __name__ == "__main__":
+    generator = IntermediateCodeGenerator()
 
-# Process each statement in the sample Zara code
-for stmt in sample_code:
-    generator.process_statement(stmt)
+    # Process each statement in the sample Zara code
+    for stmt in sample_code:
+        generator.process_statement(stmt)
 
-# Print the generated three-address code
-print("Generated Three-Address Code (TAC):")
-generator.print_code()
+    # Print the generated three-address code
+    print("Generated Three-Address Code (TAC):")
+    generator.print_code()